@@ -12,6 +12,94 @@ class Settings(BaseSettings):
     # URL do serviço de veículos para comunicação HTTP
     VEHICLE_SERVICE_URL: str = "http://localhost:8000"
     
+    # Pool de conexões HTTP compartilhado com o serviço principal
+    VEHICLE_CLIENT_TIMEOUT: float = 30.0
+    VEHICLE_CLIENT_MAX_CONNECTIONS: int = 100
+    VEHICLE_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    VEHICLE_CLIENT_KEEPALIVE_EXPIRY: float = 30.0
+    VEHICLE_CLIENT_HTTP2: bool = False
+    
+    # Busca em lote: máximo de requisições simultâneas e endpoint bulk
+    # opcional do serviço principal (ex.: "/api/v1/vehicles/batch")
+    VEHICLE_CLIENT_BATCH_CONCURRENCY: int = 10
+    VEHICLE_SERVICE_BULK_ENDPOINT: Optional[str] = None
+    
+    # Resiliência nas chamadas ao serviço principal
+    REQUEST_TIMEOUT_BUDGET: float = 10.0  # orçamento padrão por requisição (s)
+    VEHICLE_CLIENT_GET_TIMEOUT: float = 5.0
+    VEHICLE_CLIENT_UPDATE_TIMEOUT: float = 5.0
+    VEHICLE_CLIENT_MAX_RETRIES: int = 2
+    VEHICLE_CLIENT_RETRY_BACKOFF: float = 0.1
+    VEHICLE_CLIENT_RETRY_BACKOFF_MAX: float = 2.0
+    VEHICLE_CLIENT_RETRY_BUDGET_RATIO: float = 0.2
+    VEHICLE_CLIENT_RETRY_BUDGET_MIN: float = 10.0
+    VEHICLE_CLIENT_RETRY_BUDGET_MAX: float = 100.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = 30.0
+    
+    # Janela de frescor do cache local de veículos (stale-while-revalidate):
+    # até TTL o registro local é usado direto; até TTL + STALE ele é usado
+    # e revalidado em segundo plano; depois disso a busca é bloqueante.
+    VEHICLE_CACHE_TTL_SECONDS: float = 30.0
+    VEHICLE_CACHE_STALE_SECONDS: float = 300.0
+    
+    # Máximo de validadores (ETag / Last-Modified) guardados para GET condicional
+    VEHICLE_CLIENT_VALIDATORS_MAX_SIZE: int = 10000
+    
+    # Cache negativo de veículos inexistentes (404) no serviço principal
+    VEHICLE_NEGATIVE_CACHE_TTL_SECONDS: float = 30.0
+    VEHICLE_NEGATIVE_CACHE_MAX_SIZE: int = 10000
+    
+    # Outbox de status para o serviço principal (entrega em segundo plano)
+    OUTBOX_DISPATCH_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_RETRY_BACKOFF: float = 1.0
+    OUTBOX_RETRY_BACKOFF_MAX: float = 300.0
+    OUTBOX_LEASE_SECONDS: float = 120.0  # lease de uma rodada do dispatcher entre réplicas
+    
+    # Sincronização do catálogo completo do serviço principal
+    CATALOG_SYNC_INTERVAL_SECONDS: float = 900.0  # 0 desabilita o agendamento
+    CATALOG_SYNC_PAGE_SIZE: int = 500
+    CATALOG_SYNC_CHUNK_SIZE: int = 100  # veículos gravados por commit (streaming)
+    CATALOG_SYNC_LEASE_SECONDS: float = 300.0
+    
+    # Admissão de vendas por veículo (rajadas para o mesmo veículo)
+    SALE_ADMISSION_WAIT_SECONDS: float = 2.0  # espera máxima atrás da venda em andamento
+    SALE_ADMISSION_RESERVED_TTL_SECONDS: float = 30.0  # lembra veículos já reservados
+    SALE_ADMISSION_MAX_SIZE: int = 10000
+    
+    # Idempotency-Key em POST /api/v1/sales/
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 3600.0  # 0 desabilita a limpeza
+    
+    # Códigos de pagamento finalizados lembrados para descartar reentregas
+    FINALIZED_PAYMENTS_CACHE_SIZE: int = 100000
+    
+    # Expiração de vendas PENDENTE sem webhook de pagamento
+    SALE_PENDING_TTL_SECONDS: float = 3600.0
+    SALE_EXPIRY_INTERVAL_SECONDS: float = 60.0  # 0 desabilita a varredura
+    SALE_EXPIRY_BATCH_SIZE: int = 500
+    
+    # Fila durável de webhooks de pagamento (POST /webhook/pagamento/async)
+    WEBHOOK_QUEUE_INTERVAL_SECONDS: float = 1.0  # 0 desabilita os workers
+    WEBHOOK_QUEUE_WORKERS: int = 2
+    WEBHOOK_QUEUE_BATCH_SIZE: int = 200
+    WEBHOOK_QUEUE_RETRY_BACKOFF: float = 1.0
+    WEBHOOK_QUEUE_RETRY_BACKOFF_MAX: float = 300.0
+    WEBHOOK_EVENT_RETENTION_SECONDS: float = 86400.0  # janela de deduplicação
+    WEBHOOK_EVENT_PURGE_INTERVAL_SECONDS: float = 3600.0  # 0 desabilita a limpeza
+    
+    # Paginação por cursor das listagens (parâmetro limit)
+    LISTING_PAGE_SIZE: int = 100
+    LISTING_MAX_PAGE_SIZE: int = 1000
+    
+    # Cache em processo das páginas das listagens de veículos
+    LISTING_CACHE_MAX_SIZE: int = 1000
+    LISTING_CACHE_TTL_SECONDS: float = 10.0  # defasagem máxima entre réplicas
+    
+    # Linhas lidas por bloco nas exportações em streaming (yield_per)
+    EXPORT_BATCH_SIZE: int = 1000
+    
     # Chave secreta para validação de webhooks
     SECRET_KEY: str = "development-secret-key"
     WEBHOOK_SECRET: Optional[str] = None
@@ -0,0 +1,79 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Sequence
+
+from sqlalchemy import tuple_
+
+# Header com o cursor da próxima página (ausente na última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação malformado ou de outra listagem"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Codifica a chave da última linha de uma página em um cursor opaco.
+
+    Os valores são serializados em JSON (datetimes em ISO 8601) e
+    codificados em base64 URL-safe, sem padding.
+    """
+    raw = json.dumps(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> tuple:
+    """
+    Decodifica um cursor gerado por encode_cursor.
+
+    Args:
+        cursor: Cursor recebido do cliente
+        types: Conversor de cada valor da chave (ex.: float, int,
+            datetime.fromisoformat)
+
+    Raises:
+        InvalidCursor: Se o cursor não pode ser decodificado
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursor("Cursor inválido")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise InvalidCursor("Cursor inválido") from exc
+
+
+def keyset_page(stmt, columns: Sequence, after: Sequence | None, limit: int, descending: bool = False):
+    """
+    Aplica paginação por chave (keyset) a um SELECT.
+
+    Ordena pelas colunas da chave e filtra as linhas posteriores à chave
+    `after` com comparação de tuplas, de modo que o banco percorre o índice
+    a partir do ponto certo: páginas profundas custam o mesmo que a
+    primeira. Busca limit + 1 linhas para saber se há próxima página.
+    """
+    if after is not None:
+        key = tuple_(*columns)
+        bound = tuple_(*after)
+        stmt = stmt.where(key < bound if descending else key > bound)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows: list, limit: int, key: Callable[[Any], Sequence]) -> tuple[list, str | None]:
+    """
+    Separa a página das linhas buscadas por keyset_page.
+
+    Returns:
+        (linhas da página, cursor da próxima página ou None na última)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Executa uma função assíncrona periodicamente em segundo plano.
+
+    Iniciada e parada pelo lifespan em app/main.py. trigger() antecipa a
+    próxima execução (ex.: logo após gravar trabalho novo).
+    """
+
+    def __init__(self, name: str, fn: Callable[[], Awaitable[object]], interval: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def trigger(self) -> None:
+        """Antecipa a próxima execução (sem efeito se a tarefa não estiver rodando)"""
+        if self.running and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_once(self) -> object:
+        """Executa a função uma vez registrando duração e falhas"""
+        started = time.monotonic()
+        try:
+            result = await self.fn()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            raise
+        finally:
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.last_duration = time.monotonic() - started
+        self.last_error = None
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception("Falha na tarefa periódica %s: %s", self.name, e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
@@ -1,4 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
@@ -23,3 +26,51 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+
+def get_session_factory():
+    """
+    Dependency com a fábrica de sessões, para respostas em streaming
+    que abrem a própria sessão e continuam após o fim da requisição.
+    """
+    return AsyncSessionLocal
+
+
+def dialect_name(session: AsyncSession) -> str:
+    """Nome do dialeto do banco da sessão (ex.: postgresql, sqlite)"""
+    return session.get_bind().dialect.name
+
+
+_INSERT_BY_DIALECT = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def dialect_insert(session: AsyncSession):
+    """
+    insert() do dialeto da sessão, com suporte a ON CONFLICT.
+    
+    Raises:
+        NotImplementedError: Se o dialeto não suporta ON CONFLICT
+    """
+    dialect = dialect_name(session)
+    insert = _INSERT_BY_DIALECT.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"ON CONFLICT não suportado para o dialeto {dialect}")
+    return insert
+
+
+async def try_advisory_xact_lock(session: AsyncSession, key: int) -> bool:
+    """
+    Tenta obter um advisory lock do Postgres válido até o fim da transação.
+    
+    Usado para que apenas uma réplica execute uma tarefa de fundo por vez.
+    Em bancos sem advisory locks (SQLite, uma única instância) retorna True.
+    """
+    if dialect_name(session) != "postgresql":
+        return True
+    result = await session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}
+    )
+    return bool(result.scalar())
@@ -1,8 +1,21 @@
-from fastapi import FastAPI
+import logging
+import time
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.routers import vehicles, sales, webhook
+from app.routers import vehicles, sales, webhook, ops
 from app.database import engine, Base
+from app.services.vehicle_client import vehicle_client
+from app.services.resilience import request_deadline
+from app.services.sale_service import vehicle_revalidator
+from app.services.outbox import outbox_dispatcher
+from app.services.catalog_sync import catalog_sync
+from app.services.idempotency import idempotency_purger
+from app.services.webhook_queue import payment_webhook_queue, webhook_event_purger
+from app.services.finalized_payments import warm_finalized_payments
+from app.services.sale_expiry import sale_expiry_sweeper
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -12,9 +25,44 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
+    # Startup: Aquece o cache de pagamentos finalizados (reentregas de webhook)
+    try:
+        await warm_finalized_payments()
+    except Exception:
+        logger.exception("Falha ao aquecer o cache de pagamentos finalizados")
+    
+    # Startup: Abre pool de conexões com o serviço principal
+    await vehicle_client.start()
+    
+    # Startup: Entrega do outbox de status em segundo plano
+    outbox_dispatcher.start()
+    
+    # Startup: Sincronização agendada do catálogo do serviço principal
+    catalog_sync.start()
+    
+    # Startup: Limpeza das chaves de idempotência expiradas
+    idempotency_purger.start()
+    
+    # Startup: Workers da fila durável de webhooks de pagamento
+    payment_webhook_queue.start()
+    
+    # Startup: Limpeza dos eventos de webhook já processados
+    webhook_event_purger.start()
+    
+    # Startup: Expiração de vendas PENDENTE sem webhook de pagamento
+    sale_expiry_sweeper.start()
+    
     yield
     
     # Shutdown
+    await sale_expiry_sweeper.stop()
+    await webhook_event_purger.stop()
+    await payment_webhook_queue.stop()
+    await idempotency_purger.stop()
+    await catalog_sync.stop()
+    await outbox_dispatcher.stop()
+    await vehicle_revalidator.close()
+    await vehicle_client.close()
     await engine.dispose()
 
 
@@ -48,6 +96,28 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def propagate_request_deadline(request: Request, call_next):
+    """
+    Define o prazo da requisição usado nas chamadas ao serviço principal.
+    
+    O cliente pode informar o próprio orçamento (em segundos) no header
+    X-Request-Timeout; o valor é limitado a REQUEST_TIMEOUT_BUDGET.
+    """
+    budget = settings.REQUEST_TIMEOUT_BUDGET
+    header = request.headers.get("X-Request-Timeout")
+    if header:
+        try:
+            budget = min(budget, max(0.0, float(header)))
+        except ValueError:
+            pass
+    token = request_deadline.set(time.monotonic() + budget)
+    try:
+        return await call_next(request)
+    finally:
+        request_deadline.reset(token)
+
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -72,3 +142,9 @@ app.include_router(
     prefix="/webhook",
     tags=["Webhook"]
 )
+
+app.include_router(
+    ops.router,
+    prefix="/ops",
+    tags=["Operações"]
+)
@@ -1,3 +1,12 @@
-from app.models.models import Vehicle, Sale, VehicleStatus, PaymentStatus
+from app.models.models import (
+    Vehicle,
+    Sale,
+    VehicleStatus,
+    PaymentStatus,
+    VehicleStatusOutbox,
+    SyncState,
+    IdempotencyKey,
+    PaymentWebhookEvent,
+)
 
-__all__ = ["Vehicle", "Sale", "VehicleStatus", "PaymentStatus"]
+__all__ = ["Vehicle", "Sale", "VehicleStatus", "PaymentStatus", "VehicleStatusOutbox", "SyncState", "IdempotencyKey", "PaymentWebhookEvent"]
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -33,9 +33,16 @@ class Vehicle(Base):
     status = Column(Enum(VehicleStatus), default=VehicleStatus.DISPONIVEL)
     data_cadastro = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Início da passagem do catálogo que viu o veículo por último
+    last_seen_sync_at = Column(DateTime, nullable=True)
 
     sale = relationship("Sale", back_populates="vehicle", uselist=False)
 
+    __table_args__ = (
+        # Listagens por status paginadas por (preco, id)
+        Index("ix_vehicles_status_preco_id", "status", "preco", "id"),
+    )
+
 
 class Sale(Base):
     """
@@ -43,13 +50,101 @@ class Sale(Base):
     Inclui CPF do comprador e status do pagamento via webhook.
     """
     __tablename__ = "sales"
+    __table_args__ = (
+        # Varredura de vendas PENDENTE vencidas (SaleExpirySweeper) e
+        # listagem paginada filtrada por status
+        Index("ix_sales_status_data_venda", "status_pagamento", "data_venda", "id"),
+        # Listagem paginada por (data_venda, id), com e sem filtro de CPF
+        Index("ix_sales_data_venda_id", "data_venda", "id"),
+        Index("ix_sales_cpf_data_venda", "cpf_comprador", "data_venda", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), unique=True)
-    cpf_comprador = Column(String(14), nullable=False, index=True)
+    cpf_comprador = Column(String(14), nullable=False)
     codigo_pagamento = Column(String(36), unique=True, nullable=False, index=True)
     status_pagamento = Column(Enum(PaymentStatus), default=PaymentStatus.PENDENTE)
     data_venda = Column(DateTime, default=datetime.utcnow)
     valor_venda = Column(Float)
 
     vehicle = relationship("Vehicle", back_populates="sale")
+
+
+class VehicleStatusOutbox(Base):
+    """
+    Outbox de atualizações de status para o serviço principal.
+    Gravado na mesma transação da venda/webhook e entregue em segundo
+    plano pelo OutboxDispatcher, na ordem de criação por veículo.
+    Entradas que esgotam as tentativas ficam em dead_lettered_at.
+    """
+    __tablename__ = "vehicle_status_outbox"
+    __table_args__ = (
+        Index("ix_vehicle_status_outbox_pending", "dispatched_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    external_id = Column(Integer, nullable=False, index=True)
+    status = Column(Enum(VehicleStatus), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    dispatched_at = Column(DateTime, nullable=True)
+    # Recusada pelo serviço principal (4xx); /ops/outbox/requeue devolve à fila
+    dead_lettered_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+
+class SyncState(Base):
+    """
+    Estado persistente de jobs de sincronização (ex.: catálogo).
+    cursor guarda o próximo offset a buscar; owner/lease_expires_at
+    garantem que apenas uma réplica execute o job por vez.
+    """
+    __tablename__ = "sync_state"
+
+    name = Column(String, primary_key=True)
+    cursor = Column(Integer, default=0, nullable=False)
+    owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    run_started_at = Column(DateTime, nullable=True)
+    last_completed_at = Column(DateTime, nullable=True)
+    last_duration = Column(Float, nullable=True)
+    last_stats = Column(JSON, nullable=True)
+
+
+class IdempotencyKey(Base):
+    """
+    Respostas armazenadas por Idempotency-Key (POST /api/v1/sales/).
+    Gravada na mesma transação da venda; fingerprint identifica o corpo
+    da requisição original. Removida após expires_at.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class PaymentWebhookEvent(Base):
+    """
+    Fila durável de webhooks de pagamento aceitos de forma assíncrona.
+    Deduplicada por (codigo_pagamento, status); aplicada em lotes pelo
+    PaymentWebhookQueue, que marca processed_at na mesma transação.
+    """
+    __tablename__ = "payment_webhook_events"
+    __table_args__ = (
+        UniqueConstraint("codigo_pagamento", "status", name="uq_payment_webhook_events_codigo_status"),
+        Index("ix_payment_webhook_events_pending", "processed_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    codigo_pagamento = Column(String(36), nullable=False)
+    status = Column(Enum(PaymentStatus), nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
@@ -1,3 +1,3 @@
-from app.routers import vehicles, sales, webhook
+from app.routers import vehicles, sales, webhook, ops
 
-__all__ = ["vehicles", "sales", "webhook"]
+__all__ = ["vehicles", "sales", "webhook", "ops"]
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, Query, status
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.database import get_db
+from app.services.admission import vehicle_admission
+from app.services.finalized_payments import finalized_payments
+from app.services.listing_cache import listing_cache
+from app.services.outbox import outbox_dispatcher
+from app.services.sale_expiry import sale_expiry_sweeper
+from app.services.catalog_sync import catalog_sync
+from app.services.sale_service import vehicle_revalidator
+from app.services.vehicle_client import vehicle_client
+from app.services.webhook_queue import payment_webhook_queue
+
+router = APIRouter()
+
+
+@router.get("/vehicle-service")
+async def vehicle_service_status():
+    """
+    Estado da comunicação com o serviço principal de veículos.
+    
+    Retorna o estado do circuit breaker (closed, open ou half_open), o
+    saldo do orçamento global de retentativas, as revalidações condicionais
+    e os contadores do cache negativo de veículos inexistentes.
+    """
+    return vehicle_client.stats()
+
+
+@router.get("/vehicle-cache")
+async def vehicle_cache_status():
+    """
+    Estado do cache local de veículos.
+    
+    Retorna a janela de frescor configurada e as revalidações em
+    segundo plano agendadas, em andamento e com falha.
+    """
+    return {
+        "ttl_seconds": settings.VEHICLE_CACHE_TTL_SECONDS,
+        "stale_seconds": settings.VEHICLE_CACHE_STALE_SECONDS,
+        "revalidation": vehicle_revalidator.stats(),
+    }
+
+
+@router.get("/outbox")
+async def outbox_status(db: AsyncSession = Depends(get_db)):
+    """
+    Estado do outbox de status para o serviço principal.
+    
+    Retorna a quantidade de entregas pendentes, a idade da mais antiga e
+    os contadores do dispatcher em segundo plano.
+    """
+    return await outbox_dispatcher.pending_stats(db)
+
+
+@router.post("/outbox/requeue")
+async def requeue_outbox_dead_letters(
+    external_id: Optional[List[int]] = Query(None, description="Veículos a reenviar (todos se omitido)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Devolve à fila as entregas de status em dead letter.
+    
+    Use depois de corrigir a causa da recusa no serviço principal; as
+    entradas voltam a ser entregues pelo dispatcher na próxima rodada.
+    """
+    return {"requeued": await outbox_dispatcher.requeue_dead_letters(db, external_id)}
+
+
+@router.get("/catalog-sync")
+async def catalog_sync_status(db: AsyncSession = Depends(get_db)):
+    """
+    Estado da sincronização do catálogo do serviço principal.
+    
+    Retorna o progresso da execução atual (páginas, veículos lidos,
+    inseridos, atualizados), o cursor persistido e a duração e as
+    estatísticas da última execução concluída.
+    """
+    return await catalog_sync.status(db)
+
+
+@router.post("/catalog-sync", status_code=status.HTTP_202_ACCEPTED)
+async def trigger_catalog_sync():
+    """
+    Dispara uma sincronização do catálogo em segundo plano.
+    
+    Se uma execução já estiver em andamento, nenhuma nova é iniciada.
+    """
+    return {"started": catalog_sync.trigger()}
+
+
+@router.get("/sale-admission")
+async def sale_admission_status():
+    """
+    Estado da admissão de vendas por veículo.
+    
+    Retorna as vendas em andamento e aguardando por veículo, as admitidas,
+    as recusadas por veículo já reservado e as que esgotaram a espera.
+    """
+    return vehicle_admission.stats()
+
+
+@router.get("/webhook-queue")
+async def webhook_queue_status(db: AsyncSession = Depends(get_db)):
+    """
+    Estado da fila durável de webhooks de pagamento.
+    
+    Retorna a profundidade (eventos pendentes), o atraso do evento
+    pendente mais antigo e os contadores dos workers.
+    """
+    return await payment_webhook_queue.stats(db)
+
+
+@router.get("/finalized-payments")
+async def finalized_payments_status():
+    """
+    Estado do cache de pagamentos finalizados.
+    
+    Reentregas de webhooks com código já finalizado são respondidas sem
+    consultar o banco; hit_rate indica a fração de webhooks descartados
+    pelo cache.
+    """
+    return finalized_payments.stats()
+
+
+@router.get("/listing-cache")
+async def listing_cache_status():
+    """
+    Estado do cache das listagens de veículos.
+    
+    Retorna acertos, faltas, despejos e expirações das páginas em cache e
+    o número de invalidações por alterações de veículos.
+    """
+    return listing_cache.stats()
+
+
+@router.get("/sale-expiry")
+async def sale_expiry_status():
+    """
+    Estado da expiração de vendas PENDENTE.
+    
+    Retorna o prazo configurado, o total de vendas canceladas e a duração,
+    os lotes e as vendas canceladas da última varredura.
+    """
+    return sale_expiry_sweeper.stats()
@@ -1,17 +1,48 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
 
-from app.database import get_db
-from app.schemas.schemas import SaleCreate, SaleResponse, PaymentWebhook, PaymentWebhookResponse
-from app.services.sale_service import SaleService
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.database import get_db, get_session_factory
+from app.models.models import PaymentStatus
+from app.schemas.schemas import (
+    SaleCreate,
+    SaleFilters,
+    SaleResponse,
+    SaleBatchCreate,
+    SaleBatchResponse,
+    PaymentWebhook,
+    PaymentWebhookResponse,
+)
+from app.services.export import EXPORT_MEDIA_TYPES, export_rows
+from app.services.sale_service import SaleService, sale_export_query
 
 router = APIRouter()
 
 
+def sale_filters(
+    cpf_comprador: Optional[str] = Query(
+        None, pattern=r"^\d{3}\.?\d{3}\.?\d{3}-?\d{2}$", description="CPF do comprador (com ou sem pontuação)"
+    ),
+    status_pagamento: Optional[PaymentStatus] = Query(None, description="Status do pagamento"),
+    data_inicio: Optional[datetime] = Query(None, description="Vendas a partir desta data (inclusive)"),
+    data_fim: Optional[datetime] = Query(None, description="Vendas antes desta data (exclusive)"),
+) -> SaleFilters:
+    """Filtros da listagem de vendas lidos da query string"""
+    return SaleFilters(
+        cpf_comprador=cpf_comprador, status_pagamento=status_pagamento,
+        data_inicio=data_inicio, data_fim=data_fim,
+    )
+
+
 @router.post("/", response_model=SaleResponse, status_code=status.HTTP_201_CREATED)
 async def create_sale(
     sale_in: SaleCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -25,18 +56,84 @@ async def create_sale(
     
     A entidade processadora de pagamento deve usar o código de pagamento
     para confirmar ou cancelar via endpoint /webhook/pagamento.
+    
+    Com o header **Idempotency-Key**, retentativas com a mesma chave e o
+    mesmo corpo recebem a venda original (header Idempotent-Replayed: true);
+    a mesma chave com outro corpo retorna 422.
     """
     service = SaleService(db)
-    return await service.create_sale(sale_in)
+    if not idempotency_key:
+        return await service.create_sale(sale_in)
+    
+    body, replayed = await service.create_sale_idempotent(sale_in, idempotency_key)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+
+@router.post("/batch", response_model=SaleBatchResponse)
+async def create_sales_batch(
+    batch: SaleBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Efetua vendas em lote (pedidos de frota, até 500 itens).
+    
+    - **items**: lista de vendas (`vehicle_id`, `cpf_comprador`)
+    - **atomic**: se verdadeiro, nenhuma venda é registrada quando algum
+      item falha
+    
+    Retorna o resultado de cada item na ordem enviada, com o código HTTP
+    equivalente ao da venda individual (201, 400, 404, 409 ou 503; 424
+    para itens não registrados por falha de outro item no modo atômico).
+    """
+    service = SaleService(db)
+    return await service.create_sales_batch(batch)
 
 
 @router.get("/", response_model=List[SaleResponse])
-async def list_sales(db: AsyncSession = Depends(get_db)):
+async def list_sales(
+    response: Response,
+    filters: SaleFilters = Depends(sale_filters),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    limit: int = Query(settings.LISTING_PAGE_SIZE, ge=1, le=settings.LISTING_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Lista todas as vendas registradas.
+    Lista as vendas registradas, da mais recente para a mais antiga.
+    
+    Retorna páginas de até `limit` vendas; o header X-Next-Cursor traz o
+    cursor da próxima página.
+    
+    - **cpf_comprador**: CPF do comprador
+    - **status_pagamento**: PENDENTE, CONFIRMADO ou CANCELADO
+    - **data_inicio** / **data_fim**: período da venda (fim exclusivo)
     """
     service = SaleService(db)
-    return await service.get_sales()
+    sales, next_cursor = await service.get_sales(filters, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return sales
+
+
+@router.get("/export")
+async def export_sales(
+    filters: SaleFilters = Depends(sale_filters),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    session_factory=Depends(get_session_factory),
+):
+    """
+    Exporta as vendas em streaming (NDJSON ou CSV), em ordem cronológica.
+    
+    Aceita os mesmos filtros da listagem. A resposta é gerada bloco a
+    bloco a partir de um cursor do banco: a memória fica constante e o
+    primeiro byte sai sem esperar a leitura da tabela inteira.
+    """
+    return StreamingResponse(
+        export_rows(session_factory, sale_export_query(filters), SaleResponse, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="sales.{export_format}"'},
+    )
 
 
 @router.get("/{codigo_pagamento}", response_model=SaleResponse)
@@ -1,34 +1,133 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional
 
-from app.database import get_db
-from app.schemas.schemas import VehicleResponse
-from app.services.sale_service import VehicleService
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.database import get_db, get_session_factory
+from app.schemas.schemas import VehicleFilters, VehicleResponse
+from app.services.export import EXPORT_MEDIA_TYPES, export_rows
+from app.services.sale_service import VehicleService, vehicle_export_query
 from app.models.models import VehicleStatus
 
 router = APIRouter()
 
 
+def vehicle_filters(
+    marca: Optional[str] = Query(None, description="Marca (sem diferenciar maiúsculas)"),
+    modelo: Optional[str] = Query(None, description="Modelo (sem diferenciar maiúsculas)"),
+    ano_min: Optional[int] = Query(None, description="Ano mínimo"),
+    ano_max: Optional[int] = Query(None, description="Ano máximo"),
+    preco_min: Optional[float] = Query(None, ge=0, description="Preço mínimo"),
+    preco_max: Optional[float] = Query(None, ge=0, description="Preço máximo"),
+) -> VehicleFilters:
+    """Filtros das listagens de veículos lidos da query string"""
+    return VehicleFilters(
+        marca=marca, modelo=modelo, ano_min=ano_min, ano_max=ano_max,
+        preco_min=preco_min, preco_max=preco_max,
+    )
+
+
+def _page_response(body: bytes, next_cursor: str | None) -> Response:
+    """Resposta com o corpo JSON já serializado (listing_cache)"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/available", response_model=List[VehicleResponse])
-async def list_available_vehicles(db: AsyncSession = Depends(get_db)):
+async def list_available_vehicles(
+    filters: VehicleFilters = Depends(vehicle_filters),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    limit: int = Query(settings.LISTING_PAGE_SIZE, ge=1, le=settings.LISTING_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Lista veículos disponíveis para venda.
-    
+
     Retorna veículos com status DISPONIVEL, ordenados por preço
-    do mais barato para o mais caro.
+    do mais barato para o mais caro, em páginas de até `limit` itens.
+
+    - **marca** / **modelo**: filtro exato, sem diferenciar maiúsculas
+    - **ano_min** / **ano_max**, **preco_min** / **preco_max**: faixas
+    - **cursor**: valor do header X-Next-Cursor da página anterior
     """
     service = VehicleService(db)
-    return await service.get_available_vehicles()
+    body, next_cursor = await service.get_listing_page(
+        VehicleStatus.DISPONIVEL, filters, cursor, limit
+    )
+    return _page_response(body, next_cursor)
 
 
 @router.get("/sold", response_model=List[VehicleResponse])
-async def list_sold_vehicles(db: AsyncSession = Depends(get_db)):
+async def list_sold_vehicles(
+    filters: VehicleFilters = Depends(vehicle_filters),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    limit: int = Query(settings.LISTING_PAGE_SIZE, ge=1, le=settings.LISTING_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Lista veículos vendidos.
-    
+
     Retorna veículos com status VENDIDO, ordenados por preço
-    do mais barato para o mais caro.
+    do mais barato para o mais caro, em páginas de até `limit` itens.
+    Aceita os mesmos filtros e cursor de /available.
     """
     service = VehicleService(db)
-    return await service.get_sold_vehicles()
+    body, next_cursor = await service.get_listing_page(
+        VehicleStatus.VENDIDO, filters, cursor, limit
+    )
+    return _page_response(body, next_cursor)
+
+
+def _export_vehicles(
+    vehicle_status: VehicleStatus,
+    filters: VehicleFilters,
+    export_format: str,
+    session_factory,
+    filename: str,
+) -> StreamingResponse:
+    return StreamingResponse(
+        export_rows(
+            session_factory,
+            vehicle_export_query(vehicle_status, filters),
+            VehicleResponse,
+            export_format,
+        ),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+
+@router.get("/available/export")
+async def export_available_vehicles(
+    filters: VehicleFilters = Depends(vehicle_filters),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    session_factory=Depends(get_session_factory),
+):
+    """
+    Exporta todos os veículos disponíveis em streaming (NDJSON ou CSV).
+
+    Ordenados por preço, com os mesmos filtros da listagem. A resposta é
+    gerada bloco a bloco a partir de um cursor do banco, sem montar a
+    lista completa em memória.
+    """
+    return _export_vehicles(
+        VehicleStatus.DISPONIVEL, filters, export_format, session_factory, "vehicles-available"
+    )
+
+
+@router.get("/sold/export")
+async def export_sold_vehicles(
+    filters: VehicleFilters = Depends(vehicle_filters),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    session_factory=Depends(get_session_factory),
+):
+    """
+    Exporta todos os veículos vendidos em streaming (NDJSON ou CSV).
+
+    Ordenados por preço, com os mesmos filtros da listagem.
+    """
+    return _export_vehicles(
+        VehicleStatus.VENDIDO, filters, export_format, session_factory, "vehicles-sold"
+    )
@@ -2,8 +2,14 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas.schemas import PaymentWebhook, PaymentWebhookResponse
+from app.schemas.schemas import (
+    PaymentWebhook,
+    PaymentWebhookResponse,
+    PaymentWebhookBatch,
+    PaymentWebhookBatchResponse,
+)
 from app.services.sale_service import SaleService
+from app.services.webhook_queue import enqueue_payment_webhook, payment_webhook_queue
 
 router = APIRouter()
 
@@ -31,3 +37,38 @@ async def payment_webhook(
     service = SaleService(db)
     result = await service.process_payment_webhook(webhook_data)
     return PaymentWebhookResponse(**result)
+
+
+@router.post("/pagamento/batch", response_model=PaymentWebhookBatchResponse)
+async def payment_webhook_batch(
+    batch: PaymentWebhookBatch,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Webhook de pagamento em lote (até 1000 eventos).
+    
+    Aplica todos os eventos em uma única transação, com atualizações em
+    conjunto, e retorna o resultado de cada evento na ordem enviada
+    (200 aplicado, 400 já processado ou repetido no lote, 404 código
+    inexistente).
+    """
+    service = SaleService(db)
+    return await service.process_payment_webhooks(batch)
+
+
+@router.post("/pagamento/async", status_code=status.HTTP_202_ACCEPTED)
+async def payment_webhook_async(
+    webhook_data: PaymentWebhook,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Webhook de pagamento com confirmação imediata.
+    
+    O evento é gravado em uma fila durável e aplicado em segundo plano,
+    em lotes, com a mesma lógica de /webhook/pagamento. Reentregas do mesmo
+    código de pagamento e status são aceitas e descartadas (duplicate).
+    """
+    accepted = await enqueue_payment_webhook(db, webhook_data)
+    if accepted:
+        payment_webhook_queue.trigger()
+    return {"accepted": True, "duplicate": not accepted}
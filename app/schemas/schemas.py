@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from app.models.models import VehicleStatus, PaymentStatus
 import re
 
@@ -30,6 +30,16 @@ class VehicleSync(VehicleBase):
     data_cadastro: datetime
 
 
+class VehicleFilters(BaseModel):
+    """Filtros das listagens de veículos (query string)"""
+    marca: Optional[str] = Field(None, description="Marca (sem diferenciar maiúsculas)")
+    modelo: Optional[str] = Field(None, description="Modelo (sem diferenciar maiúsculas)")
+    ano_min: Optional[int] = Field(None, description="Ano mínimo")
+    ano_max: Optional[int] = Field(None, description="Ano máximo")
+    preco_min: Optional[float] = Field(None, ge=0, description="Preço mínimo")
+    preco_max: Optional[float] = Field(None, ge=0, description="Preço máximo")
+
+
 class SaleCreate(BaseModel):
     vehicle_id: int = Field(..., description="ID do veículo no serviço principal")
     cpf_comprador: str = Field(..., min_length=11, max_length=14, description="CPF do comprador")
@@ -80,14 +90,103 @@ class SaleResponse(BaseModel):
         from_attributes = True
 
 
+class SaleFilters(BaseModel):
+    """Filtros da listagem de vendas (query string)"""
+    cpf_comprador: Optional[str] = Field(None, description="CPF do comprador (com ou sem pontuação)")
+    status_pagamento: Optional[PaymentStatus] = Field(None, description="Status do pagamento")
+    data_inicio: Optional[datetime] = Field(None, description="Vendas a partir desta data (inclusive)")
+    data_fim: Optional[datetime] = Field(None, description="Vendas antes desta data (exclusive)")
+
+    @field_validator('cpf_comprador')
+    @classmethod
+    def normalize_cpf(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        cpf_numbers = re.sub(r'\D', '', v)
+        if len(cpf_numbers) != 11:
+            raise ValueError('CPF deve conter 11 dígitos')
+        # Mesmo formato gravado nas vendas
+        return f"{cpf_numbers[:3]}.{cpf_numbers[3:6]}.{cpf_numbers[6:9]}-{cpf_numbers[9:]}"
+
+    @field_validator('data_inicio', 'data_fim')
+    @classmethod
+    def to_naive_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        # data_venda é gravada em UTC sem fuso; datas com fuso são convertidas
+        if v is None or v.tzinfo is None:
+            return v
+        return v.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Máximo de itens por lote em POST /api/v1/sales/batch
+SALE_BATCH_MAX_ITEMS = 500
+
+
+class SaleBatchCreate(BaseModel):
+    """Schema para venda em lote (pedidos de frota)"""
+    items: list[SaleCreate] = Field(..., min_length=1, max_length=SALE_BATCH_MAX_ITEMS)
+    atomic: bool = Field(
+        False,
+        description="Se verdadeiro, nenhuma venda é registrada quando algum item falha"
+    )
+
+
+class SaleBatchItemResult(BaseModel):
+    index: int
+    vehicle_id: int
+    status_code: int
+    sale: Optional[SaleResponse] = None
+    detail: Optional[str] = None
+
+
+class SaleBatchResponse(BaseModel):
+    committed: bool
+    created: int
+    failed: int
+    results: list[SaleBatchItemResult]
+
+
 class PaymentWebhook(BaseModel):
     """Schema para webhook de confirmação de pagamento"""
     codigo_pagamento: str = Field(..., description="Código único do pagamento")
     status: PaymentStatus = Field(..., description="Status do pagamento: CONFIRMADO ou CANCELADO")
 
+    @field_validator('status')
+    @classmethod
+    def validate_final_status(cls, v: PaymentStatus) -> PaymentStatus:
+        # PENDENTE é o status inicial da venda, não uma transição do pagamento
+        if v == PaymentStatus.PENDENTE:
+            raise ValueError('Status do webhook deve ser CONFIRMADO ou CANCELADO')
+        return v
+
 
 class PaymentWebhookResponse(BaseModel):
     message: str
     codigo_pagamento: str
     status_pagamento: PaymentStatus
     vehicle_status: Optional[VehicleStatus] = None
+
+
+# Máximo de eventos por requisição em POST /webhook/pagamento/batch
+PAYMENT_WEBHOOK_BATCH_MAX_EVENTS = 1000
+
+
+class PaymentWebhookBatch(BaseModel):
+    """Schema para entrega em lote de webhooks de pagamento"""
+    events: list[PaymentWebhook] = Field(
+        ..., min_length=1, max_length=PAYMENT_WEBHOOK_BATCH_MAX_EVENTS
+    )
+
+
+class PaymentWebhookBatchItemResult(BaseModel):
+    index: int
+    codigo_pagamento: str
+    status_code: int
+    status_pagamento: Optional[PaymentStatus] = None
+    vehicle_status: Optional[VehicleStatus] = None
+    detail: Optional[str] = None
+
+
+class PaymentWebhookBatchResponse(BaseModel):
+    applied: int
+    failed: int
+    results: list[PaymentWebhookBatchItemResult]
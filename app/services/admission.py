@@ -0,0 +1,108 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+class VehicleAlreadyReserved(Exception):
+    """Veículo já reservado por outra venda"""
+
+
+class VehicleAdmissionBusy(Exception):
+    """Venda em andamento para o veículo não terminou dentro da espera (retentável)"""
+
+
+class VehicleAdmission:
+    """
+    Admissão de vendas por veículo dentro do processo.
+
+    Em uma rajada de vendas para o mesmo veículo apenas uma requisição
+    executa o fluxo de venda por vez; as demais aguardam até
+    wait_timeout segundos. Quando a venda em andamento reserva o
+    veículo, as que aguardavam (e as seguintes, por reserved_ttl
+    segundos) são recusadas sem consultar o banco nem o serviço
+    principal. Se a venda falhar, a próxima da fila segue; quem esgota a
+    espera recebe VehicleAdmissionBusy, pois o veículo ainda não foi
+    reservado.
+    """
+
+    def __init__(
+        self,
+        wait_timeout: float = settings.SALE_ADMISSION_WAIT_SECONDS,
+        reserved_ttl: float = settings.SALE_ADMISSION_RESERVED_TTL_SECONDS,
+        maxsize: int = settings.SALE_ADMISSION_MAX_SIZE,
+    ):
+        self.wait_timeout = wait_timeout
+        self._reserved = LRUCache(maxsize=maxsize, ttl=reserved_ttl)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._waiters: dict[int, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def is_reserved(self, external_id: int) -> bool:
+        return self._reserved.get(external_id) is not None
+
+    def mark_reserved(self, external_id: int) -> None:
+        """Registra que o veículo foi reservado (recusa vendas seguintes)"""
+        self._reserved.set(external_id, True)
+
+    def release(self, external_id: int) -> None:
+        """Esquece a reserva (ex.: pagamento cancelado devolveu o veículo)"""
+        self._reserved.pop(external_id)
+
+    def clear(self) -> None:
+        self._reserved.clear()
+
+    @asynccontextmanager
+    async def admit(self, external_id: int) -> AsyncIterator[None]:
+        """
+        Admite uma venda do veículo, uma por vez.
+
+        Raises:
+            VehicleAlreadyReserved: Se o veículo já foi reservado
+            VehicleAdmissionBusy: Se a venda em andamento não terminou
+                dentro de wait_timeout
+        """
+        if self.is_reserved(external_id):
+            self.rejected += 1
+            raise VehicleAlreadyReserved("Veículo já reservado por outra venda")
+
+        lock = self._locks.setdefault(external_id, asyncio.Lock())
+        self._waiters[external_id] = self._waiters.get(external_id, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise VehicleAdmissionBusy("Venda em andamento para o veículo; tente novamente")
+            try:
+                if self.is_reserved(external_id):
+                    self.rejected += 1
+                    raise VehicleAlreadyReserved("Veículo já reservado por outra venda")
+                self.admitted += 1
+                yield
+            finally:
+                lock.release()
+        finally:
+            self._waiters[external_id] -= 1
+            if not self._waiters[external_id]:
+                del self._waiters[external_id]
+                del self._locks[external_id]
+
+    def stats(self) -> dict:
+        return {
+            "in_progress": len(self._locks),
+            "waiting": sum(self._waiters.values()) - sum(
+                1 for lock in self._locks.values() if lock.locked()
+            ),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "reserved": self._reserved.stats(),
+        }
+
+
+vehicle_admission = VehicleAdmission()
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.database import AsyncSessionLocal
+from app.models.models import SyncState, Vehicle, VehicleStatus
+from app.services.listing_cache import LISTED_STATUSES, mark_listings_stale
+from app.services.outbox import pending_outbox_ids
+from app.services.resilience import request_deadline
+from app.services.vehicle_upsert import SYNCED_FIELDS, upsert_vehicles, vehicle_values
+from app.services.vehicle_client import vehicle_client
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SYNC_NAME = "catalog"
+
+# Disponíveis ausentes conferidos por consulta/get_vehicles
+MISSING_CHECK_CHUNK_SIZE = 1000
+
+
+class CatalogSyncService:
+    """
+    Sincronização incremental do catálogo de veículos disponíveis.
+
+    Percorre o catálogo do serviço principal em páginas lidas em modo
+    streaming, compara cada bloco com o cache local e grava apenas as
+    diferenças com um único upsert em lote (upsert_vehicles) por bloco.
+    O offset do próximo veículo é persistido em sync_state a cada commit,
+    de modo que uma execução interrompida continua de onde parou.
+
+    Ao final de uma passagem completa (iniciada do offset 0), veículos
+    DISPONIVEL no cache local que não apareceram no catálogo são conferidos
+    individualmente no serviço principal e marcados como VENDIDO apenas se
+    não existem mais. Veículos com status pendente no outbox não têm o status
+    alterado pela sincronização.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.page_size = settings.CATALOG_SYNC_PAGE_SIZE
+        self.chunk_size = settings.CATALOG_SYNC_CHUNK_SIZE
+        self.lease_seconds = settings.CATALOG_SYNC_LEASE_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.progress: dict = {"running": False}
+        self._lock = asyncio.Lock()
+        self._run_task: asyncio.Task | None = None
+        self.task = PeriodicTask(
+            "catalog-sync", self.run, settings.CATALOG_SYNC_INTERVAL_SECONDS
+        )
+
+    def start(self) -> None:
+        self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+        if self._run_task is not None:
+            self._run_task.cancel()
+            await asyncio.gather(self._run_task, return_exceptions=True)
+            self._run_task = None
+
+    def trigger(self) -> bool:
+        """
+        Solicita uma execução sob demanda em segundo plano.
+
+        Returns:
+            False se uma execução já está em andamento neste processo
+        """
+        if self._lock.locked():
+            return False
+        if self.task.running:
+            self.task.trigger()
+        elif self._run_task is None or self._run_task.done():
+            self._run_task = asyncio.create_task(self._run_detached())
+        return True
+
+    async def _run_detached(self) -> dict | None:
+        # A tarefa herda o contexto da requisição que a disparou; a
+        # sincronização não deve ficar presa ao prazo dessa requisição
+        request_deadline.set(None)
+        return await self.run()
+
+    async def run(self) -> dict | None:
+        """
+        Executa (ou retoma) uma passagem pelo catálogo.
+
+        Returns:
+            Estatísticas da execução ou None se outra execução (neste ou em
+            outro processo) detém o job
+        """
+        if self._lock.locked():
+            return None
+        async with self._lock:
+            async with self.session_factory() as db:
+                state = await self._claim(db)
+                if state is None:
+                    return None
+                try:
+                    return await self._run(db, state)
+                finally:
+                    self.progress["running"] = False
+                    await db.rollback()
+                    await db.execute(
+                        update(SyncState)
+                        .where(SyncState.name == CATALOG_SYNC_NAME, SyncState.owner == self.owner)
+                        .values(owner=None, lease_expires_at=None)
+                    )
+                    await db.commit()
+
+    async def _claim(self, db: AsyncSession) -> SyncState | None:
+        """Obtém o lease do job (apenas uma réplica executa por vez)"""
+        if await db.get(SyncState, CATALOG_SYNC_NAME) is None:
+            db.add(SyncState(name=CATALOG_SYNC_NAME, cursor=0))
+            try:
+                await db.commit()
+            except Exception:
+                await db.rollback()
+
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(SyncState)
+            .where(
+                SyncState.name == CATALOG_SYNC_NAME,
+                or_(SyncState.owner.is_(None), SyncState.lease_expires_at < now),
+            )
+            .values(owner=self.owner, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+        )
+        await db.commit()
+        if result.rowcount != 1:
+            return None
+        return await db.get(SyncState, CATALOG_SYNC_NAME, populate_existing=True)
+
+    async def _run(self, db: AsyncSession, state: SyncState) -> dict:
+        started = time.monotonic()
+        cursor = state.cursor or 0
+        full_pass = cursor == 0
+        if full_pass or state.run_started_at is None:
+            state.run_started_at = datetime.utcnow()
+        marker = state.run_started_at
+        stats = {
+            "pages": 0,
+            "fetched": 0,
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "invalid": 0,
+            "removed": 0,
+            "rechecked": 0,
+            "resumed_from": cursor,
+        }
+        self.progress = {"running": True, "cursor": cursor, "started_at": time.time(), **stats}
+
+        while True:
+            received = 0
+            async for chunk in vehicle_client.iter_available_vehicles(
+                self.chunk_size, skip=cursor, limit=self.page_size
+            ):
+                await self._apply_page(db, chunk, marker, stats)
+                received += len(chunk)
+                cursor += len(chunk)
+                stats["fetched"] += len(chunk)
+
+                state.cursor = cursor
+                state.lease_expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+                await db.commit()
+                self.progress.update(stats, cursor=cursor)
+            stats["pages"] += 1
+
+            # Página incompleta marca o fim; página maior que o limite indica
+            # que o serviço principal ignorou a paginação e enviou tudo
+            if received != self.page_size:
+                break
+
+        if full_pass:
+            stats["removed"] = await self._mark_missing(db, marker, stats)
+        else:
+            logger.info("Sincronização retomada do offset %d: remoção de ausentes ignorada", stats["resumed_from"])
+
+        duration = time.monotonic() - started
+        state.cursor = 0
+        state.last_completed_at = datetime.utcnow()
+        state.last_duration = duration
+        state.last_stats = stats
+        await db.commit()
+        logger.info("Sincronização do catálogo concluída em %.2fs: %s", duration, stats)
+        return {**stats, "duration": duration}
+
+    async def _apply_page(
+        self, db: AsyncSession, page: list[dict], marker: datetime, stats: dict
+    ) -> None:
+        """
+        Compara a página com o cache local e grava as diferenças em lote.
+
+        Todos os veículos da página recebem last_seen_sync_at = marker (início
+        da passagem), usado por _mark_missing para achar os ausentes.
+        """
+        incoming: dict[int, dict] = {}
+        for item in page:
+            try:
+                values = vehicle_values(item)
+            except (KeyError, ValueError, TypeError):
+                stats["invalid"] += 1
+                continue
+            incoming[values["external_id"]] = values
+        if not incoming:
+            return
+
+        result = await db.execute(
+            select(Vehicle).where(Vehicle.external_id.in_(incoming.keys()))
+        )
+        local = {v.external_id: v for v in result.scalars().all()}
+        pending = await pending_outbox_ids(db, incoming.keys())
+
+        rows = []
+        for external_id, values in incoming.items():
+            vehicle = local.get(external_id)
+            if vehicle is None:
+                stats["inserted"] += 1
+                rows.append(values)
+                continue
+            if external_id in pending:
+                # Status local aguardando entrega prevalece (como em upsert_vehicles)
+                values = {**values, "status": vehicle.status}
+            if any(getattr(vehicle, field) != values[field] for field in SYNCED_FIELDS):
+                stats["updated"] += 1
+                rows.append(values)
+            else:
+                stats["unchanged"] += 1
+
+        # Novos e alterados em um único INSERT ... ON CONFLICT DO UPDATE
+        await upsert_vehicles(db, rows, existing_loaded=True)
+        await db.execute(
+            update(Vehicle)
+            .where(Vehicle.external_id.in_(incoming.keys()))
+            .values(last_seen_sync_at=marker, updated_at=Vehicle.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _mark_missing(self, db: AsyncSession, marker: datetime, stats: dict) -> int:
+        """
+        Trata os disponíveis locais ausentes do catálogo.
+
+        A paginação por offset do serviço principal não é estável: vendas e
+        cadastros durante a passagem deslocam as páginas e podem esconder
+        veículos ainda disponíveis. Por isso cada ausente é conferido com
+        get_vehicles antes de qualquer alteração: os encontrados são
+        regravados com os dados atuais (rechecked) e apenas os inexistentes
+        (404) são marcados como VENDIDO. Falhas de comunicação deixam o
+        veículo como está.
+
+        Os ausentes são os DISPONIVEL sem last_seen_sync_at desta passagem,
+        lidos em blocos por id: a memória não cresce com o catálogo.
+
+        Returns:
+            Quantidade de veículos marcados como VENDIDO
+        """
+        removed = 0
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(Vehicle)
+                .where(
+                    Vehicle.status == VehicleStatus.DISPONIVEL,
+                    or_(
+                        Vehicle.last_seen_sync_at.is_(None),
+                        Vehicle.last_seen_sync_at < marker,
+                    ),
+                    Vehicle.id > last_id,
+                )
+                .order_by(Vehicle.id)
+                .limit(MISSING_CHECK_CHUNK_SIZE)
+            )
+            missing = result.scalars().all()
+            if not missing:
+                break
+            last_id = missing[-1].id
+            chunk = [row.external_id for row in missing]
+            pending = await pending_outbox_ids(db, chunk)
+            chunk = [external_id for external_id in chunk if external_id not in pending]
+            if not chunk:
+                continue
+
+            fetched = await vehicle_client.get_vehicles(chunk)
+            rows = []
+            not_found = []
+            for external_id in chunk:
+                item = fetched.get(external_id) or {}
+                if item.get("data"):
+                    try:
+                        rows.append(vehicle_values(item["data"]))
+                    except (KeyError, ValueError, TypeError):
+                        stats["invalid"] += 1
+                elif item.get("error") == "not_found":
+                    not_found.append(external_id)
+            if rows:
+                await upsert_vehicles(db, rows, existing_loaded=True)
+                stats["rechecked"] += len(rows)
+            if not_found:
+                result = await db.execute(
+                    update(Vehicle)
+                    .where(
+                        Vehicle.external_id.in_(not_found),
+                        Vehicle.status == VehicleStatus.DISPONIVEL,
+                    )
+                    .values(status=VehicleStatus.VENDIDO, updated_at=datetime.utcnow())
+                    .returning(Vehicle.marca, Vehicle.modelo)
+                    .execution_options(synchronize_session=False)
+                )
+                for marca, modelo in result.all():
+                    removed += 1
+                    mark_listings_stale(db, LISTED_STATUSES, marca, modelo)
+            await db.commit()
+        return removed
+
+    async def status(self, db: AsyncSession) -> dict:
+        """Progresso da execução atual e resultado da última execução"""
+        state = await db.get(SyncState, CATALOG_SYNC_NAME, populate_existing=True)
+        return {
+            "progress": self.progress,
+            "cursor": state.cursor if state else 0,
+            "owner": state.owner if state else None,
+            "last_completed_at": state.last_completed_at if state else None,
+            "last_duration": state.last_duration if state else None,
+            "last_stats": state.last_stats if state else None,
+            "scheduler": self.task.stats(),
+        }
+
+
+catalog_sync = CatalogSyncService()
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+# Formatos de exportação: media type de cada um
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _csv_chunk(rows: list[list]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+async def export_rows(
+    session_factory,
+    stmt,
+    schema: type[BaseModel],
+    export_format: str,
+) -> AsyncIterator[str]:
+    """
+    Exporta o resultado de um SELECT em NDJSON ou CSV, bloco a bloco.
+
+    Lê com cursor do lado do servidor (stream + yield_per), em blocos de
+    EXPORT_BATCH_SIZE linhas, e entrega cada bloco já serializado: a
+    memória fica constante e o primeiro byte sai logo após o primeiro
+    bloco, independente do tamanho da tabela.
+
+    Usa sessão própria (session_factory), pois a resposta continua sendo
+    enviada depois que as dependências da requisição foram encerradas.
+
+    Args:
+        session_factory: Fábrica de sessões do banco
+        stmt: SELECT das colunas de schema
+        schema: Schema de resposta usado para serializar cada linha
+        export_format: "ndjson" ou "csv"
+    """
+    fields = list(schema.model_fields)
+    if export_format == "csv":
+        yield _csv_chunk([fields])
+
+    async with session_factory() as session:
+        result = await session.stream(
+            stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            items = [
+                schema.model_validate(row._mapping).model_dump(mode="json")
+                for row in partition
+            ]
+            if export_format == "csv":
+                yield _csv_chunk([[item[field] for field in fields] for item in items])
+            else:
+                yield "".join(
+                    json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    for item in items
+                )
@@ -0,0 +1,45 @@
+import logging
+from sqlalchemy.future import select
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.models.models import PaymentStatus, Sale
+
+logger = logging.getLogger(__name__)
+
+# Códigos de pagamento já finalizados (CONFIRMADO/CANCELADO) -> status.
+# Um pagamento finalizado nunca volta a PENDENTE, então não há expiração:
+# reentregas conhecidas são respondidas sem consultar o banco.
+finalized_payments = LRUCache(maxsize=settings.FINALIZED_PAYMENTS_CACHE_SIZE)
+
+# Status que encerram o pagamento
+FINAL_PAYMENT_STATUSES = (PaymentStatus.CONFIRMADO, PaymentStatus.CANCELADO)
+
+
+def remember_finalized(codigo_pagamento: str, payment_status: PaymentStatus) -> None:
+    """Lembra o código se o status é final (PENDENTE nunca é guardado)"""
+    if payment_status in FINAL_PAYMENT_STATUSES:
+        finalized_payments.set(codigo_pagamento, payment_status)
+
+
+async def warm_finalized_payments(session_factory=AsyncSessionLocal) -> int:
+    """
+    Carrega os pagamentos finalizados mais recentes no cache.
+
+    Returns:
+        Quantidade de códigos carregados
+    """
+    async with session_factory() as session:
+        result = await session.execute(
+            select(Sale.codigo_pagamento, Sale.status_pagamento)
+            .where(Sale.status_pagamento.in_(FINAL_PAYMENT_STATUSES))
+            .order_by(Sale.data_venda.desc())
+            .limit(finalized_payments.maxsize)
+        )
+        rows = result.all()
+    # Do mais antigo ao mais recente: os recentes ficam no topo do LRU
+    for codigo_pagamento, payment_status in reversed(rows):
+        finalized_payments.set(codigo_pagamento, payment_status)
+    logger.info("Cache de pagamentos finalizados aquecido com %d códigos", len(rows))
+    return len(rows)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.database import AsyncSessionLocal
+from app.models.models import IdempotencyKey
+from app.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Requisições em andamento por (Idempotency-Key, fingerprint); duplicatas
+# concorrentes aguardam a original
+idempotency_flight = SingleFlight()
+
+
+def request_fingerprint(payload: dict) -> str:
+    """SHA-256 do corpo da requisição em JSON canônico"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def get_stored_response(db: AsyncSession, key: str) -> IdempotencyKey | None:
+    """
+    Busca a resposta armazenada para a chave.
+
+    Uma chave expirada ainda não removida é apagada (sem commit) para que
+    possa ser reutilizada na mesma transação.
+    """
+    stored = await db.get(IdempotencyKey, key, populate_existing=True)
+    if stored is not None and stored.expires_at <= datetime.utcnow():
+        await db.delete(stored)
+        return None
+    return stored
+
+
+def store_response(
+    db: AsyncSession, key: str, fingerprint: str, status_code: int, response: dict
+) -> IdempotencyKey:
+    """
+    Registra a resposta da chave.
+
+    Não faz commit: a resposta é gravada na mesma transação da operação,
+    e uma chave repetida falha no commit pela chave primária.
+    """
+    entry = IdempotencyKey(
+        key=key,
+        fingerprint=fingerprint,
+        status_code=status_code,
+        response=response,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+    )
+    db.add(entry)
+    return entry
+
+
+async def purge_expired_keys(session_factory=AsyncSessionLocal) -> int:
+    """
+    Remove as chaves expiradas.
+
+    Returns:
+        Quantidade de chaves removidas
+    """
+    async with session_factory() as session:
+        result = await session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info("Chaves de idempotência expiradas removidas: %d", result.rowcount)
+    return result.rowcount
+
+
+idempotency_purger = PeriodicTask(
+    "idempotency-purge", purge_expired_keys, settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+)
@@ -0,0 +1,74 @@
+import json
+
+
+class JsonArrayStreamParser:
+    """
+    Parser incremental de um array JSON de nível superior.
+
+    Recebe o corpo da resposta em pedaços (feed) e devolve os elementos
+    do array assim que estão completos, sem materializar o corpo inteiro.
+    A memória usada é proporcional ao maior elemento, não ao array.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> list:
+        """
+        Adiciona um pedaço do corpo e retorna os elementos completos.
+
+        Raises:
+            ValueError: Se o corpo não for um array JSON válido
+        """
+        self._buffer += text
+        items = []
+        pos = 0
+        buffer = self._buffer
+        while not self._finished:
+            pos = self._skip_whitespace(buffer, pos)
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if not self._started:
+                if char != "[":
+                    raise ValueError("Resposta não é um array JSON")
+                self._started = True
+                pos += 1
+                continue
+            if char == ",":
+                pos += 1
+                continue
+            if char == "]":
+                self._finished = True
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto: aguarda o próximo pedaço
+                break
+            if end >= len(buffer) and not isinstance(item, (dict, list, str)):
+                # Números/literais no fim do buffer podem estar truncados
+                break
+            items.append(item)
+            pos = end
+        self._buffer = buffer[pos:]
+        return items
+
+    def close(self) -> None:
+        """Valida que o array foi encerrado"""
+        if not self._finished:
+            raise ValueError("Array JSON incompleto")
+
+    @staticmethod
+    def _skip_whitespace(buffer: str, pos: int) -> int:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        return pos
@@ -0,0 +1,147 @@
+from typing import Any, Hashable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.models import VehicleStatus
+
+# Alterações, em session.info, de veículos listados feitas pela transação
+_STALE_KEY = "vehicle_listings_stale"
+
+# Escopo de uma alteração: (status, marca, modelo); marca/modelo None
+# atinge as páginas do status com qualquer filtro
+ListingScope = tuple[VehicleStatus, Optional[str], Optional[str]]
+
+# Status com listagem; reserva e liberação movem o veículo entre elas
+LISTED_STATUSES = (VehicleStatus.DISPONIVEL, VehicleStatus.VENDIDO)
+
+
+def listing_key(vehicle_status: VehicleStatus, filters: dict, cursor, limit: int) -> tuple:
+    """Chave de uma página da listagem (status, filtros, cursor, limite)"""
+    return (vehicle_status, tuple(filters.items()), cursor, limit)
+
+
+def _affects(scope: ListingScope, key: tuple) -> bool:
+    vehicle_status, marca, modelo = scope
+    if key[0] != vehicle_status:
+        return False
+    filters = dict(key[1])
+    for field, value in (("marca", marca), ("modelo", modelo)):
+        wanted = filters.get(field)
+        if wanted and value is not None and wanted.lower() != value.lower():
+            return False
+    return True
+
+
+class ListingCache:
+    """
+    Cache em processo das páginas das listagens de veículos.
+
+    Guarda o corpo JSON já serializado de cada página por chave de
+    status/filtros/cursor/limite, em um LRU limitado por tamanho. Uma
+    alteração de veículo confirmada neste processo descarta apenas as
+    páginas que podem contê-lo: as do status anterior e do novo, e, nas
+    filtradas por marca/modelo, só as da marca/modelo do veículo. O TTL
+    limita a defasagem em relação a alterações feitas por outras réplicas.
+
+    Cada invalidação avança a geração dos status atingidos: uma página lida
+    antes da invalidação e gravada depois dela é descartada em vez de
+    reintroduzir dados antigos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self._status_generation: dict[VehicleStatus, int] = {}
+        self.invalidations = 0
+        self.invalidated_pages = 0
+
+    def generation_for(self, vehicle_status: VehicleStatus) -> int:
+        """Geração das páginas do status (lida antes de montar a página)"""
+        return self._status_generation.get(vehicle_status, 0)
+
+    def get(self, key: Hashable) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: tuple, value: Any, generation: int) -> bool:
+        """
+        Grava a página se nenhuma invalidação do seu status ocorreu desde
+        `generation`.
+
+        Returns:
+            False se a página foi descartada por estar desatualizada
+        """
+        if generation != self.generation_for(key[0]):
+            return False
+        self._cache.set(key, value)
+        return True
+
+    def invalidate(self, scopes: Iterable[ListingScope] | None = None) -> None:
+        """Descarta as páginas atingidas pelos escopos (todas se None)"""
+        self.generation += 1
+        self.invalidations += 1
+        if scopes is None:
+            scopes = [(vehicle_status, None, None) for vehicle_status in LISTED_STATUSES]
+        scopes = set(scopes)
+        for vehicle_status, _, _ in scopes:
+            self._status_generation[vehicle_status] = self.generation
+        for key in self._cache.keys():
+            if any(_affects(scope, key) for scope in scopes):
+                self._cache.pop(key)
+                self.invalidated_pages += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "ttl": self._cache.ttl,
+            "generation": self.generation,
+            "invalidations": self.invalidations,
+            "invalidated_pages": self.invalidated_pages,
+        }
+
+
+listing_cache = ListingCache(
+    maxsize=settings.LISTING_CACHE_MAX_SIZE,
+    ttl=settings.LISTING_CACHE_TTL_SECONDS,
+)
+
+
+def mark_listings_stale(
+    db: AsyncSession | Session,
+    statuses: Iterable[VehicleStatus],
+    marca: str | None = None,
+    modelo: str | None = None,
+) -> None:
+    """
+    Registra que a transação da sessão alterou veículos das listagens.
+
+    Args:
+        db: Sessão da transação
+        statuses: Status cujas listagens mudaram (anterior e novo)
+        marca, modelo: Do veículo alterado; None atinge qualquer filtro
+
+    As páginas são descartadas apenas quando a transação é confirmada
+    (commit), para que uma leitura concorrente não grave de novo a versão
+    anterior.
+    """
+    scopes = db.info.setdefault(_STALE_KEY, set())
+    for vehicle_status in statuses:
+        scopes.add((vehicle_status, marca, modelo))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    scopes = session.info.pop(_STALE_KEY, None)
+    if scopes:
+        listing_cache.invalidate(scopes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_STALE_KEY, None)
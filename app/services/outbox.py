@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.database import AsyncSessionLocal
+from app.models.models import SyncState, VehicleStatus, VehicleStatusOutbox
+from app.services.vehicle_client import VehicleStatusRejected, vehicle_client
+
+logger = logging.getLogger(__name__)
+
+# Lease (sync_state) que garante um único dispatcher entre réplicas
+OUTBOX_LEASE_NAME = "outbox-dispatcher"
+
+
+def enqueue_status_update(
+    db: AsyncSession, external_id: int, vehicle_status: VehicleStatus
+) -> VehicleStatusOutbox:
+    """
+    Registra no outbox a atualização de status para o serviço principal.
+
+    Não faz commit: a entrada é gravada na mesma transação do chamador.
+    """
+    entry = VehicleStatusOutbox(external_id=external_id, status=vehicle_status)
+    db.add(entry)
+    return entry
+
+
+async def enqueue_status_updates(
+    db: AsyncSession, updates: list[tuple[int, VehicleStatus]]
+) -> None:
+    """
+    Registra várias atualizações de status com um único INSERT em lote.
+
+    Não faz commit: as entradas são gravadas na mesma transação do chamador.
+    """
+    if not updates:
+        return
+    await db.execute(
+        insert(VehicleStatusOutbox),
+        [
+            {"external_id": external_id, "status": vehicle_status}
+            for external_id, vehicle_status in updates
+        ],
+    )
+
+
+def pending_condition(entry=VehicleStatusOutbox):
+    """Entradas ainda a entregar (nem entregues nem em dead letter)"""
+    return entry.dispatched_at.is_(None) & entry.dead_lettered_at.is_(None)
+
+
+def pending_status_exists(external_id_column):
+    """EXISTS de entrada pendente no outbox para o veículo (subconsulta correlacionada)"""
+    return (
+        select(VehicleStatusOutbox.id)
+        .where(
+            VehicleStatusOutbox.external_id == external_id_column,
+            pending_condition(),
+        )
+        .exists()
+    )
+
+
+async def pending_outbox_ids(db: AsyncSession, external_ids) -> set[int]:
+    """Veículos, entre external_ids, com status aguardando entrega no outbox"""
+    result = await db.execute(
+        select(VehicleStatusOutbox.external_id)
+        .where(
+            pending_condition(),
+            VehicleStatusOutbox.external_id.in_(external_ids),
+        )
+    )
+    return set(result.scalars().all())
+
+
+class OutboxDispatcher:
+    """
+    Entrega as atualizações de status do outbox ao serviço principal.
+
+    A cada rodada lê, em ordem de criação, a entrada pendente mais antiga
+    de cada veículo cujo backoff já venceu (a cabeça da fila do veículo) e
+    as demais entradas pendentes desses veículos; envia apenas o status
+    mais recente de cada veículo (o PUT de status é idempotente). Veículos
+    em backoff ficam fora do SELECT, então não ocupam o lote, e a ordem por
+    veículo é preservada.
+
+    Falhas retentáveis (circuito aberto, prazo, timeout, 5xx) são reenviadas
+    indefinidamente, com backoff limitado a OUTBOX_RETRY_BACKOFF_MAX: uma
+    indisponibilidade longa do serviço principal só atrasa a entrega. Apenas
+    recusas do serviço principal (4xx) levam as entradas do veículo para
+    dead letter (dead_lettered_at); requeue_dead_letters as devolve à fila.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.concurrency = settings.VEHICLE_CLIENT_BATCH_CONCURRENCY
+        self.retry_backoff = settings.OUTBOX_RETRY_BACKOFF
+        self.retry_backoff_max = settings.OUTBOX_RETRY_BACKOFF_MAX
+        self.lease_seconds = settings.OUTBOX_LEASE_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.dispatched = 0
+        self.failed_attempts = 0
+        self.dead_lettered = 0
+        self.task = PeriodicTask(
+            "outbox-dispatcher",
+            self.dispatch_pending,
+            settings.OUTBOX_DISPATCH_INTERVAL_SECONDS,
+        )
+
+    def start(self) -> None:
+        self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+
+    def trigger(self) -> None:
+        """Antecipa a próxima rodada (chamado após gravar entradas novas)"""
+        self.task.trigger()
+
+    async def dispatch_pending(self) -> int:
+        """
+        Entrega lotes até esvaziar as entradas pendentes e vencidas.
+
+        Returns:
+            Quantidade de entradas marcadas como entregues
+        """
+        total = 0
+        while True:
+            fetched, delivered = await self.dispatch_once()
+            total += delivered
+            if fetched < self.batch_size or delivered == 0:
+                return total
+
+    async def _due_groups(
+        self, session: AsyncSession, now: datetime
+    ) -> dict[int, list[VehicleStatusOutbox]]:
+        """Entradas pendentes, por veículo, dos veículos cuja cabeça venceu"""
+        earlier = aliased(VehicleStatusOutbox)
+        heads = await session.execute(
+            select(VehicleStatusOutbox.external_id)
+            .where(
+                pending_condition(),
+                or_(
+                    VehicleStatusOutbox.next_attempt_at.is_(None),
+                    VehicleStatusOutbox.next_attempt_at <= now,
+                ),
+                ~select(earlier.id)
+                .where(
+                    earlier.external_id == VehicleStatusOutbox.external_id,
+                    earlier.id < VehicleStatusOutbox.id,
+                    pending_condition(earlier),
+                )
+                .exists(),
+            )
+            .order_by(VehicleStatusOutbox.id)
+            .limit(self.batch_size)
+        )
+        external_ids = heads.scalars().all()
+        if not external_ids:
+            return {}
+
+        result = await session.execute(
+            select(VehicleStatusOutbox)
+            .where(
+                pending_condition(),
+                VehicleStatusOutbox.external_id.in_(external_ids),
+            )
+            .order_by(VehicleStatusOutbox.id)
+        )
+        groups: dict[int, list[VehicleStatusOutbox]] = {
+            external_id: [] for external_id in external_ids
+        }
+        for entry in result.scalars().all():
+            groups[entry.external_id].append(entry)
+        return groups
+
+    async def _claim_lease(self) -> bool:
+        """Obtém o lease do dispatcher (apenas uma réplica entrega por vez)"""
+        async with self.session_factory() as session:
+            if await session.get(SyncState, OUTBOX_LEASE_NAME) is None:
+                session.add(SyncState(name=OUTBOX_LEASE_NAME, cursor=0))
+                try:
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+
+            now = datetime.utcnow()
+            result = await session.execute(
+                update(SyncState)
+                .where(
+                    SyncState.name == OUTBOX_LEASE_NAME,
+                    or_(SyncState.owner.is_(None), SyncState.lease_expires_at < now),
+                )
+                .values(
+                    owner=self.owner,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                )
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def _release_lease(self) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                update(SyncState)
+                .where(SyncState.name == OUTBOX_LEASE_NAME, SyncState.owner == self.owner)
+                .values(owner=None, lease_expires_at=None)
+            )
+            await session.commit()
+
+    async def dispatch_once(self) -> tuple[int, int]:
+        """
+        Executa uma rodada de entrega.
+
+        As entradas são lidas em uma transação curta, os PUTs ao serviço
+        principal são feitos fora de qualquer transação (sem conexão do
+        pool presa enquanto o serviço principal responde) e os resultados
+        são gravados em uma nova transação. O lease em sync_state garante
+        um único dispatcher entre réplicas.
+
+        Returns:
+            Tupla (veículos lidos, entradas entregues)
+        """
+        if not await self._claim_lease():
+            return 0, 0
+        try:
+            async with self.session_factory() as session:
+                due = {
+                    external_id: ([entry.id for entry in group], group[-1].status)
+                    for external_id, group in (
+                        await self._due_groups(session, datetime.utcnow())
+                    ).items()
+                }
+                await session.commit()
+            if not due:
+                return 0, 0
+
+            semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+            async def deliver(external_id: int, vehicle_status: VehicleStatus):
+                async with semaphore:
+                    try:
+                        ok = await vehicle_client.update_vehicle_status(
+                            external_id, vehicle_status.value
+                        )
+                    except VehicleStatusRejected as e:
+                        return external_id, False, str(e)
+                return external_id, ok, None
+
+            outcomes = await asyncio.gather(
+                *(deliver(external_id, vehicle_status)
+                  for external_id, (_, vehicle_status) in due.items())
+            )
+            delivered = await self._record_outcomes(due, outcomes)
+            self.dispatched += delivered
+            return len(due), delivered
+        finally:
+            await self._release_lease()
+
+    async def _record_outcomes(
+        self,
+        due: dict[int, tuple[list[int], VehicleStatus]],
+        outcomes: list[tuple[int, bool, str | None]],
+    ) -> int:
+        """Grava entregas, backoffs e dead letters da rodada; retorna as entregues"""
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(VehicleStatusOutbox).where(
+                    VehicleStatusOutbox.id.in_(
+                        [entry_id for ids, _ in due.values() for entry_id in ids]
+                    )
+                )
+            )
+            entries = {entry.id: entry for entry in result.scalars().all()}
+
+            delivered = 0
+            for external_id, ok, rejection in outcomes:
+                group = [entries[entry_id] for entry_id in due[external_id][0]]
+                if ok:
+                    for entry in group:
+                        entry.dispatched_at = now
+                    delivered += len(group)
+                    continue
+
+                head = group[0]
+                head.attempts = (head.attempts or 0) + 1
+                self.failed_attempts += 1
+                if rejection is not None:
+                    head.last_error = f"Recusado pelo serviço principal: {rejection}"
+                    for entry in group:
+                        entry.dead_lettered_at = now
+                    self.dead_lettered += len(group)
+                    logger.error(
+                        "Status do veículo %s recusado pelo serviço principal (%s): dead letter",
+                        external_id, rejection
+                    )
+                    continue
+                head.last_error = "Falha ao atualizar status no serviço principal"
+                head.next_attempt_at = now + timedelta(
+                    seconds=min(
+                        self.retry_backoff_max,
+                        self.retry_backoff * (2 ** (head.attempts - 1)),
+                    )
+                )
+                logger.warning(
+                    "Falha ao entregar status do veículo %s (tentativa %d)",
+                    external_id, head.attempts
+                )
+
+            await session.commit()
+            return delivered
+
+    async def requeue_dead_letters(
+        self, db: AsyncSession, external_ids: list[int] | None = None
+    ) -> int:
+        """
+        Devolve à fila as entradas em dead letter.
+
+        Args:
+            db: Sessão do banco
+            external_ids: Veículos a reenviar (None para todos)
+
+        Returns:
+            Quantidade de entradas devolvidas à fila
+        """
+        stmt = (
+            update(VehicleStatusOutbox)
+            .where(VehicleStatusOutbox.dead_lettered_at.is_not(None))
+            .values(dead_lettered_at=None, attempts=0, next_attempt_at=None)
+        )
+        if external_ids:
+            stmt = stmt.where(VehicleStatusOutbox.external_id.in_(external_ids))
+        result = await db.execute(stmt)
+        await db.commit()
+        if result.rowcount:
+            self.trigger()
+        return result.rowcount
+
+    async def pending_stats(self, db: AsyncSession) -> dict:
+        """Profundidade, idade da entrada pendente mais antiga e dead letters do outbox"""
+        result = await db.execute(
+            select(func.count(), func.min(VehicleStatusOutbox.created_at))
+            .where(pending_condition())
+        )
+        pending, oldest = result.one()
+        dead_lettered = await db.scalar(
+            select(func.count())
+            .select_from(VehicleStatusOutbox)
+            .where(VehicleStatusOutbox.dead_lettered_at.is_not(None))
+        )
+        return {
+            "pending": pending,
+            "oldest_pending_age": (
+                (datetime.utcnow() - oldest).total_seconds() if oldest else None
+            ),
+            "dead_lettered": dead_lettered,
+            "dispatched": self.dispatched,
+            "failed_attempts": self.failed_attempts,
+            "dispatcher": self.task.stats(),
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
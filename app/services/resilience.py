@@ -0,0 +1,171 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+# Prazo absoluto (time.monotonic) da requisição HTTP em andamento.
+# Definido pelo middleware em app/main.py; None fora de uma requisição.
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos restantes até o prazo da requisição atual (None se não houver)"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Backoff exponencial com jitter completo para a tentativa informada"""
+    return random.uniform(0, min(maximum, base * (2 ** (attempt - 1))))
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+class VehicleServiceUnavailable(Exception):
+    """Serviço principal indisponível (circuito aberto, prazo ou tentativas esgotados)"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker para chamadas ao serviço principal.
+
+    - closed: chamadas liberadas; falhas consecutivas são contadas
+    - open: chamadas falham imediatamente até recovery_timeout expirar
+    - half_open: uma chamada de teste é liberada; sucesso fecha o circuito,
+      falha o reabre. Uma chamada de teste encerrada sem resultado
+      (cancelamento, prazo) libera a vaga com release_probe; se nem isso
+      ocorrer, a vaga expira após probe_timeout (quando informado).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        recovery_timeout: float,
+        probe_timeout: Optional[float] = None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._probe_owner: Optional[asyncio.Task] = None
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and (
+            time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Indica se uma chamada pode ser feita agora"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and (
+            not self._probe_in_flight
+            or (
+                self.probe_timeout is not None
+                and time.monotonic() - self._probe_started_at >= self.probe_timeout
+            )
+        ):
+            self._probe_in_flight = True
+            self._probe_started_at = time.monotonic()
+            self._probe_owner = _current_task()
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self) -> None:
+        """
+        Libera a vaga da chamada de teste da tarefa atual sem registrar
+        resultado (chamada cancelada, prazo esgotado, consumidor que parou
+        de ler). Não faz nada se a tarefa atual não detém a vaga.
+        """
+        if self._probe_in_flight and self._probe_owner is _current_task():
+            self._probe_in_flight = False
+            self._probe_owner = None
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        state = self.state
+        retry_in = None
+        if state == self.OPEN:
+            retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_in": retry_in,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Orçamento global de retentativas.
+
+    Cada chamada deposita `ratio` fichas (até `max_tokens`) e cada
+    retentativa consome uma ficha, limitando as retentativas a uma fração
+    do tráfego e evitando que um serviço degradado seja sobrecarregado.
+    """
+
+    def __init__(self, ratio: float, min_tokens: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min(min_tokens, max_tokens)
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def snapshot(self) -> dict:
+        return {
+            "tokens": round(self._tokens, 2),
+            "ratio": self.ratio,
+            "max_tokens": self.max_tokens,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable
+
+from app.services.resilience import request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRevalidator:
+    """
+    Executa revalidações do cache local em segundo plano.
+
+    Cada chave tem no máximo uma revalidação em andamento; pedidos
+    repetidos enquanto ela roda são ignorados.
+    """
+
+    def __init__(self, refresh: Callable[[Hashable], Awaitable[object]]):
+        self._refresh = refresh
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self.scheduled = 0
+        self.failed = 0
+
+    def schedule(self, key: Hashable) -> bool:
+        """
+        Agenda a revalidação da chave.
+
+        Returns:
+            True se uma nova revalidação foi agendada
+        """
+        if key in self._tasks:
+            return False
+        task = asyncio.create_task(self._run(key))
+        self._tasks[key] = task
+        self.scheduled += 1
+        return True
+
+    async def _run(self, key: Hashable) -> None:
+        # A tarefa herda o contexto da requisição que a agendou; a
+        # revalidação não deve ficar presa ao prazo dessa requisição
+        request_deadline.set(None)
+        try:
+            await self._refresh(key)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Falha ao revalidar %s em segundo plano: %s", key, e)
+        finally:
+            self._tasks.pop(key, None)
+
+    async def wait(self) -> None:
+        """Aguarda as revalidações em andamento"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Cancela as revalidações em andamento (chamado no shutdown)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "scheduled": self.scheduled,
+            "failed": self.failed,
+        }
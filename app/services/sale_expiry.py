@@ -0,0 +1,122 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.database import AsyncSessionLocal, try_advisory_xact_lock
+from app.models.models import PaymentStatus, Sale
+from app.schemas.schemas import PAYMENT_WEBHOOK_BATCH_MAX_EVENTS, PaymentWebhook, PaymentWebhookBatch
+from app.services.sale_service import SaleService
+
+logger = logging.getLogger(__name__)
+
+# Chave do advisory lock que garante uma única varredura entre réplicas
+SALE_EXPIRY_LOCK_KEY = 0x0B0C_0002
+
+
+class SaleExpirySweeper:
+    """
+    Cancela vendas PENDENTE cujo webhook de pagamento não chegou.
+
+    A cada rodada busca, pelo índice (status_pagamento, data_venda), lotes
+    de vendas PENDENTE mais antigas que SALE_PENDING_TTL_SECONDS e os
+    cancela com SaleService.process_payment_webhooks: transição condicional
+    (um webhook que chegue no meio prevalece), liberação dos veículos em
+    um único UPDATE e entradas no outbox para o serviço principal. Cada
+    lote roda sob advisory lock, de modo que apenas uma réplica varre
+    por vez.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.pending_ttl = settings.SALE_PENDING_TTL_SECONDS
+        self.batch_size = min(settings.SALE_EXPIRY_BATCH_SIZE, PAYMENT_WEBHOOK_BATCH_MAX_EVENTS)
+        self.expired = 0
+        self.last_sweep: dict | None = None
+        self.task = PeriodicTask(
+            "sale-expiry", self.sweep, settings.SALE_EXPIRY_INTERVAL_SECONDS
+        )
+
+    def start(self) -> None:
+        self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+
+    async def sweep(self) -> int:
+        """
+        Cancela em lotes todas as vendas PENDENTE vencidas.
+
+        Returns:
+            Quantidade de vendas canceladas
+        """
+        started = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.pending_ttl)
+        expired = 0
+        batches = 0
+        while True:
+            selected, cancelled = await self.sweep_batch(cutoff)
+            if selected is None:
+                logger.debug("Varredura de vendas vencidas em andamento em outra réplica")
+                break
+            batches += 1
+            expired += cancelled
+            if selected < self.batch_size or cancelled == 0:
+                break
+
+        duration = time.monotonic() - started
+        self.expired += expired
+        self.last_sweep = {
+            "finished_at": datetime.utcnow(),
+            "duration": duration,
+            "batches": batches,
+            "expired": expired,
+        }
+        if expired:
+            logger.info("Vendas PENDENTE vencidas canceladas: %d em %.2fs", expired, duration)
+        return expired
+
+    async def sweep_batch(self, cutoff: datetime) -> tuple[int | None, int]:
+        """
+        Cancela um lote de vendas PENDENTE anteriores a cutoff.
+
+        Returns:
+            Tupla (vendas selecionadas, vendas canceladas); selecionadas é
+            None se outra réplica detém o lock
+        """
+        async with self.session_factory() as db:
+            if not await try_advisory_xact_lock(db, SALE_EXPIRY_LOCK_KEY):
+                return None, 0
+
+            result = await db.execute(
+                select(Sale.codigo_pagamento)
+                .where(
+                    Sale.status_pagamento == PaymentStatus.PENDENTE,
+                    Sale.data_venda < cutoff,
+                )
+                .order_by(Sale.data_venda, Sale.id)
+                .limit(self.batch_size)
+            )
+            codes = result.scalars().all()
+            if not codes:
+                await db.rollback()
+                return 0, 0
+
+            report = await SaleService(db).process_payment_webhooks(PaymentWebhookBatch(events=[
+                PaymentWebhook(codigo_pagamento=codigo, status=PaymentStatus.CANCELADO)
+                for codigo in codes
+            ]))
+            return len(codes), report.applied
+
+    def stats(self) -> dict:
+        return {
+            "pending_ttl_seconds": self.pending_ttl,
+            "expired": self.expired,
+            "last_sweep": self.last_sweep,
+            "scheduler": self.task.stats(),
+        }
+
+
+sale_expiry_sweeper = SaleExpirySweeper()
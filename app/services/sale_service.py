@@ -1,13 +1,123 @@
+import math
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import asc
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from datetime import datetime
+from pydantic import TypeAdapter
+from datetime import datetime, timedelta
 
+from app.core.config import settings
+from app.database import AsyncSessionLocal
 from app.models.models import Sale, Vehicle, VehicleStatus, PaymentStatus
-from app.schemas.schemas import SaleCreate, PaymentWebhook
-from app.services.vehicle_client import vehicle_client
+from app.schemas.schemas import (
+    VehicleFilters,
+    VehicleResponse,
+    SaleCreate,
+    SaleFilters,
+    SaleResponse,
+    SaleBatchCreate,
+    SaleBatchItemResult,
+    SaleBatchResponse,
+    PaymentWebhook,
+    PaymentWebhookBatch,
+    PaymentWebhookBatchItemResult,
+    PaymentWebhookBatchResponse,
+)
+from app.core.cache import LRUCache
+from app.core.pagination import InvalidCursor, decode_cursor, keyset_page, split_page
+from app.services.vehicle_client import vehicle_client, NOT_MODIFIED
+from app.services.resilience import VehicleServiceUnavailable
+from app.services.single_flight import SingleFlight
+from app.services.revalidation import BackgroundRevalidator
+from app.services.outbox import enqueue_status_update, enqueue_status_updates, outbox_dispatcher
+from app.services.admission import VehicleAdmissionBusy, VehicleAlreadyReserved, vehicle_admission
+from app.services.finalized_payments import finalized_payments, remember_finalized
+from app.services.listing_cache import LISTED_STATUSES, listing_cache, listing_key, mark_listings_stale
+from app.services.idempotency import (
+    get_stored_response,
+    idempotency_flight,
+    request_fingerprint,
+    store_response,
+)
+from app.services.vehicle_upsert import upsert_vehicles, vehicle_values
+
+
+# Sincronizações em andamento por external_id, compartilhadas entre requisições
+vehicle_sync_flight = SingleFlight()
+
+# Buscas HTTP em andamento por (external_id, condicional); cada chamador
+# grava o resultado na própria transação
+vehicle_fetch_flight = SingleFlight()
+
+# Última revalidação (304) por external_id; conta como frescor do cache
+# local sem exigir gravação de updated_at no banco
+vehicle_validated_at = LRUCache(maxsize=settings.VEHICLE_CLIENT_VALIDATORS_MAX_SIZE)
+
+
+# Serialização das páginas das listagens de veículos (listing_cache)
+_vehicle_list_adapter = TypeAdapter(list[VehicleResponse])
+
+# Chaves de ordenação (e de paginação) das listagens
+VEHICLE_LISTING_KEY = (Vehicle.preco, Vehicle.id)
+SALE_LISTING_KEY = (Sale.data_venda, Sale.id)
+
+
+def vehicle_listing_conditions(
+    vehicle_status: VehicleStatus, filters: VehicleFilters | None
+) -> list:
+    """Condições WHERE das listagens de veículos de um status"""
+    conditions = [Vehicle.status == vehicle_status]
+    if filters is None:
+        return conditions
+    if filters.marca:
+        conditions.append(func.lower(Vehicle.marca) == filters.marca.lower())
+    if filters.modelo:
+        conditions.append(func.lower(Vehicle.modelo) == filters.modelo.lower())
+    if filters.ano_min is not None:
+        conditions.append(Vehicle.ano >= filters.ano_min)
+    if filters.ano_max is not None:
+        conditions.append(Vehicle.ano <= filters.ano_max)
+    if filters.preco_min is not None:
+        conditions.append(Vehicle.preco >= filters.preco_min)
+    if filters.preco_max is not None:
+        conditions.append(Vehicle.preco <= filters.preco_max)
+    return conditions
+
+
+def sale_listing_conditions(filters: SaleFilters | None) -> list:
+    """Condições WHERE da listagem de vendas"""
+    if filters is None:
+        return []
+    conditions = []
+    if filters.cpf_comprador:
+        conditions.append(Sale.cpf_comprador == filters.cpf_comprador)
+    if filters.status_pagamento is not None:
+        conditions.append(Sale.status_pagamento == filters.status_pagamento)
+    if filters.data_inicio is not None:
+        conditions.append(Sale.data_venda >= filters.data_inicio)
+    if filters.data_fim is not None:
+        conditions.append(Sale.data_venda < filters.data_fim)
+    return conditions
+
+
+def vehicle_export_query(vehicle_status: VehicleStatus, filters: VehicleFilters | None):
+    """SELECT das colunas de veículos para exportação, na ordem da listagem"""
+    return (
+        select(*Vehicle.__table__.columns)
+        .where(*vehicle_listing_conditions(vehicle_status, filters))
+        .order_by(*VEHICLE_LISTING_KEY)
+    )
+
+
+def sale_export_query(filters: SaleFilters | None):
+    """SELECT das colunas de vendas para exportação, em ordem cronológica"""
+    return (
+        select(*Sale.__table__.columns)
+        .where(*sale_listing_conditions(filters))
+        .order_by(*SALE_LISTING_KEY)
+    )
 
 
 class VehicleService:
@@ -20,74 +130,363 @@ class VehicleService:
         """
         Sincroniza um veículo do serviço principal para o cache local.
         
+        Chamadas concorrentes para o mesmo external_id são coalescidas:
+        apenas uma faz a busca HTTP e o upsert; as demais aguardam e
+        apenas recarregam o registro na própria sessão.
+        
         Args:
             external_id: ID do veículo no serviço principal
             
         Returns:
             Vehicle local ou None se não encontrado no serviço principal
         """
-        # Busca veículo no serviço principal via HTTP
-        vehicle_data = await vehicle_client.get_vehicle(external_id)
-        
-        if not vehicle_data:
-            return None
+        vehicle, shared = await vehicle_sync_flight.do(
+            external_id, lambda: self._fetch_and_upsert(external_id)
+        )
+        if not shared or vehicle is None:
+            return vehicle
         
-        # Verifica se já existe no cache local
+        result = await self.db.execute(
+            select(Vehicle)
+            .where(Vehicle.external_id == external_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def _fetch_and_upsert(self, external_id: int) -> Vehicle | None:
+        """Sincroniza o veículo e confirma a gravação no cache local"""
         result = await self.db.execute(
             select(Vehicle).where(Vehicle.external_id == external_id)
         )
-        local_vehicle = result.scalar_one_or_none()
-        
-        if local_vehicle:
-            # Atualiza dados do cache
-            local_vehicle.marca = vehicle_data["marca"]
-            local_vehicle.modelo = vehicle_data["modelo"]
-            local_vehicle.ano = vehicle_data["ano"]
-            local_vehicle.cor = vehicle_data["cor"]
-            local_vehicle.preco = vehicle_data["preco"]
-            local_vehicle.status = VehicleStatus(vehicle_data["status"])
-            local_vehicle.updated_at = datetime.utcnow()
-        else:
-            # Cria novo registro no cache
-            local_vehicle = Vehicle(
-                external_id=vehicle_data["id"],
-                marca=vehicle_data["marca"],
-                modelo=vehicle_data["modelo"],
-                ano=vehicle_data["ano"],
-                cor=vehicle_data["cor"],
-                preco=vehicle_data["preco"],
-                status=VehicleStatus(vehicle_data["status"]),
-                data_cadastro=datetime.fromisoformat(
-                    vehicle_data["data_cadastro"].replace("Z", "+00:00")
-                ) if isinstance(vehicle_data["data_cadastro"], str) else vehicle_data["data_cadastro"]
-            )
-            self.db.add(local_vehicle)
-        
+        vehicle = await self._sync_local(external_id, result.scalar_one_or_none())
         await self.db.commit()
-        await self.db.refresh(local_vehicle)
+        return vehicle
+    
+    async def _sync_local(
+        self, external_id: int, local_vehicle: Vehicle | None
+    ) -> Vehicle | None:
+        """
+        Busca o veículo no serviço principal e grava no cache local.
+        
+        Se o veículo já está no cache, a busca é condicional (ETag /
+        Last-Modified); em caso de 304 nada é gravado no banco. Buscas
+        HTTP concorrentes para o mesmo veículo são coalescidas. Não faz
+        commit: a gravação participa da transação do chamador.
+        """
+        conditional = local_vehicle is not None
+        vehicle_data, _ = await vehicle_fetch_flight.do(
+            (external_id, conditional),
+            lambda: (
+                vehicle_client.get_vehicle(external_id, conditional=True)
+                if conditional
+                else vehicle_client.get_vehicle(external_id)
+            ),
+        )
+        
+        if vehicle_data is NOT_MODIFIED:
+            vehicle_validated_at.set(external_id, datetime.utcnow())
+            return local_vehicle
+        
+        if not vehicle_data:
+            return None
+        
+        # Upsert com RETURNING: grava e recarrega o registro em um round trip
+        [local_vehicle] = await upsert_vehicles(
+            self.db, [vehicle_values(vehicle_data)], existing_loaded=True
+        )
         return local_vehicle
     
-    async def get_available_vehicles(self) -> list[Vehicle]:
+    async def sync_vehicles_from_principal(
+        self, external_ids: list[int]
+    ) -> dict[int, Vehicle | None]:
+        """
+        Sincroniza vários veículos do serviço principal em lote.
+        
+        Busca todos os IDs com VehicleClient.get_vehicles e grava o lote
+        com upsert_vehicles (INSERT ... ON CONFLICT) em um único commit.
+        
+        Args:
+            external_ids: IDs dos veículos no serviço principal
+            
+        Returns:
+            Dicionário {external_id: Vehicle local ou None se não encontrado
+            ou se a busca falhou}
+        """
+        fetched = await vehicle_client.get_vehicles(external_ids)
+        rows = [
+            vehicle_values(item["data"])
+            for item in fetched.values()
+            if item["data"]
+        ]
+        
+        local_vehicles: dict[int, Vehicle] = {}
+        if rows:
+            vehicles = await upsert_vehicles(self.db, rows)
+            local_vehicles = {v.external_id: v for v in vehicles}
+            await self.db.commit()
+        
+        return {
+            external_id: local_vehicles.get(external_id)
+            for external_id in fetched
+        }
+    
+    async def get_available_vehicles(
+        self,
+        filters: VehicleFilters | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[Vehicle], str | None]:
+        """
+        Retorna uma página de veículos disponíveis ordenados por preço (menor para maior).
+        """
+        return await self.list_vehicles(VehicleStatus.DISPONIVEL, filters, cursor, limit)
+    
+    async def get_sold_vehicles(
+        self,
+        filters: VehicleFilters | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[Vehicle], str | None]:
+        """
+        Retorna uma página de veículos vendidos ordenados por preço (menor para maior).
+        """
+        return await self.list_vehicles(VehicleStatus.VENDIDO, filters, cursor, limit)
+    
+    async def get_listing_page(
+        self,
+        vehicle_status: VehicleStatus,
+        filters: VehicleFilters | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[bytes, str | None]:
+        """
+        Página de uma listagem de veículos já serializada em JSON.
+        
+        Servida do listing_cache por (status, filtros, cursor, limite); em
+        caso de falta, executa list_vehicles e grava o corpo serializado.
+        
+        Returns:
+            (corpo JSON da página, cursor da próxima página ou None)
         """
-        Retorna veículos disponíveis ordenados por preço (menor para maior).
+        limit = limit or settings.LISTING_PAGE_SIZE
+        key = listing_key(vehicle_status, (filters or VehicleFilters()).model_dump(), cursor, limit)
+        page = listing_cache.get(key)
+        if page is not None:
+            return page
+        
+        generation = listing_cache.generation_for(vehicle_status)
+        vehicles, next_cursor = await self.list_vehicles(vehicle_status, filters, cursor, limit)
+        body = _vehicle_list_adapter.dump_json(
+            _vehicle_list_adapter.validate_python(vehicles, from_attributes=True)
+        )
+        page = (body, next_cursor)
+        listing_cache.set(key, page, generation)
+        return page
+    
+    async def list_vehicles(
+        self,
+        vehicle_status: VehicleStatus,
+        filters: VehicleFilters | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[Vehicle], str | None]:
+        """
+        Lista veículos de um status paginando por (preco, id).
+        
+        A paginação é por chave (keyset) sobre o índice (status, preco, id):
+        o cursor guarda o (preco, id) do último veículo da página anterior,
+        então páginas profundas custam o mesmo que a primeira.
+        
+        Args:
+            vehicle_status: Status dos veículos listados
+            filters: Filtros de marca, modelo, faixa de ano e de preço
+            cursor: Cursor retornado pela página anterior
+            limit: Tamanho da página (padrão LISTING_PAGE_SIZE)
+            
+        Returns:
+            (veículos da página, cursor da próxima página ou None)
+            
+        Raises:
+            HTTPException 400: Se o cursor é inválido
+        """
+        limit = limit or settings.LISTING_PAGE_SIZE
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, (float, int))
+            except InvalidCursor as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(exc)
+                )
+        
+        stmt = keyset_page(
+            select(Vehicle).where(*vehicle_listing_conditions(vehicle_status, filters)),
+            VEHICLE_LISTING_KEY, after, limit,
+        )
+        result = await self.db.execute(stmt)
+        return split_page(
+            list(result.scalars().all()), limit, lambda vehicle: (vehicle.preco, vehicle.id)
+        )
+    
+    async def get_vehicle_for_sale(self, external_id: int) -> Vehicle | None:
+        """
+        Obtém o veículo para uma venda respeitando a janela de frescor.
+        
+        - Registro local com menos de VEHICLE_CACHE_TTL_SECONDS: usado
+          sem consultar o serviço principal.
+        - Registro vencido há menos de VEHICLE_CACHE_STALE_SECONDS: usado
+          e revalidado em segundo plano.
+        - Ausente ou mais antigo: sincronizado do serviço principal.
+        
+        Não faz commit: a sincronização participa da transação da venda.
+        
+        Args:
+            external_id: ID do veículo no serviço principal
+            
+        Returns:
+            Vehicle local ou None se não encontrado no serviço principal
+        """
+        local_vehicle = await self.get_vehicle_by_external_id(external_id)
+        if self._usable_for_sale(local_vehicle):
+            return local_vehicle
+        
+        return await self._sync_local(external_id, local_vehicle)
+    
+    async def get_vehicles_for_sale(
+        self, external_ids: list[int]
+    ) -> tuple[dict[int, Vehicle], dict[int, str]]:
+        """
+        Versão em lote de get_vehicle_for_sale.
+        
+        Lê o cache local com um único SELECT e sincroniza os ausentes ou
+        vencidos com VehicleClient.get_vehicles e um único upsert. Não faz
+        commit.
+        
+        Returns:
+            Tupla (veículos por external_id, erros por external_id). O erro
+            é "not_found" ou a mensagem da falha de comunicação.
         """
         result = await self.db.execute(
-            select(Vehicle)
-            .where(Vehicle.status == VehicleStatus.DISPONIVEL)
-            .order_by(asc(Vehicle.preco))
+            select(Vehicle).where(Vehicle.external_id.in_(external_ids))
+        )
+        vehicles = {v.external_id: v for v in result.scalars().all()}
+        to_sync = [
+            external_id for external_id in external_ids
+            if not self._usable_for_sale(vehicles.get(external_id))
+        ]
+        
+        errors: dict[int, str] = {}
+        if to_sync:
+            fetched = await vehicle_client.get_vehicles(to_sync)
+            rows = []
+            for external_id in to_sync:
+                item = fetched.get(external_id) or {"data": None, "error": "not_found"}
+                if item["data"]:
+                    rows.append(vehicle_values(item["data"]))
+                else:
+                    vehicles.pop(external_id, None)
+                    errors[external_id] = item["error"] or "not_found"
+            for vehicle in await upsert_vehicles(self.db, rows, existing_loaded=True):
+                vehicles[vehicle.external_id] = vehicle
+        return vehicles, errors
+    
+    def _usable_for_sale(self, local_vehicle: Vehicle | None) -> bool:
+        """
+        Indica se o registro local pode ser usado sem sincronização.
+        
+        Dentro de VEHICLE_CACHE_TTL_SECONDS é usado direto; vencido há menos
+        de VEHICLE_CACHE_STALE_SECONDS é usado e revalidado em segundo plano.
+        """
+        if not local_vehicle or not local_vehicle.updated_at:
+            return False
+        external_id = local_vehicle.external_id
+        checked_at = max(
+            local_vehicle.updated_at,
+            vehicle_validated_at.get(external_id, local_vehicle.updated_at),
         )
-        return result.scalars().all()
+        age = datetime.utcnow() - checked_at
+        ttl = timedelta(seconds=settings.VEHICLE_CACHE_TTL_SECONDS)
+        if age <= ttl:
+            return True
+        if age <= ttl + timedelta(seconds=settings.VEHICLE_CACHE_STALE_SECONDS):
+            vehicle_revalidator.schedule(external_id)
+            return True
+        return False
     
-    async def get_sold_vehicles(self) -> list[Vehicle]:
+    async def reserve_vehicle(self, vehicle_id: int) -> Vehicle | None:
         """
-        Retorna veículos vendidos ordenados por preço (menor para maior).
+        Reserva o veículo para venda com um UPDATE condicional.
+        
+        Executa UPDATE ... SET status = VENDIDO WHERE id = ? AND status =
+        DISPONIVEL RETURNING: entre compradores concorrentes apenas um
+        altera a linha; os demais recebem None sem esperar o commit.
+        Não faz commit.
+        
+        Returns:
+            Veículo reservado ou None se já não estava disponível
+        """
+        return await self._reserve(Vehicle.id == vehicle_id)
+    
+    async def reserve_fresh_vehicle(self, external_id: int) -> Vehicle | None:
+        """
+        Reserva, em um único UPDATE, um veículo disponível e fresco no cache.
+        
+        Caminho rápido da venda: quando o registro local está dentro de
+        VEHICLE_CACHE_TTL_SECONDS a reserva dispensa a leitura prévia.
+        Não faz commit.
+        
+        Returns:
+            Veículo reservado ou None se ausente, vencido ou indisponível
+            (o chamador segue pelo caminho completo)
+        """
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=settings.VEHICLE_CACHE_TTL_SECONDS)
+        conditions = [Vehicle.external_id == external_id]
+        validated_at = vehicle_validated_at.get(external_id)
+        if validated_at is None or now - validated_at > ttl:
+            conditions.append(Vehicle.updated_at >= now - ttl)
+        return await self._reserve(*conditions)
+    
+    async def reserve_vehicles(self, vehicle_ids: list[int]) -> list[Vehicle]:
+        """
+        Reserva vários veículos com um único UPDATE condicional.
+        
+        Além de DISPONIVEL, exige que o veículo não tenha venda registrada
+        (sales.vehicle_id é único), para que o INSERT das vendas do lote
+        não falhe por inteiro. Não faz commit.
+        
+        Returns:
+            Veículos efetivamente reservados
         """
+        if not vehicle_ids:
+            return []
         result = await self.db.execute(
-            select(Vehicle)
-            .where(Vehicle.status == VehicleStatus.VENDIDO)
-            .order_by(asc(Vehicle.preco))
+            self._reserve_statement(
+                Vehicle.id.in_(vehicle_ids),
+                ~select(Sale.id).where(Sale.vehicle_id == Vehicle.id).exists(),
+            )
+        )
+        vehicles = list(result.scalars().all())
+        for vehicle in vehicles:
+            mark_listings_stale(self.db, LISTED_STATUSES, vehicle.marca, vehicle.modelo)
+        return vehicles
+    
+    async def _reserve(self, *conditions) -> Vehicle | None:
+        result = await self.db.execute(self._reserve_statement(*conditions))
+        vehicle = result.scalar_one_or_none()
+        if vehicle is not None:
+            mark_listings_stale(self.db, LISTED_STATUSES, vehicle.marca, vehicle.modelo)
+        return vehicle
+    
+    def _reserve_statement(self, *conditions):
+        return (
+            update(Vehicle)
+            .where(*conditions, Vehicle.status == VehicleStatus.DISPONIVEL)
+            .values(status=VehicleStatus.VENDIDO, updated_at=datetime.utcnow())
+            .returning(Vehicle)
+            .execution_options(populate_existing=True, synchronize_session=False)
         )
-        return result.scalars().all()
     
     async def get_vehicle_by_external_id(self, external_id: int) -> Vehicle | None:
         """Busca veículo pelo ID externo (do serviço principal)"""
@@ -97,6 +496,16 @@ class VehicleService:
         return result.scalar_one_or_none()
 
 
+async def _revalidate_vehicle(external_id: int) -> None:
+    """Ressincroniza um veículo do cache local em sessão própria"""
+    async with AsyncSessionLocal() as session:
+        await VehicleService(session).sync_vehicle_from_principal(external_id)
+
+
+# Revalidações em segundo plano de registros vencidos do cache local
+vehicle_revalidator = BackgroundRevalidator(_revalidate_vehicle)
+
+
 class SaleService:
     """Serviço para gerenciamento de vendas"""
     
@@ -104,23 +513,177 @@ class SaleService:
         self.db = db
         self.vehicle_service = VehicleService(db)
     
-    async def create_sale(self, sale_in: SaleCreate) -> Sale:
+    async def create_sale_idempotent(
+        self, sale_in: SaleCreate, idempotency_key: str
+    ) -> tuple[dict, bool]:
+        """
+        Registra uma venda com Idempotency-Key.
+        
+        Uma retentativa com a mesma chave recebe a resposta armazenada sem
+        refazer a venda; duplicatas concorrentes aguardam a original.
+        
+        Args:
+            sale_in: Dados da venda (vehicle_id, cpf_comprador)
+            idempotency_key: Valor do header Idempotency-Key
+            
+        Returns:
+            Tupla (resposta serializada da venda, reaproveitada)
+            
+        Raises:
+            HTTPException: 422 se a chave já foi usada com outro corpo, além
+                dos erros de create_sale
+        """
+        fingerprint = request_fingerprint(sale_in.model_dump(mode="json"))
+        body, shared = await idempotency_flight.do(
+            (idempotency_key, fingerprint),
+            lambda: self._create_or_replay(sale_in, idempotency_key, fingerprint),
+        )
+        replayed = body is None
+        if replayed:
+            body = await self._replay(idempotency_key, fingerprint)
+        return body, replayed or shared
+    
+    async def _create_or_replay(
+        self, sale_in: SaleCreate, idempotency_key: str, fingerprint: str
+    ) -> dict | None:
+        """Cria a venda; None quando já existe resposta armazenada para a chave"""
+        if await get_stored_response(self.db, idempotency_key) is not None:
+            return None
+        try:
+            sale = await self.create_sale(
+                sale_in, idempotency_key=idempotency_key, fingerprint=fingerprint
+            )
+        except HTTPException:
+            # A original pode ter sido gravada por outra réplica no meio do caminho
+            if await get_stored_response(self.db, idempotency_key) is not None:
+                return None
+            raise
+        return SaleResponse.model_validate(sale).model_dump(mode="json")
+    
+    async def _replay(self, idempotency_key: str, fingerprint: str) -> dict:
+        stored = await get_stored_response(self.db, idempotency_key)
+        if stored.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key já utilizada com outro corpo de requisição"
+            )
+        return stored.response
+    
+    async def create_sale(
+        self,
+        sale_in: SaleCreate,
+        idempotency_key: str | None = None,
+        fingerprint: str | None = None,
+    ) -> Sale:
         """
         Registra uma nova venda.
         
+        A sincronização do veículo, a reserva, a venda e a entrada no
+        outbox são gravadas em uma única transação. Com o cache local
+        fresco a venda custa três instruções e um commit: UPDATE da
+        reserva, INSERT da venda e INSERT do outbox (com RETURNING).
+        
         Args:
             sale_in: Dados da venda (vehicle_id, cpf_comprador)
+            idempotency_key: Chave cuja resposta é gravada na transação
+            fingerprint: Fingerprint do corpo associado à chave
             
         Returns:
             Sale criada com código de pagamento
             
         Raises:
-            HTTPException: Se veículo não encontrado ou indisponível
+            HTTPException: Se veículo não encontrado (404) ou indisponível
+                (400), se outra venda o reservou primeiro (409) ou se o
+                serviço principal estiver indisponível (503)
         """
-        # 1. Sincroniza veículo do serviço principal
-        vehicle = await self.vehicle_service.sync_vehicle_from_principal(
-            sale_in.vehicle_id
-        )
+        # Rajadas para o mesmo veículo passam uma por vez pela admissão;
+        # com o veículo reservado as demais são recusadas sem round trips
+        try:
+            async with vehicle_admission.admit(sale_in.vehicle_id):
+                try:
+                    sale = await self._create_sale(sale_in, idempotency_key, fingerprint)
+                except HTTPException as e:
+                    if e.status_code == status.HTTP_409_CONFLICT:
+                        vehicle_admission.mark_reserved(sale_in.vehicle_id)
+                    raise
+                vehicle_admission.mark_reserved(sale_in.vehicle_id)
+                return sale
+        except VehicleAlreadyReserved as e:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        except VehicleAdmissionBusy as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(max(1, math.ceil(vehicle_admission.wait_timeout)))},
+            )
+    
+    async def _create_sale(
+        self, sale_in: SaleCreate, idempotency_key: str | None, fingerprint: str | None
+    ) -> Sale:
+        # 1. Caminho rápido: reserva direta do registro fresco do cache local
+        vehicle = await self.vehicle_service.reserve_fresh_vehicle(sale_in.vehicle_id)
+        if vehicle is None:
+            vehicle = await self._reserve_after_sync(sale_in.vehicle_id)
+        
+        # 2. Cria registro de venda com código único de pagamento; id e
+        #    campos gerados voltam no RETURNING (sem refresh)
+        try:
+            sale = await self.db.scalar(
+                insert(Sale)
+                .values(
+                    vehicle_id=vehicle.id,
+                    cpf_comprador=sale_in.cpf_comprador,
+                    codigo_pagamento=str(uuid.uuid4()),
+                    status_pagamento=PaymentStatus.PENDENTE,
+                    valor_venda=vehicle.preco,
+                )
+                .returning(Sale)
+            )
+        except IntegrityError:
+            # Venda anterior do mesmo veículo (sales.vehicle_id é único)
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Veículo já possui venda registrada"
+            )
+        
+        # 3. Registra no outbox a atualização do serviço principal
+        #    (entregue em segundo plano pelo OutboxDispatcher)
+        enqueue_status_update(self.db, vehicle.external_id, VehicleStatus.VENDIDO)
+        
+        # 4. Armazena a resposta da Idempotency-Key na mesma transação
+        if idempotency_key:
+            store_response(
+                self.db,
+                idempotency_key,
+                fingerprint,
+                status.HTTP_201_CREATED,
+                SaleResponse.model_validate(sale).model_dump(mode="json"),
+            )
+        
+        try:
+            await self.db.commit()
+            outbox_dispatcher.trigger()
+            return sale
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao registrar venda: {str(e)}"
+            )
+    
+    async def _reserve_after_sync(self, external_id: int) -> Vehicle:
+        """Caminho completo: obtém o veículo (sincronizando se preciso) e reserva"""
+        try:
+            vehicle = await self.vehicle_service.get_vehicle_for_sale(external_id)
+        except VehicleServiceUnavailable:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Serviço de veículos indisponível no momento"
+            )
         
         if not vehicle:
             raise HTTPException(
@@ -128,50 +691,164 @@ class SaleService:
                 detail="Veículo não encontrado no serviço principal"
             )
         
-        # 2. Verifica disponibilidade
         if vehicle.status != VehicleStatus.DISPONIVEL:
+            # Mantém gravada a sincronização do cache mesmo sem venda
+            await self.db.commit()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Veículo não está disponível para venda"
             )
         
-        # 3. Gera código único de pagamento
-        codigo_pagamento = str(uuid.uuid4())
+        # Reserva com UPDATE condicional; perdedores falham com 409
+        reserved = await self.vehicle_service.reserve_vehicle(vehicle.id)
+        if reserved is None:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Veículo já reservado por outra venda"
+            )
+        return reserved
+    
+    async def create_sales_batch(self, batch: SaleBatchCreate) -> SaleBatchResponse:
+        """
+        Registra vendas em lote (pedidos de frota).
+        
+        Lê o cache local e sincroniza os veículos em lote, reserva todos com
+        um único UPDATE condicional e insere as vendas e as entradas do
+        outbox em uma única transação: poucos round trips por lote, em vez
+        de vários por venda.
+        
+        Args:
+            batch: Itens (vehicle_id, cpf_comprador) e modo atômico
+            
+        Returns:
+            Relatório por item. Em modo atômico, qualquer falha desfaz o
+            lote e os demais itens são reportados com 424.
+        """
+        results: dict[int, SaleBatchItemResult] = {}
+        
+        def fail(index: int, status_code: int, detail: str) -> None:
+            results[index] = SaleBatchItemResult(
+                index=index,
+                vehicle_id=batch.items[index].vehicle_id,
+                status_code=status_code,
+                detail=detail,
+            )
+        
+        # 1. Itens repetidos e veículos já reservados neste processo
+        candidates: dict[int, int] = {}
+        for index, item in enumerate(batch.items):
+            if item.vehicle_id in candidates:
+                fail(index, status.HTTP_409_CONFLICT, "Veículo repetido no lote")
+            elif vehicle_admission.is_reserved(item.vehicle_id):
+                fail(index, status.HTTP_409_CONFLICT, "Veículo já reservado por outra venda")
+            else:
+                candidates[item.vehicle_id] = index
         
-        # 4. Cria registro de venda
-        sale = Sale(
-            vehicle_id=vehicle.id,
-            cpf_comprador=sale_in.cpf_comprador,
-            codigo_pagamento=codigo_pagamento,
-            status_pagamento=PaymentStatus.PENDENTE,
-            valor_venda=vehicle.preco
-        )
-        self.db.add(sale)
+        # 2. Veículos do cache local, sincronizando ausentes/vencidos em lote
+        vehicles, errors = await self.vehicle_service.get_vehicles_for_sale(list(candidates))
+        for external_id, error in errors.items():
+            if error == "not_found":
+                fail(candidates.pop(external_id), status.HTTP_404_NOT_FOUND,
+                     "Veículo não encontrado no serviço principal")
+            else:
+                fail(candidates.pop(external_id), status.HTTP_503_SERVICE_UNAVAILABLE,
+                     "Serviço de veículos indisponível no momento")
+        for external_id in list(candidates):
+            if vehicles[external_id].status != VehicleStatus.DISPONIVEL:
+                fail(candidates.pop(external_id), status.HTTP_400_BAD_REQUEST,
+                     "Veículo não está disponível para venda")
         
-        # 5. Atualiza status do veículo local para VENDIDO
-        vehicle.status = VehicleStatus.VENDIDO
+        # 3. Reserva com um único UPDATE condicional
+        if candidates and not (batch.atomic and results):
+            reserved = {
+                vehicle.external_id: vehicle
+                for vehicle in await self.vehicle_service.reserve_vehicles(
+                    [vehicles[external_id].id for external_id in candidates]
+                )
+            }
+            for external_id in list(candidates):
+                if external_id not in reserved:
+                    fail(candidates.pop(external_id), status.HTTP_409_CONFLICT,
+                         "Veículo já reservado por outra venda")
         
-        # 6. Atualiza status no serviço principal via HTTP
-        await vehicle_client.update_vehicle_status(
-            sale_in.vehicle_id, 
-            VehicleStatus.VENDIDO.value
-        )
+        if batch.atomic and results:
+            # Desfaz reservas e sincronizações; nenhuma venda é registrada
+            await self.db.rollback()
+            for index in candidates.values():
+                fail(index, status.HTTP_424_FAILED_DEPENDENCY,
+                     "Lote cancelado: outro item falhou")
+            return self._batch_report(batch, results, committed=False)
+        
+        # 4. Vendas em um único INSERT ... RETURNING e entradas do outbox
+        if candidates:
+            sales = await self.db.scalars(
+                insert(Sale).returning(Sale),
+                [
+                    {
+                        "vehicle_id": reserved[external_id].id,
+                        "cpf_comprador": batch.items[index].cpf_comprador,
+                        "codigo_pagamento": str(uuid.uuid4()),
+                        "status_pagamento": PaymentStatus.PENDENTE,
+                        "valor_venda": reserved[external_id].preco,
+                    }
+                    for external_id, index in candidates.items()
+                ],
+            )
+            sales_by_vehicle = {sale.vehicle_id: sale for sale in sales.all()}
+            for external_id, index in candidates.items():
+                results[index] = SaleBatchItemResult(
+                    index=index,
+                    vehicle_id=external_id,
+                    status_code=status.HTTP_201_CREATED,
+                    sale=SaleResponse.model_validate(
+                        sales_by_vehicle[reserved[external_id].id]
+                    ),
+                )
+            await enqueue_status_updates(
+                self.db,
+                [(external_id, VehicleStatus.VENDIDO) for external_id in candidates],
+            )
         
         try:
             await self.db.commit()
-            await self.db.refresh(sale)
-            return sale
         except Exception as e:
             await self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Erro ao registrar venda: {str(e)}"
+                detail=f"Erro ao registrar vendas: {str(e)}"
             )
+        
+        for external_id in candidates:
+            vehicle_admission.mark_reserved(external_id)
+        if candidates:
+            outbox_dispatcher.trigger()
+        return self._batch_report(batch, results, committed=True)
+    
+    @staticmethod
+    def _batch_report(
+        batch: SaleBatchCreate, results: dict[int, SaleBatchItemResult], committed: bool
+    ) -> SaleBatchResponse:
+        created = sum(
+            1 for r in results.values() if r.status_code == status.HTTP_201_CREATED
+        )
+        return SaleBatchResponse(
+            committed=committed,
+            created=created,
+            failed=len(batch.items) - created,
+            results=[results[index] for index in range(len(batch.items))],
+        )
     
     async def process_payment_webhook(self, webhook_data: PaymentWebhook) -> dict:
         """
         Processa webhook de confirmação/cancelamento de pagamento.
         
+        A transição PENDENTE -> CONFIRMADO/CANCELADO é um único UPDATE
+        condicional (WHERE status_pagamento = PENDENTE RETURNING): entre
+        webhooks duplicados concorrentes apenas um aplica a transição. No
+        cancelamento, a liberação do veículo e a entrada no outbox entram
+        na mesma transação.
+        
         Args:
             webhook_data: Dados do webhook (codigo_pagamento, status)
             
@@ -179,53 +856,77 @@ class SaleService:
             Resultado do processamento
             
         Raises:
-            HTTPException: Se código de pagamento não encontrado
+            HTTPException: Se código de pagamento não encontrado (404) ou
+                pagamento já processado (400)
         """
-        # 1. Busca venda pelo código de pagamento
+        # 0. Reentrega conhecida: responde sem consultar o banco
+        finalized = finalized_payments.get(webhook_data.codigo_pagamento)
+        if finalized is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Pagamento já processado com status: {finalized.value}"
+            )
+        
+        # 1. Transição condicional do pagamento
         result = await self.db.execute(
-            select(Sale).where(Sale.codigo_pagamento == webhook_data.codigo_pagamento)
+            update(Sale)
+            .where(
+                Sale.codigo_pagamento == webhook_data.codigo_pagamento,
+                Sale.status_pagamento == PaymentStatus.PENDENTE,
+            )
+            .values(status_pagamento=webhook_data.status)
+            .returning(Sale)
+            .execution_options(populate_existing=True, synchronize_session=False)
         )
         sale = result.scalar_one_or_none()
         
         if not sale:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Código de pagamento não encontrado"
+            # Nenhuma linha alterada: código inexistente ou já processado
+            current = await self.db.scalar(
+                select(Sale.status_pagamento)
+                .where(Sale.codigo_pagamento == webhook_data.codigo_pagamento)
             )
-        
-        # 2. Verifica se já foi processado
-        if sale.status_pagamento != PaymentStatus.PENDENTE:
+            await self.db.rollback()
+            if current is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Código de pagamento não encontrado"
+                )
+            remember_finalized(webhook_data.codigo_pagamento, current)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Pagamento já processado com status: {sale.status_pagamento.value}"
+                detail=f"Pagamento já processado com status: {current.value}"
             )
         
-        # 3. Atualiza status do pagamento
-        sale.status_pagamento = webhook_data.status
-        
-        # 4. Busca veículo associado
-        result = await self.db.execute(
-            select(Vehicle).where(Vehicle.id == sale.vehicle_id)
-        )
-        vehicle = result.scalar_one_or_none()
-        
         vehicle_status = None
         
-        # 5. Se cancelado, reverte status do veículo
-        if webhook_data.status == PaymentStatus.CANCELADO and vehicle:
-            vehicle.status = VehicleStatus.DISPONIVEL
-            vehicle_status = VehicleStatus.DISPONIVEL
-            
-            # Atualiza no serviço principal
-            await vehicle_client.update_vehicle_status(
-                vehicle.external_id,
-                VehicleStatus.DISPONIVEL.value
-            )
+        # 2. Se cancelado, libera o veículo na mesma transação
+        if webhook_data.status == PaymentStatus.CANCELADO:
+            released = (await self.db.execute(
+                update(Vehicle)
+                .where(Vehicle.id == sale.vehicle_id)
+                .values(status=VehicleStatus.DISPONIVEL, updated_at=datetime.utcnow())
+                .returning(Vehicle.external_id, Vehicle.marca, Vehicle.modelo)
+                .execution_options(synchronize_session="fetch")
+            )).one_or_none()
+            if released is not None:
+                external_id, marca, modelo = released
+                vehicle_status = VehicleStatus.DISPONIVEL
+                mark_listings_stale(self.db, LISTED_STATUSES, marca, modelo)
+                
+                # Registra no outbox a atualização do serviço principal
+                enqueue_status_update(self.db, external_id, VehicleStatus.DISPONIVEL)
         elif webhook_data.status == PaymentStatus.CONFIRMADO:
             vehicle_status = VehicleStatus.VENDIDO
         
         try:
             await self.db.commit()
+            remember_finalized(webhook_data.codigo_pagamento, webhook_data.status)
+            if vehicle_status == VehicleStatus.DISPONIVEL:
+                # Só depois do commit: antes dele a admissão ainda deve
+                # recusar novas vendas do veículo
+                vehicle_admission.release(external_id)
+                outbox_dispatcher.trigger()
             return {
                 "message": f"Pagamento {webhook_data.status.value.lower()} com sucesso",
                 "codigo_pagamento": webhook_data.codigo_pagamento,
@@ -239,10 +940,187 @@ class SaleService:
                 detail=f"Erro ao processar webhook: {str(e)}"
             )
     
-    async def get_sales(self) -> list[Sale]:
-        """Retorna todas as vendas"""
-        result = await self.db.execute(select(Sale))
-        return result.scalars().all()
+    async def process_payment_webhooks(
+        self, batch: PaymentWebhookBatch
+    ) -> PaymentWebhookBatchResponse:
+        """
+        Processa vários webhooks de pagamento em uma única transação.
+        
+        Aplica as transições com um UPDATE condicional por status de
+        destino, libera os veículos dos cancelamentos com um único UPDATE
+        e grava as entradas do outbox em um único INSERT: o custo cresce
+        com o número de lotes, não de eventos.
+        
+        Args:
+            batch: Eventos (codigo_pagamento, status)
+            
+        Returns:
+            Resultado de cada evento, na ordem enviada, com o código HTTP
+            equivalente ao do webhook individual (200, 400 ou 404)
+        """
+        results: dict[int, PaymentWebhookBatchItemResult] = {}
+        
+        def report(index: int, status_code: int, **fields) -> None:
+            results[index] = PaymentWebhookBatchItemResult(
+                index=index,
+                codigo_pagamento=batch.events[index].codigo_pagamento,
+                status_code=status_code,
+                **fields,
+            )
+        
+        # 1. Um evento por código; repetições no lote e pagamentos já
+        #    finalizados (cache em memória) não chegam ao banco
+        by_status: dict[PaymentStatus, dict[str, int]] = {}
+        seen: set[str] = set()
+        for index, event in enumerate(batch.events):
+            if event.codigo_pagamento in seen:
+                report(index, status.HTTP_400_BAD_REQUEST, detail="Pagamento repetido no lote")
+                continue
+            seen.add(event.codigo_pagamento)
+            finalized = finalized_payments.get(event.codigo_pagamento)
+            if finalized is not None:
+                report(
+                    index,
+                    status.HTTP_400_BAD_REQUEST,
+                    detail=f"Pagamento já processado com status: {finalized.value}",
+                )
+                continue
+            by_status.setdefault(event.status, {})[event.codigo_pagamento] = index
+        
+        # 2. Transições condicionais, uma instrução por status de destino
+        cancelled_vehicle_ids: dict[int, int] = {}
+        misses: dict[str, int] = {}
+        for payment_status, codes in by_status.items():
+            result = await self.db.execute(
+                update(Sale)
+                .where(
+                    Sale.codigo_pagamento.in_(codes),
+                    Sale.status_pagamento == PaymentStatus.PENDENTE,
+                )
+                .values(status_pagamento=payment_status)
+                .returning(Sale.codigo_pagamento, Sale.vehicle_id)
+                .execution_options(synchronize_session=False)
+            )
+            for codigo_pagamento, vehicle_id in result.all():
+                index = codes.pop(codigo_pagamento)
+                report(
+                    index,
+                    status.HTTP_200_OK,
+                    status_pagamento=payment_status,
+                    vehicle_status=(
+                        VehicleStatus.VENDIDO
+                        if payment_status == PaymentStatus.CONFIRMADO
+                        else None
+                    ),
+                )
+                if payment_status == PaymentStatus.CANCELADO:
+                    cancelled_vehicle_ids[vehicle_id] = index
+            misses.update(codes)
+        
+        # 3. Eventos sem transição: código inexistente ou já processado
+        if misses:
+            result = await self.db.execute(
+                select(Sale.codigo_pagamento, Sale.status_pagamento)
+                .where(Sale.codigo_pagamento.in_(misses))
+            )
+            current = dict(result.all())
+            for codigo_pagamento, index in misses.items():
+                if codigo_pagamento in current:
+                    remember_finalized(codigo_pagamento, current[codigo_pagamento])
+                    report(
+                        index,
+                        status.HTTP_400_BAD_REQUEST,
+                        detail=f"Pagamento já processado com status: {current[codigo_pagamento].value}",
+                    )
+                else:
+                    report(index, status.HTTP_404_NOT_FOUND, detail="Código de pagamento não encontrado")
+        
+        # 4. Libera os veículos dos cancelamentos em lote
+        released: list[int] = []
+        if cancelled_vehicle_ids:
+            result = await self.db.execute(
+                update(Vehicle)
+                .where(Vehicle.id.in_(cancelled_vehicle_ids))
+                .values(status=VehicleStatus.DISPONIVEL, updated_at=datetime.utcnow())
+                .returning(Vehicle.id, Vehicle.external_id, Vehicle.marca, Vehicle.modelo)
+                .execution_options(synchronize_session=False)
+            )
+            for vehicle_id, external_id, marca, modelo in result.all():
+                results[cancelled_vehicle_ids[vehicle_id]].vehicle_status = VehicleStatus.DISPONIVEL
+                released.append(external_id)
+                mark_listings_stale(self.db, LISTED_STATUSES, marca, modelo)
+            await enqueue_status_updates(
+                self.db,
+                [(external_id, VehicleStatus.DISPONIVEL) for external_id in released],
+            )
+        
+        try:
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao processar webhooks: {str(e)}"
+            )
+        
+        for result in results.values():
+            if result.status_code == status.HTTP_200_OK:
+                remember_finalized(result.codigo_pagamento, result.status_pagamento)
+        for external_id in released:
+            vehicle_admission.release(external_id)
+        if released:
+            outbox_dispatcher.trigger()
+        
+        applied = sum(1 for r in results.values() if r.status_code == status.HTTP_200_OK)
+        return PaymentWebhookBatchResponse(
+            applied=applied,
+            failed=len(batch.events) - applied,
+            results=[results[index] for index in range(len(batch.events))],
+        )
+    
+    async def get_sales(
+        self,
+        filters: SaleFilters | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[Sale], str | None]:
+        """
+        Lista vendas da mais recente para a mais antiga, paginando por (data_venda, id).
+        
+        A paginação é por chave (keyset) sobre os índices (data_venda, id),
+        (status_pagamento, data_venda, id) e (cpf_comprador, data_venda, id),
+        conforme o filtro usado.
+        
+        Args:
+            filters: Filtros de CPF, status do pagamento e período
+            cursor: Cursor retornado pela página anterior
+            limit: Tamanho da página (padrão LISTING_PAGE_SIZE)
+            
+        Returns:
+            (vendas da página, cursor da próxima página ou None)
+            
+        Raises:
+            HTTPException 400: Se o cursor é inválido
+        """
+        limit = limit or settings.LISTING_PAGE_SIZE
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, (datetime.fromisoformat, int))
+            except InvalidCursor as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(exc)
+                )
+        
+        stmt = keyset_page(
+            select(Sale).where(*sale_listing_conditions(filters)),
+            SALE_LISTING_KEY, after, limit, descending=True,
+        )
+        result = await self.db.execute(stmt)
+        return split_page(
+            list(result.scalars().all()), limit, lambda sale: (sale.data_venda, sale.id)
+        )
     
     async def get_sale_by_codigo(self, codigo_pagamento: str) -> Sale | None:
         """Busca venda pelo código de pagamento"""
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas concorrentes por chave.
+
+    Enquanto uma chamada para uma chave está em andamento, as demais
+    chamadas com a mesma chave aguardam o mesmo resultado em vez de
+    executar o trabalho novamente.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Indica se há uma chamada em andamento para a chave"""
+        return key in self._calls
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """
+        Executa fn uma única vez por chave entre chamadores concorrentes.
+
+        Args:
+            key: Chave de coalescência
+            fn: Função assíncrona que produz o resultado
+
+        Returns:
+            Tupla (resultado, compartilhado). compartilhado é True quando
+            o resultado veio da chamada de outro chamador.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # O líder foi cancelado: tenta novamente, a menos que o
+                # cancelamento seja do próprio chamador
+                task = asyncio.current_task()
+                if future.cancelled() and not (task and task.cancelling()):
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Evita o aviso "exception was never retrieved" quando não há seguidores
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
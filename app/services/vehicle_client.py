@@ -1,60 +1,455 @@
+import asyncio
+import logging
 import httpx
-from typing import Optional
+from typing import AsyncIterator, Iterable, Optional
+from app.core.cache import LRUCache
 from app.core.config import settings
 from app.schemas.schemas import VehicleSync
+from app.services.json_stream import JsonArrayStreamParser
+from app.services.resilience import (
+    CircuitBreaker,
+    RetryBudget,
+    VehicleServiceUnavailable,
+    backoff_delay,
+    remaining_budget,
+)
+
+logger = logging.getLogger(__name__)
+
+# Retornado por get_vehicle(conditional=True) quando o serviço principal
+# responde 304: o veículo não mudou desde a última busca.
+NOT_MODIFIED = object()
+
+# Respostas 4xx que indicam falha passageira (retentáveis)
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+
+
+class VehicleStatusRejected(Exception):
+    """Serviço principal recusou a atualização de status (4xx, não retentável)"""
 
 
 class VehicleClient:
     """
     Cliente HTTP para comunicação com o serviço principal de veículos.
     Responsável por buscar e sincronizar dados de veículos.
+    
+    Mantém um único httpx.AsyncClient (pool de conexões keep-alive) durante
+    todo o ciclo de vida da aplicação. O pool é aberto e fechado pelo
+    lifespan em app/main.py; fora dele (ex.: testes) é criado sob demanda.
+    
+    Todas as chamadas passam por _request, que aplica o prazo da requisição
+    de entrada, retentativas com backoff dentro de um orçamento global e um
+    circuit breaker que falha rápido enquanto o serviço principal está doente.
     """
     
     def __init__(self):
         self.base_url = settings.VEHICLE_SERVICE_URL
-        self.timeout = 30.0
+        self.timeout = settings.VEHICLE_CLIENT_TIMEOUT
+        # O cliente conversa com um único host, portanto o limite do pool
+        # é também o limite de conexões por host.
+        self.limits = httpx.Limits(
+            max_connections=settings.VEHICLE_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.VEHICLE_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.VEHICLE_CLIENT_KEEPALIVE_EXPIRY,
+        )
+        self.http2 = settings.VEHICLE_CLIENT_HTTP2
+        self.batch_concurrency = settings.VEHICLE_CLIENT_BATCH_CONCURRENCY
+        self.bulk_endpoint = settings.VEHICLE_SERVICE_BULK_ENDPOINT
+        self.get_timeout = settings.VEHICLE_CLIENT_GET_TIMEOUT
+        self.update_timeout = settings.VEHICLE_CLIENT_UPDATE_TIMEOUT
+        self.max_retries = settings.VEHICLE_CLIENT_MAX_RETRIES
+        self.retry_backoff = settings.VEHICLE_CLIENT_RETRY_BACKOFF
+        self.retry_backoff_max = settings.VEHICLE_CLIENT_RETRY_BACKOFF_MAX
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            probe_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+        )
+        self.retry_budget = RetryBudget(
+            ratio=settings.VEHICLE_CLIENT_RETRY_BUDGET_RATIO,
+            min_tokens=settings.VEHICLE_CLIENT_RETRY_BUDGET_MIN,
+            max_tokens=settings.VEHICLE_CLIENT_RETRY_BUDGET_MAX,
+        )
+        # Validadores HTTP por veículo para revalidação condicional
+        self.validators = LRUCache(maxsize=settings.VEHICLE_CLIENT_VALIDATORS_MAX_SIZE)
+        self.not_modified = 0
+        # IDs que retornaram 404 recentemente (cache negativo, LRU + TTL curto)
+        self.negative_cache = LRUCache(
+            maxsize=settings.VEHICLE_NEGATIVE_CACHE_MAX_SIZE,
+            ttl=settings.VEHICLE_NEGATIVE_CACHE_TTL_SECONDS,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("Pacote 'h2' não instalado; usando HTTP/1.1 com o serviço de veículos")
+                http2 = False
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=http2,
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartilhado (criado sob demanda se necessário)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+    
+    async def start(self) -> None:
+        """Abre o pool de conexões (chamado no startup da aplicação)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+    
+    async def close(self) -> None:
+        """Fecha o pool de conexões (chamado no shutdown da aplicação)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def stats(self) -> dict:
+        """Estado do circuit breaker e do orçamento de retentativas"""
+        return {
+            "circuit_breaker": self.circuit_breaker.snapshot(),
+            "retry_budget": self.retry_budget.snapshot(),
+            "conditional_requests": {
+                "validators": len(self.validators),
+                "not_modified": self.not_modified,
+            },
+            "negative_cache": self.negative_cache.stats(),
+        }
+    
+    def _operation_timeout(self, timeout: float) -> float:
+        """Timeout da operação limitado ao prazo restante da requisição"""
+        remaining = remaining_budget()
+        if remaining is None:
+            return timeout
+        return min(timeout, remaining)
+    
+    async def _request(
+        self, method: str, url: str, timeout: float, **kwargs
+    ) -> httpx.Response:
+        """
+        Executa uma chamada ao serviço principal com prazo, retentativas
+        e circuit breaker.
+        
+        Respostas 5xx e erros de transporte contam como falha e são
+        retentadas; qualquer outra resposta é devolvida ao chamador.
+        
+        Raises:
+            VehicleServiceUnavailable: Circuito aberto, prazo esgotado ou
+                tentativas/orçamento de retentativas esgotados
+        """
+        # Prazo verificado antes de ocupar a vaga de teste do circuit breaker
+        if self._operation_timeout(timeout) <= 0:
+            raise VehicleServiceUnavailable("Prazo da requisição esgotado")
+        if not self.circuit_breaker.allow_request():
+            raise VehicleServiceUnavailable("Circuito aberto para o serviço de veículos")
+        self.retry_budget.record_request()
+        
+        try:
+            attempt = 0
+            while True:
+                attempt_timeout = self._operation_timeout(timeout)
+                if attempt_timeout <= 0:
+                    raise VehicleServiceUnavailable("Prazo da requisição esgotado")
+                
+                try:
+                    response = await self.client.request(
+                        method, url, timeout=attempt_timeout, **kwargs
+                    )
+                except httpx.RequestError as e:
+                    error = str(e) or e.__class__.__name__
+                else:
+                    if response.status_code < 500:
+                        self.circuit_breaker.record_success()
+                        return response
+                    error = f"HTTP {response.status_code}"
+                
+                self.circuit_breaker.record_failure()
+                logger.warning(
+                    "Falha na chamada %s %s (tentativa %d): %s", method, url, attempt + 1, error
+                )
+                
+                attempt += 1
+                if attempt > self.max_retries or not self.retry_budget.try_withdraw():
+                    raise VehicleServiceUnavailable(error)
+                
+                delay = backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max)
+                remaining = remaining_budget()
+                if remaining is not None and delay >= remaining:
+                    raise VehicleServiceUnavailable(error)
+                await asyncio.sleep(delay)
+                
+                if not self.circuit_breaker.allow_request():
+                    raise VehicleServiceUnavailable(error)
+        finally:
+            # Saída sem resultado (prazo, cancelamento) não prende o half-open
+            self.circuit_breaker.release_probe()
     
-    async def get_vehicle(self, vehicle_id: int) -> Optional[dict]:
+    async def get_vehicle(self, vehicle_id: int, conditional: bool = False):
         """
         Busca um veículo do serviço principal pelo ID.
         
         Args:
             vehicle_id: ID do veículo no serviço principal
+            conditional: Envia If-None-Match / If-Modified-Since com os
+                validadores da última resposta. Use apenas quando o chamador
+                já possui uma cópia local do veículo.
             
+        IDs que retornaram 404 há menos de VEHICLE_NEGATIVE_CACHE_TTL_SECONDS
+        são respondidos pelo cache negativo, sem chamada ao serviço principal.
+        
         Returns:
-            Dados do veículo ou None se não encontrado
+            Dados do veículo, None se não encontrado ou NOT_MODIFIED se a
+            requisição condicional retornou 304
+            
+        Raises:
+            VehicleServiceUnavailable: Serviço principal indisponível
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/vehicles/{vehicle_id}"
-                )
-                if response.status_code == 200:
-                    return response.json()
-                return None
-            except httpx.RequestError as e:
-                print(f"Erro ao conectar com serviço de veículos: {e}")
-                return None
-    
-    async def get_available_vehicles(self) -> list[dict]:
+        if self.negative_cache.get(vehicle_id):
+            return None
+        
+        headers = {}
+        if conditional:
+            validators = self.validators.get(vehicle_id)
+            if validators:
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+        
+        response = await self._request(
+            "GET",
+            f"{self.base_url}/api/v1/vehicles/{vehicle_id}",
+            timeout=self.get_timeout,
+            headers=headers,
+        )
+        if response.status_code == 304 and headers:
+            self.not_modified += 1
+            return NOT_MODIFIED
+        if response.status_code == 200:
+            self._store_validators(vehicle_id, response)
+            return response.json()
+        self.validators.pop(vehicle_id)
+        if response.status_code == 404:
+            self.negative_cache.set(vehicle_id, True)
+        return None
+    
+    def _store_validators(self, vehicle_id: int, response: httpx.Response) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.validators.set(
+                vehicle_id, {"etag": etag, "last_modified": last_modified}
+            )
+        else:
+            self.validators.pop(vehicle_id)
+    
+    async def get_vehicles(self, vehicle_ids: Iterable[int]) -> dict[int, dict]:
         """
-        Busca todos os veículos disponíveis do serviço principal.
+        Busca vários veículos do serviço principal de uma só vez.
+        
+        Usa o endpoint bulk do serviço principal quando configurado
+        (VEHICLE_SERVICE_BULK_ENDPOINT); caso contrário dispara as buscas
+        individuais em paralelo, limitadas a VEHICLE_CLIENT_BATCH_CONCURRENCY.
         
+        Args:
+            vehicle_ids: IDs dos veículos no serviço principal
+            
         Returns:
-            Lista de veículos disponíveis
+            Dicionário {id: {"data": dados | None, "error": erro | None}}.
+            "error" é "not_found" quando o veículo não existe no serviço
+            principal ou a mensagem da falha de comunicação.
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/vehicles/",
-                    params={"status": "DISPONIVEL"}
-                )
-                if response.status_code == 200:
-                    return response.json()
-                return []
-            except httpx.RequestError as e:
-                print(f"Erro ao conectar com serviço de veículos: {e}")
-                return []
+        results = {}
+        ids = []
+        for vehicle_id in dict.fromkeys(vehicle_ids):
+            if self.negative_cache.get(vehicle_id):
+                results[vehicle_id] = {"data": None, "error": "not_found"}
+            else:
+                ids.append(vehicle_id)
+        if not ids:
+            return results
+        
+        if self.bulk_endpoint:
+            fetched = await self._get_vehicles_bulk(ids)
+        else:
+            fetched = await self._get_vehicles_fan_out(ids)
+        
+        for vehicle_id, item in fetched.items():
+            if item["error"] == "not_found":
+                self.negative_cache.set(vehicle_id, True)
+        results.update(fetched)
+        return results
+    
+    async def _get_vehicles_fan_out(self, ids: list[int]) -> dict[int, dict]:
+        """Busca vários veículos com requisições individuais em paralelo"""
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
+        
+        async def fetch(vehicle_id: int) -> tuple[int, dict]:
+            async with semaphore:
+                try:
+                    response = await self._request(
+                        "GET",
+                        f"{self.base_url}/api/v1/vehicles/{vehicle_id}",
+                        timeout=self.get_timeout,
+                    )
+                except VehicleServiceUnavailable as e:
+                    return vehicle_id, {"data": None, "error": str(e)}
+            if response.status_code == 200:
+                return vehicle_id, {"data": response.json(), "error": None}
+            if response.status_code == 404:
+                return vehicle_id, {"data": None, "error": "not_found"}
+            return vehicle_id, {
+                "data": None,
+                "error": f"HTTP {response.status_code}",
+            }
+        
+        results = await asyncio.gather(*(fetch(vehicle_id) for vehicle_id in ids))
+        return dict(results)
+    
+    async def _get_vehicles_bulk(self, ids: list[int]) -> dict[int, dict]:
+        """Busca vários veículos com uma única requisição ao endpoint bulk"""
+        try:
+            response = await self._request(
+                "GET",
+                f"{self.base_url}{self.bulk_endpoint}",
+                timeout=self.timeout,
+                params={"ids": ",".join(str(vehicle_id) for vehicle_id in ids)}
+            )
+        except VehicleServiceUnavailable as e:
+            logger.error("Erro ao conectar com serviço de veículos: %s", e)
+            return {vehicle_id: {"data": None, "error": str(e)} for vehicle_id in ids}
+        
+        if response.status_code != 200:
+            error = f"HTTP {response.status_code}"
+            return {vehicle_id: {"data": None, "error": error} for vehicle_id in ids}
+        
+        found = {item["id"]: item for item in response.json()}
+        return {
+            vehicle_id: (
+                {"data": found[vehicle_id], "error": None}
+                if vehicle_id in found
+                else {"data": None, "error": "not_found"}
+            )
+            for vehicle_id in ids
+        }
+    
+    async def get_available_vehicles(
+        self, skip: int = 0, limit: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Busca os veículos disponíveis do serviço principal.
+        
+        Args:
+            skip: Quantidade de veículos a pular (paginação)
+            limit: Tamanho da página (None busca o catálogo inteiro)
+            
+        Returns:
+            Lista de veículos disponíveis (vazia em caso de falha)
+        """
+        try:
+            return await self.get_available_vehicles_page(skip, limit)
+        except VehicleServiceUnavailable as e:
+            logger.error("Erro ao conectar com serviço de veículos: %s", e)
+            return []
+    
+    async def get_available_vehicles_page(
+        self, skip: int = 0, limit: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Busca uma página do catálogo de veículos disponíveis.
+        
+        Diferente de get_available_vehicles, falhas não viram lista vazia,
+        para que a sincronização do catálogo não confunda erro com fim.
+        
+        Raises:
+            VehicleServiceUnavailable: Serviço principal indisponível ou
+                resposta diferente de 200
+        """
+        params = {"status": "DISPONIVEL"}
+        if skip:
+            params["skip"] = skip
+        if limit is not None:
+            params["limit"] = limit
+        response = await self._request(
+            "GET",
+            f"{self.base_url}/api/v1/vehicles/",
+            timeout=self.timeout,
+            params=params
+        )
+        if response.status_code != 200:
+            raise VehicleServiceUnavailable(f"HTTP {response.status_code}")
+        return response.json()
+    
+    async def iter_available_vehicles(
+        self, chunk_size: int, skip: int = 0, limit: Optional[int] = None
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Percorre o catálogo de veículos disponíveis em modo streaming.
+        
+        O corpo da resposta é lido incrementalmente e os veículos são
+        entregues em blocos de até chunk_size, mantendo a memória constante
+        independentemente do tamanho do catálogo. Não há retentativa: um
+        corpo parcialmente consumido não pode ser repetido.
+        
+        Args:
+            chunk_size: Quantidade de veículos por bloco
+            skip: Quantidade de veículos a pular (paginação)
+            limit: Tamanho da página (None busca o catálogo inteiro)
+            
+        Raises:
+            VehicleServiceUnavailable: Circuito aberto, falha de conexão,
+                resposta diferente de 200 ou corpo inválido
+        """
+        timeout = self._operation_timeout(self.timeout)
+        if timeout <= 0:
+            raise VehicleServiceUnavailable("Prazo da requisição esgotado")
+        if not self.circuit_breaker.allow_request():
+            raise VehicleServiceUnavailable("Circuito aberto para o serviço de veículos")
+        
+        params = {"status": "DISPONIVEL"}
+        if skip:
+            params["skip"] = skip
+        if limit is not None:
+            params["limit"] = limit
+        
+        parser = JsonArrayStreamParser()
+        chunk: list[dict] = []
+        try:
+            async with self.client.stream(
+                "GET",
+                f"{self.base_url}/api/v1/vehicles/",
+                params=params,
+                timeout=timeout,
+            ) as response:
+                if response.status_code != 200:
+                    raise VehicleServiceUnavailable(f"HTTP {response.status_code}")
+                async for text in response.aiter_text():
+                    for item in parser.feed(text):
+                        chunk.append(item)
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                parser.close()
+        except (httpx.RequestError, ValueError, VehicleServiceUnavailable) as e:
+            self.circuit_breaker.record_failure()
+            if isinstance(e, VehicleServiceUnavailable):
+                raise
+            raise VehicleServiceUnavailable(str(e) or e.__class__.__name__) from e
+        finally:
+            # Consumidor que parou de ler (GeneratorExit) ou cancelamento
+            self.circuit_breaker.release_probe()
+        
+        self.circuit_breaker.record_success()
+        if chunk:
+            yield chunk
     
     async def update_vehicle_status(self, vehicle_id: int, status: str) -> bool:
         """
@@ -65,18 +460,28 @@ class VehicleClient:
             status: Novo status (DISPONIVEL ou VENDIDO)
             
         Returns:
-            True se atualização foi bem-sucedida
+            True se atualização foi bem-sucedida; False em falha
+            retentável (circuito aberto, prazo, timeout, 5xx)
+            
+        Raises:
+            VehicleStatusRejected: Se o serviço principal recusou a
+                atualização (4xx); reenviar não mudará o resultado
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.put(
-                    f"{self.base_url}/api/v1/vehicles/{vehicle_id}",
-                    json={"status": status}
-                )
-                return response.status_code == 200
-            except httpx.RequestError as e:
-                print(f"Erro ao atualizar veículo no serviço principal: {e}")
-                return False
+        try:
+            response = await self._request(
+                "PUT",
+                f"{self.base_url}/api/v1/vehicles/{vehicle_id}",
+                timeout=self.update_timeout,
+                json={"status": status}
+            )
+        except VehicleServiceUnavailable as e:
+            logger.error("Erro ao atualizar veículo no serviço principal: %s", e)
+            return False
+        if response.status_code == 200:
+            return True
+        if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+            raise VehicleStatusRejected(f"HTTP {response.status_code}")
+        return False
 
 
 vehicle_client = VehicleClient()
@@ -0,0 +1,150 @@
+from datetime import datetime
+from sqlalchemy import case, inspect, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.services.listing_cache import LISTED_STATUSES, mark_listings_stale
+from app.services.outbox import pending_status_exists
+from app.models.models import Vehicle, VehicleStatus
+
+# Campos do cache local atualizados a partir do serviço principal
+SYNCED_FIELDS = ("marca", "modelo", "ano", "cor", "preco", "status")
+
+# Linhas por instrução INSERT ... ON CONFLICT (limita o número de parâmetros)
+UPSERT_BATCH_SIZE = 500
+
+
+def vehicle_values(vehicle_data: dict) -> dict:
+    """Converte os dados do serviço principal em colunas do cache local"""
+    data_cadastro = vehicle_data.get("data_cadastro")
+    if isinstance(data_cadastro, str):
+        data_cadastro = datetime.fromisoformat(data_cadastro.replace("Z", "+00:00"))
+    values = {
+        "external_id": vehicle_data["id"],
+        "marca": vehicle_data["marca"],
+        "modelo": vehicle_data["modelo"],
+        "ano": vehicle_data["ano"],
+        "cor": vehicle_data["cor"],
+        "preco": vehicle_data["preco"],
+        "status": VehicleStatus(vehicle_data["status"]),
+    }
+    if data_cadastro is not None:
+        values["data_cadastro"] = data_cadastro
+    return values
+
+
+def build_upsert_statement(insert, batch: list[dict]):
+    """
+    Monta o INSERT ... ON CONFLICT (external_id) DO UPDATE ... RETURNING.
+
+    O status local é mantido enquanto houver entrada pendente no outbox
+    para o veículo: o serviço principal ainda não recebeu a venda ou o
+    cancelamento e devolveria o status anterior.
+    """
+    stmt = insert(Vehicle).values(batch)
+    # Coluna da linha existente por nome: o SQLAlchemy não correlaciona
+    # subconsultas no DO UPDATE (acrescentaria "vehicles" ao FROM)
+    existing_external_id = literal_column(f"{Vehicle.__tablename__}.external_id")
+    return stmt.on_conflict_do_update(
+        index_elements=[Vehicle.external_id],
+        set_={
+            **{field: stmt.excluded[field] for field in SYNCED_FIELDS},
+            "status": case(
+                (pending_status_exists(existing_external_id), Vehicle.status),
+                else_=stmt.excluded.status,
+            ),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(Vehicle)
+
+
+def _loaded_values(db: AsyncSession) -> dict[int, dict]:
+    """
+    SYNCED_FIELDS dos veículos já carregados na sessão, por external_id.
+
+    Lê o estado carregado sem disparar consultas; objetos com algum campo
+    expirado ficam de fora (valores anteriores desconhecidos).
+    """
+    loaded = {}
+    for obj in db.identity_map.values():
+        if not isinstance(obj, Vehicle):
+            continue
+        state = inspect(obj).dict
+        if "external_id" in state and all(field in state for field in SYNCED_FIELDS):
+            loaded[state["external_id"]] = {field: state[field] for field in SYNCED_FIELDS}
+    return loaded
+
+
+def _mark_changed_listings(
+    db: AsyncSession,
+    previous: dict[int, dict],
+    vehicles: list[Vehicle],
+    existing_loaded: bool,
+) -> None:
+    """Registra as listagens atingidas pelos veículos que mudaram de fato"""
+    for vehicle in vehicles:
+        before = previous.get(vehicle.external_id)
+        if before is None and not existing_loaded:
+            # Linha existente fora da sessão: status e marca anteriores
+            # desconhecidos, atinge as listagens inteiras
+            mark_listings_stale(db, LISTED_STATUSES)
+            return
+        if before is not None:
+            if all(before[field] == getattr(vehicle, field) for field in SYNCED_FIELDS):
+                continue
+            mark_listings_stale(db, [before["status"]], before["marca"], before["modelo"])
+        mark_listings_stale(db, [vehicle.status], vehicle.marca, vehicle.modelo)
+
+
+async def upsert_vehicles(
+    db: AsyncSession, rows: list[dict], existing_loaded: bool = False
+) -> list[Vehicle]:
+    """
+    Grava veículos no cache local com INSERT ... ON CONFLICT DO UPDATE.
+
+    Usa o external_id como chave de conflito e RETURNING para devolver os
+    registros gravados: um round trip por lote de UPSERT_BATCH_SIZE linhas,
+    tanto no Postgres (asyncpg) quanto no SQLite (aiosqlite). Os objetos já
+    presentes na sessão são atualizados com os valores retornados. Veículos
+    com status pendente no outbox mantêm o status local.
+
+    Só os veículos novos ou com algum campo listado alterado marcam as
+    listagens para invalidação (mark_listings_stale), e apenas as do status
+    e da marca/modelo anteriores e atuais. Os valores anteriores vêm dos
+    objetos já carregados na sessão.
+
+    Não faz commit: a gravação participa da transação do chamador.
+
+    Args:
+        db: Sessão do banco
+        rows: Linhas no formato de vehicle_values
+        existing_loaded: O chamador carregou na sessão todos os veículos já
+            existentes das linhas; os ausentes dela são novos. Se False, um
+            veículo fora da sessão invalida as listagens inteiras.
+
+    Returns:
+        Vehicles gravados, na ordem das linhas (sem external_id repetido)
+    """
+    if not rows:
+        return []
+    # Um mesmo external_id duas vezes no lote é erro no Postgres; vale o último
+    rows = list({row["external_id"]: row for row in rows}.values())
+
+    insert = dialect_insert(db)
+    previous = _loaded_values(db)
+
+    now = datetime.utcnow()
+    vehicles: list[Vehicle] = []
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = [
+            {"data_cadastro": now, **row, "updated_at": now}
+            for row in rows[start:start + UPSERT_BATCH_SIZE]
+        ]
+        result = await db.scalars(
+            build_upsert_statement(insert, batch),
+            execution_options={"populate_existing": True},
+        )
+        by_external_id = {vehicle.external_id: vehicle for vehicle in result.all()}
+        vehicles.extend(by_external_id[row["external_id"]] for row in batch)
+    _mark_changed_listings(db, previous, vehicles, existing_loaded)
+    return vehicles
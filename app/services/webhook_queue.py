@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.database import AsyncSessionLocal, dialect_insert, dialect_name
+from app.models.models import PaymentWebhookEvent
+from app.schemas.schemas import PAYMENT_WEBHOOK_BATCH_MAX_EVENTS, PaymentWebhook, PaymentWebhookBatch
+from app.services.sale_service import SaleService
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_payment_webhook(db: AsyncSession, webhook_data: PaymentWebhook) -> bool:
+    """
+    Grava o webhook na fila durável e faz commit.
+
+    Returns:
+        False se o mesmo (codigo_pagamento, status) já estava na fila
+    """
+    insert = dialect_insert(db)
+    event_id = await db.scalar(
+        insert(PaymentWebhookEvent)
+        .values(
+            codigo_pagamento=webhook_data.codigo_pagamento,
+            status=webhook_data.status,
+            received_at=datetime.utcnow(),
+            attempts=0,
+        )
+        .on_conflict_do_nothing(index_elements=["codigo_pagamento", "status"])
+        .returning(PaymentWebhookEvent.id)
+    )
+    await db.commit()
+    return event_id is not None
+
+
+class PaymentWebhookQueue:
+    """
+    Workers que aplicam os webhooks da fila durável em lotes.
+
+    Cada worker reivindica um lote de eventos pendentes em ordem de
+    chegada (FOR UPDATE SKIP LOCKED no Postgres, para que workers e
+    réplicas não disputem os mesmos eventos) e o aplica com
+    SaleService.process_payment_webhooks; os eventos são marcados como
+    processados na mesma transação. Um lote que falha volta à fila com
+    backoff. Sem SKIP LOCKED (SQLite) um único worker é usado.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.workers = max(1, settings.WEBHOOK_QUEUE_WORKERS)
+        self.batch_size = min(settings.WEBHOOK_QUEUE_BATCH_SIZE, PAYMENT_WEBHOOK_BATCH_MAX_EVENTS)
+        self.retry_backoff = settings.WEBHOOK_QUEUE_RETRY_BACKOFF
+        self.retry_backoff_max = settings.WEBHOOK_QUEUE_RETRY_BACKOFF_MAX
+        self.processed = 0
+        self.applied = 0
+        self.failed_batches = 0
+        self.task = PeriodicTask(
+            "payment-webhook-queue", self.drain, settings.WEBHOOK_QUEUE_INTERVAL_SECONDS
+        )
+
+    def start(self) -> None:
+        self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+
+    def trigger(self) -> None:
+        """Antecipa a próxima rodada (chamado após enfileirar um evento)"""
+        self.task.trigger()
+
+    async def drain(self) -> int:
+        """
+        Processa a fila com todos os workers até esvaziá-la.
+
+        Returns:
+            Quantidade de eventos processados
+        """
+        async with self.session_factory() as db:
+            workers = self.workers if dialect_name(db) == "postgresql" else 1
+        totals = await asyncio.gather(*(self._worker() for _ in range(workers)))
+        return sum(totals)
+
+    async def _worker(self) -> int:
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    async def process_batch(self) -> int:
+        """
+        Reivindica e aplica um lote de eventos pendentes.
+
+        Returns:
+            Quantidade de eventos processados no lote
+        """
+        async with self.session_factory() as db:
+            now = datetime.utcnow()
+            result = await db.execute(
+                select(PaymentWebhookEvent)
+                .where(
+                    PaymentWebhookEvent.processed_at.is_(None),
+                    or_(
+                        PaymentWebhookEvent.next_attempt_at.is_(None),
+                        PaymentWebhookEvent.next_attempt_at <= now,
+                    ),
+                )
+                .order_by(PaymentWebhookEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = result.scalars().all()
+            if not events:
+                return 0
+
+            ids = [event.id for event in events]
+            batch = PaymentWebhookBatch(events=[
+                PaymentWebhook(codigo_pagamento=event.codigo_pagamento, status=event.status)
+                for event in events
+            ])
+            # Marcados como processados na transação que aplica o lote
+            await db.execute(
+                update(PaymentWebhookEvent)
+                .where(PaymentWebhookEvent.id.in_(ids))
+                .values(processed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            attempts = max(event.attempts or 0 for event in events) + 1
+            try:
+                report = await SaleService(db).process_payment_webhooks(batch)
+            except Exception as e:
+                await db.rollback()
+                error = str(e.detail) if isinstance(e, HTTPException) else str(e)
+                await self._record_failure(db, ids, attempts, error)
+                return 0
+
+        self.processed += len(events)
+        self.applied += report.applied
+        return len(events)
+
+    async def _record_failure(
+        self, db: AsyncSession, ids: list[int], attempts: int, error: str
+    ) -> None:
+        """Devolve o lote à fila com backoff (a transação do lote já foi desfeita)"""
+        self.failed_batches += 1
+        delay = min(self.retry_backoff_max, self.retry_backoff * (2 ** (attempts - 1)))
+        await db.execute(
+            update(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id.in_(ids))
+            .values(
+                attempts=PaymentWebhookEvent.attempts + 1,
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                last_error=error,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        logger.warning(
+            "Falha ao aplicar lote de %d webhooks (tentativa %d): %s", len(ids), attempts, error
+        )
+
+    async def stats(self, db: AsyncSession) -> dict:
+        """Profundidade da fila e atraso do evento pendente mais antigo"""
+        result = await db.execute(
+            select(func.count(), func.min(PaymentWebhookEvent.received_at))
+            .where(PaymentWebhookEvent.processed_at.is_(None))
+        )
+        pending, oldest = result.one()
+        return {
+            "pending": pending,
+            "lag_seconds": (
+                (datetime.utcnow() - oldest).total_seconds() if oldest else None
+            ),
+            "processed": self.processed,
+            "applied": self.applied,
+            "failed_batches": self.failed_batches,
+            "workers": self.workers,
+            "scheduler": self.task.stats(),
+        }
+
+
+async def purge_processed_events(session_factory=AsyncSessionLocal) -> int:
+    """
+    Remove os eventos processados há mais de WEBHOOK_EVENT_RETENTION_SECONDS.
+
+    Reentregas são descartadas pela unicidade de (codigo_pagamento, status)
+    apenas dentro dessa janela; depois dela, uma reentrega volta à fila e é
+    descartada como pagamento já finalizado. Eventos pendentes não são
+    removidos.
+
+    Returns:
+        Quantidade de eventos removidos
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.WEBHOOK_EVENT_RETENTION_SECONDS)
+    async with session_factory() as session:
+        result = await session.execute(
+            delete(PaymentWebhookEvent).where(PaymentWebhookEvent.processed_at <= cutoff)
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info("Eventos de webhook processados removidos: %d", result.rowcount)
+    return result.rowcount
+
+
+payment_webhook_queue = PaymentWebhookQueue()
+
+webhook_event_purger = PeriodicTask(
+    "webhook-event-purge", purge_processed_events, settings.WEBHOOK_EVENT_PURGE_INTERVAL_SECONDS
+)
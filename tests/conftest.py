@@ -1,10 +1,16 @@
 import pytest
 import pytest_asyncio
 import asyncio
+from contextlib import contextmanager
 from unittest.mock import patch, AsyncMock
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from app.database import Base, get_db
+from app.database import Base, get_db, get_session_factory
 from app.main import app
+from app.models.models import PaymentStatus, Sale, Vehicle, VehicleStatus
+from app.services.admission import vehicle_admission
+from app.services.finalized_payments import finalized_payments
+from app.services.listing_cache import listing_cache
 
 
 # Criar engine de teste em memória
@@ -14,6 +20,53 @@ test_engine = create_async_engine(TEST_DATABASE_URL, echo=False)
 TestSessionLocal = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
 
 
+async def create_sales(
+    db_session,
+    statuses: list[PaymentStatus],
+    start: int = 1,
+    **sale_fields,
+) -> list[Sale]:
+    """
+    Cria um veículo vendido e sua venda para cada status de pagamento.
+
+    Os veículos recebem external_id a partir de `start` e as vendas o
+    código "pagamento-<external_id>"; `sale_fields` (ex.: data_venda)
+    são repassados a todas as vendas.
+    """
+    sales = []
+    for external_id, payment_status in enumerate(statuses, start=start):
+        vehicle = Vehicle(
+            external_id=external_id, marca="Toyota", modelo="Corolla", ano=2023,
+            cor="Preto", preco=95000.00, status=VehicleStatus.VENDIDO,
+        )
+        db_session.add(vehicle)
+        await db_session.flush()
+        sale = Sale(
+            vehicle_id=vehicle.id, cpf_comprador="529.982.247-25",
+            codigo_pagamento=f"pagamento-{external_id}", status_pagamento=payment_status,
+            valor_venda=95000.00, **sale_fields,
+        )
+        db_session.add(sale)
+        sales.append(sale)
+    await db_session.commit()
+    return sales
+
+
+@contextmanager
+def capture_statements(engine=test_engine):
+    """Registra as instruções SQL enviadas pelo engine dentro do bloco"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest_asyncio.fixture(scope="function")
 async def db_session():
     """Cria uma sessão de banco de dados para testes"""
@@ -34,12 +87,25 @@ async def override_dependencies(db_session):
         yield db_session
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestSessionLocal
     
     yield
     
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """Reservas, pagamentos finalizados e listagens em memória não vazam entre testes"""
+    vehicle_admission.clear()
+    finalized_payments.clear()
+    listing_cache.clear()
+    yield
+    vehicle_admission.clear()
+    finalized_payments.clear()
+    listing_cache.clear()
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Cria um event loop para toda a sessão de testes"""
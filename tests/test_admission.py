@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+
+from app.services.admission import VehicleAdmission, VehicleAdmissionBusy, VehicleAlreadyReserved
+
+
+@pytest.mark.asyncio
+async def test_admission_serializes_per_vehicle():
+    admission = VehicleAdmission(wait_timeout=1.0, reserved_ttl=30.0, maxsize=10)
+    order = []
+    
+    async def sale(name):
+        async with admission.admit(1):
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-end")
+    
+    await asyncio.gather(sale("a"), sale("b"))
+    assert order == ["a-start", "a-end", "b-start", "b-end"]
+    assert admission.stats()["in_progress"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_waiters_after_reservation():
+    admission = VehicleAdmission(wait_timeout=1.0, reserved_ttl=30.0, maxsize=10)
+    
+    async def winner():
+        async with admission.admit(1):
+            await asyncio.sleep(0.01)
+            admission.mark_reserved(1)
+    
+    async def loser():
+        async with admission.admit(1):
+            pass
+    
+    results = await asyncio.gather(winner(), loser(), loser(), return_exceptions=True)
+    assert results[0] is None
+    assert all(isinstance(r, VehicleAlreadyReserved) for r in results[1:])
+    
+    with pytest.raises(VehicleAlreadyReserved):
+        async with admission.admit(1):
+            pass
+    assert admission.stats()["rejected"] == 3
+
+
+@pytest.mark.asyncio
+async def test_admission_next_proceeds_after_failure():
+    admission = VehicleAdmission(wait_timeout=1.0, reserved_ttl=30.0, maxsize=10)
+    
+    async def failing():
+        async with admission.admit(1):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("falha")
+    
+    async def succeeding():
+        async with admission.admit(1):
+            admission.mark_reserved(1)
+            return "ok"
+    
+    results = await asyncio.gather(failing(), succeeding(), return_exceptions=True)
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_admission_wait_timeout():
+    admission = VehicleAdmission(wait_timeout=0.01, reserved_ttl=30.0, maxsize=10)
+    
+    async def slow():
+        async with admission.admit(1):
+            await asyncio.sleep(0.05)
+    
+    async def impatient():
+        async with admission.admit(1):
+            pass
+    
+    results = await asyncio.gather(slow(), impatient(), return_exceptions=True)
+    assert results[0] is None
+    assert isinstance(results[1], VehicleAdmissionBusy)
+    assert admission.stats()["timed_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_release():
+    admission = VehicleAdmission(wait_timeout=1.0, reserved_ttl=30.0, maxsize=10)
+    admission.mark_reserved(1)
+    admission.release(1)
+    async with admission.admit(1):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_sale_waiting_too_long_gets_retryable_503():
+    from unittest.mock import MagicMock, patch
+    from fastapi import HTTPException
+    from app.schemas.schemas import SaleCreate
+    from app.services.sale_service import SaleService
+    
+    admission = VehicleAdmission(wait_timeout=0.01, reserved_ttl=30.0, maxsize=10)
+    with patch("app.services.sale_service.vehicle_admission", admission):
+        async with admission.admit(1):
+            with pytest.raises(HTTPException) as exc:
+                await SaleService(MagicMock()).create_sale(
+                    SaleCreate(vehicle_id=1, cpf_comprador="52998224725")
+                )
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+    assert not admission.is_reserved(1)
+
+
+@pytest.mark.asyncio
+async def test_webhook_cancel_releases_admission_only_after_commit(db_session):
+    from unittest.mock import AsyncMock, patch
+    from fastapi import HTTPException
+    from app.models.models import PaymentStatus
+    from app.schemas.schemas import PaymentWebhook
+    from app.services.sale_service import SaleService
+    from tests.conftest import create_sales
+    
+    [sale] = await create_sales(db_session, [PaymentStatus.PENDENTE])
+    webhook = PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO)
+    admission = VehicleAdmission(wait_timeout=1.0, reserved_ttl=30.0, maxsize=10)
+    admission.mark_reserved(1)
+    with patch("app.services.sale_service.vehicle_admission", admission):
+        with patch.object(db_session, "commit", AsyncMock(side_effect=RuntimeError("falha"))):
+            with pytest.raises(HTTPException):
+                await SaleService(db_session).process_payment_webhook(webhook)
+        assert admission.is_reserved(1)
+        
+        await SaleService(db_session).process_payment_webhook(webhook)
+    assert not admission.is_reserved(1)
@@ -0,0 +1,50 @@
+"""
+Testes para o cache LRU em memória.
+"""
+import time
+from app.core.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Testa despejo do item menos usado quando o cache enche."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_ttl_expiration():
+    """Testa expiração de itens pelo TTL."""
+    cache = LRUCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.001)
+    time.sleep(0.01)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b", "ausente") == "ausente"
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 1
+
+
+def test_lru_cache_stats_and_pop():
+    """Testa contadores de acerto/falta e remoção."""
+    cache = LRUCache(maxsize=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("x")
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "ausente") == "ausente"
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    cache.set("b", 2)
+    cache.clear()
+    assert len(cache) == 0
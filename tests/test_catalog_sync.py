@@ -0,0 +1,249 @@
+"""
+Testes para a sincronização incremental do catálogo.
+"""
+import pytest
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy.future import select
+
+from app.models.models import SyncState, Vehicle, VehicleStatus
+from app.services import catalog_sync as catalog_sync_module
+from app.services.catalog_sync import CatalogSyncService, CATALOG_SYNC_NAME
+from app.services.outbox import enqueue_status_update
+from app.services.resilience import VehicleServiceUnavailable, remaining_budget, request_deadline
+from tests.conftest import TestSessionLocal
+
+
+def catalog_vehicle(vehicle_id: int, preco: float = 50000.00) -> dict:
+    return {
+        "id": vehicle_id,
+        "marca": "Marca",
+        "modelo": "Modelo",
+        "ano": 2023,
+        "cor": "Cor",
+        "preco": preco,
+        "status": "DISPONIVEL",
+        "data_cadastro": "2024-01-01T00:00:00"
+    }
+
+
+def local_vehicle(external_id: int, preco: float = 50000.00, status=VehicleStatus.DISPONIVEL) -> Vehicle:
+    return Vehicle(
+        external_id=external_id, marca="Marca", modelo="Modelo", ano=2023,
+        cor="Cor", preco=preco, status=status,
+    )
+
+
+def paged(catalog: list[dict], calls: list | None = None):
+    async def iter_page(chunk_size, skip=0, limit=None):
+        if calls is not None:
+            calls.append(skip)
+        page = catalog[skip:skip + limit]
+        for start in range(0, len(page), chunk_size):
+            yield page[start:start + chunk_size]
+    return iter_page
+
+
+def lookup(found: dict[int, dict], calls: list | None = None):
+    async def get_vehicles(ids):
+        if calls is not None:
+            calls.append(list(ids))
+        return {
+            i: {"data": found[i], "error": None} if i in found else {"data": None, "error": "not_found"}
+            for i in ids
+        }
+    return get_vehicles
+
+
+async def local_vehicles(db_session) -> dict[int, Vehicle]:
+    result = await db_session.execute(
+        select(Vehicle).execution_options(populate_existing=True)
+    )
+    return {v.external_id: v for v in result.scalars().all()}
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_full_pass_diffs_local_cache(db_session):
+    """Testa inserção, atualização, inalterados e remoção de ausentes."""
+    db_session.add_all([
+        local_vehicle(1),                      # inalterado
+        local_vehicle(2, preco=40000.00),      # preço mudou
+        local_vehicle(8),                      # ausente do catálogo
+        local_vehicle(9),                      # ausente, mas com outbox pendente
+    ])
+    enqueue_status_update(db_session, 9, VehicleStatus.DISPONIVEL)
+    await db_session.commit()
+    
+    catalog = [catalog_vehicle(1), catalog_vehicle(2, 45000.00), catalog_vehicle(3)]
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = paged(catalog)
+        mock.get_vehicles = lookup({})
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        service.page_size = 2
+        service.chunk_size = 1
+        stats = await service.run()
+    
+    assert stats["pages"] == 2
+    assert stats["fetched"] == 3
+    assert stats["inserted"] == 1
+    assert stats["updated"] == 1
+    assert stats["unchanged"] == 1
+    assert stats["removed"] == 1
+    
+    vehicles = await local_vehicles(db_session)
+    assert vehicles[2].preco == 45000.00
+    assert vehicles[3].status == VehicleStatus.DISPONIVEL
+    assert vehicles[8].status == VehicleStatus.VENDIDO
+    assert vehicles[9].status == VehicleStatus.DISPONIVEL
+    
+    status = await service.status(db_session)
+    assert status["cursor"] == 0
+    assert status["owner"] is None
+    assert status["last_stats"]["inserted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_rechecks_vehicles_skipped_by_offset_shift(db_session):
+    """Testa que ausentes por deslocamento das páginas não viram VENDIDO."""
+    db_session.add_all([local_vehicle(1), local_vehicle(2), local_vehicle(3)])
+    await db_session.commit()
+    
+    # Veículo 1 é vendido no principal entre as páginas: o offset 2 pula o 3
+    pages = {0: [catalog_vehicle(1), catalog_vehicle(2)], 2: []}
+    
+    async def iter_page(chunk_size, skip=0, limit=None):
+        if pages[skip]:
+            yield pages[skip]
+    
+    calls = []
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = iter_page
+        mock.get_vehicles = lookup({3: catalog_vehicle(3, 51000.00)}, calls)
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        service.page_size = 2
+        stats = await service.run()
+    
+    assert calls == [[3]]
+    assert stats["removed"] == 0
+    assert stats["rechecked"] == 1
+    vehicles = await local_vehicles(db_session)
+    assert vehicles[3].status == VehicleStatus.DISPONIVEL
+    assert vehicles[3].preco == 51000.00
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_resumes_from_persisted_cursor(db_session):
+    """Testa que uma execução interrompida continua do cursor salvo."""
+    db_session.add(local_vehicle(8))
+    await db_session.commit()
+    catalog = [catalog_vehicle(i) for i in range(1, 6)]
+    
+    async def failing_page(chunk_size, skip=0, limit=None):
+        if skip >= 2:
+            raise VehicleServiceUnavailable("down")
+        yield catalog[skip:skip + limit]
+    
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = failing_page
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        service.page_size = 2
+        with pytest.raises(VehicleServiceUnavailable):
+            await service.run()
+        
+        state = await db_session.get(SyncState, CATALOG_SYNC_NAME, populate_existing=True)
+        assert state.cursor == 2
+        assert state.owner is None
+        
+        mock.iter_available_vehicles = paged(catalog)
+        stats = await service.run()
+    
+    assert stats["resumed_from"] == 2
+    assert stats["fetched"] == 3
+    assert stats["removed"] == 0
+    vehicles = await local_vehicles(db_session)
+    assert set(vehicles) == {1, 2, 3, 4, 5, 8}
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_skips_when_lease_held(db_session):
+    """Testa que outra réplica com lease válido impede a execução."""
+    db_session.add(SyncState(
+        name=CATALOG_SYNC_NAME, cursor=0, owner="outra-replica",
+        lease_expires_at=datetime.utcnow() + timedelta(minutes=5),
+    ))
+    await db_session.commit()
+    
+    calls = []
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = paged([], calls)
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        assert await service.run() is None
+        assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_handles_unpaginated_principal(db_session):
+    """Testa que um catálogo enviado inteiro (sem paginação) encerra a execução."""
+    catalog = [catalog_vehicle(i) for i in range(1, 6)]
+    
+    async def whole_catalog(chunk_size, skip=0, limit=None):
+        for start in range(0, len(catalog), chunk_size):
+            yield catalog[start:start + chunk_size]
+    
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = whole_catalog
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        service.page_size = 2
+        service.chunk_size = 2
+        stats = await service.run()
+    
+    assert stats["pages"] == 1
+    assert stats["inserted"] == 5
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_trigger_ignores_request_deadline(db_session):
+    """Testa que a execução sob demanda não herda o prazo da requisição."""
+    budgets = []
+    
+    async def iter_page(chunk_size, skip=0, limit=None):
+        budgets.append(remaining_budget())
+        yield [catalog_vehicle(1)]
+    
+    service = CatalogSyncService(session_factory=TestSessionLocal)
+    token = request_deadline.set(time.monotonic() + 0.5)
+    try:
+        with patch('app.services.catalog_sync.vehicle_client') as mock:
+            mock.iter_available_vehicles = iter_page
+            mock.get_vehicles = lookup({})
+            assert service.trigger() is True
+            stats = await service._run_task
+    finally:
+        request_deadline.reset(token)
+    
+    assert budgets == [None]
+    assert stats["inserted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_sync_finds_missing_by_run_marker_in_chunks(db_session, monkeypatch):
+    """Testa a busca dos ausentes pela marca da passagem, em blocos."""
+    monkeypatch.setattr(catalog_sync_module, "MISSING_CHECK_CHUNK_SIZE", 1)
+    db_session.add_all([local_vehicle(i) for i in range(1, 6)])
+    await db_session.commit()
+    updated_at = (await local_vehicles(db_session))[1].updated_at
+    
+    calls = []
+    with patch('app.services.catalog_sync.vehicle_client') as mock:
+        mock.iter_available_vehicles = paged([catalog_vehicle(1), catalog_vehicle(4)])
+        mock.get_vehicles = lookup({}, calls)
+        service = CatalogSyncService(session_factory=TestSessionLocal)
+        stats = await service.run()
+    
+    assert calls == [[2], [3], [5]]
+    assert stats["removed"] == 3
+    vehicles = await local_vehicles(db_session)
+    assert vehicles[1].last_seen_sync_at == vehicles[4].last_seen_sync_at is not None
+    assert vehicles[1].updated_at == updated_at
+    assert {i for i, v in vehicles.items() if v.status == VehicleStatus.VENDIDO} == {2, 3, 5}
@@ -0,0 +1,97 @@
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.models.models import PaymentStatus
+from app.schemas.schemas import PaymentWebhook, PaymentWebhookBatch
+from app.services.finalized_payments import finalized_payments, remember_finalized, warm_finalized_payments
+from app.services.sale_service import SaleService
+from tests.conftest import TestSessionLocal, capture_statements, create_sales
+
+
+@pytest.mark.asyncio
+async def test_redelivery_answered_without_db(db_session):
+    [sale] = await create_sales(db_session, [PaymentStatus.PENDENTE])
+    webhook = PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CONFIRMADO)
+    await SaleService(db_session).process_payment_webhook(webhook)
+    hits = finalized_payments.stats()["hits"]
+    
+    with capture_statements() as statements:
+        with pytest.raises(HTTPException) as exc:
+            await SaleService(db_session).process_payment_webhook(webhook)
+    assert exc.value.status_code == 400
+    assert "CONFIRMADO" in exc.value.detail
+    assert statements == []
+    assert finalized_payments.stats()["hits"] == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_already_processed_miss_is_remembered(db_session):
+    await create_sales(db_session, [PaymentStatus.CANCELADO])
+    hits = finalized_payments.stats()["hits"]
+    webhook = PaymentWebhook(codigo_pagamento="pagamento-1", status=PaymentStatus.CONFIRMADO)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await SaleService(db_session).process_payment_webhook(webhook)
+    assert finalized_payments.stats()["hits"] == hits + 1
+    assert finalized_payments.get("pagamento-1") == PaymentStatus.CANCELADO
+
+
+@pytest.mark.asyncio
+async def test_warm_loads_only_finalized(db_session):
+    await create_sales(
+        db_session, [PaymentStatus.CONFIRMADO, PaymentStatus.PENDENTE, PaymentStatus.CANCELADO]
+    )
+    assert await warm_finalized_payments(TestSessionLocal) == 2
+    assert finalized_payments.get("pagamento-1") == PaymentStatus.CONFIRMADO
+    assert finalized_payments.get("pagamento-2") is None
+    assert finalized_payments.get("pagamento-3") == PaymentStatus.CANCELADO
+
+
+@pytest.mark.asyncio
+async def test_batch_skips_known_finalized(db_session):
+    await create_sales(db_session, [PaymentStatus.CONFIRMADO])
+    await warm_finalized_payments(TestSessionLocal)
+    
+    with capture_statements() as statements:
+        report = await SaleService(db_session).process_payment_webhooks(PaymentWebhookBatch(events=[
+            PaymentWebhook(codigo_pagamento="pagamento-1", status=PaymentStatus.CONFIRMADO)
+        ]))
+    assert report.results[0].status_code == 400
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_ops_finalized_payments():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/finalized-payments")
+    assert response.status_code == 200
+    assert "hit_rate" in response.json()
+
+
+def test_pending_status_never_cached():
+    remember_finalized("pagamento-pendente", PaymentStatus.PENDENTE)
+    assert finalized_payments.get("pagamento-pendente") is None
+    remember_finalized("pagamento-pendente", PaymentStatus.CONFIRMADO)
+    assert finalized_payments.get("pagamento-pendente") == PaymentStatus.CONFIRMADO
+
+
+@pytest.mark.asyncio
+async def test_pending_webhook_rejected_and_confirmation_still_applied(override_dependencies, db_session):
+    [sale] = await create_sales(db_session, [PaymentStatus.PENDENTE])
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/webhook/pagamento", json={
+            "codigo_pagamento": sale.codigo_pagamento, "status": "PENDENTE",
+        })
+        assert response.status_code == 422
+        response = await ac.post("/webhook/pagamento/batch", json={"events": [
+            {"codigo_pagamento": sale.codigo_pagamento, "status": "PENDENTE"},
+        ]})
+        assert response.status_code == 422
+        
+        response = await ac.post("/webhook/pagamento", json={
+            "codigo_pagamento": sale.codigo_pagamento, "status": "CONFIRMADO",
+        })
+        assert response.status_code == 200
+        assert response.json()["status_pagamento"] == "CONFIRMADO"
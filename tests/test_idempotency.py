@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.main import app
+from app.models.models import IdempotencyKey, Sale
+from app.schemas.schemas import SaleCreate
+from app.services.idempotency import purge_expired_keys, request_fingerprint, store_response
+from app.services.sale_service import SaleService
+from tests.conftest import TestSessionLocal
+
+
+SALE_DATA = {"vehicle_id": 1, "cpf_comprador": "52998224725"}
+
+
+def test_request_fingerprint_is_canonical():
+    assert request_fingerprint({"a": 1, "b": 2}) == request_fingerprint({"b": 2, "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_create_sale_idempotent_retry(override_dependencies, mock_vehicle_client):
+    """Retentativa com a mesma chave devolve a venda original"""
+    headers = {"Idempotency-Key": "pedido-123"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.post("/api/v1/sales/", json=SALE_DATA, headers=headers)
+        retry = await ac.post("/api/v1/sales/", json=SALE_DATA, headers=headers)
+    
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert mock_vehicle_client.get_vehicle.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_create_sale_idempotent_key_reused_with_other_body(override_dependencies, mock_vehicle_client):
+    """Mesma chave com outro corpo é rejeitada"""
+    headers = {"Idempotency-Key": "pedido-123"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/api/v1/sales/", json=SALE_DATA, headers=headers)
+        response = await ac.post(
+            "/api/v1/sales/",
+            json={**SALE_DATA, "cpf_comprador": "11144477735"},
+            headers=headers,
+        )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_create_sale_idempotent_concurrent_duplicates(db_session, mock_vehicle_client):
+    """Duplicatas concorrentes aguardam a original e recebem a mesma venda"""
+    async def create():
+        async with TestSessionLocal() as session:
+            return await SaleService(session).create_sale_idempotent(
+                SaleCreate(**SALE_DATA), "pedido-123"
+            )
+    
+    results = await asyncio.gather(*(create() for _ in range(3)))
+    bodies = [body for body, _ in results]
+    assert all(body == bodies[0] for body in bodies)
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+    
+    count = await db_session.scalar(select(func.count()).select_from(Sale))
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_create_sale_idempotent_expired_key_runs_again(db_session, mock_vehicle_client):
+    """Chave expirada não é reaproveitada"""
+    store_response(db_session, "pedido-123", request_fingerprint({}), 201, {"id": 99})
+    await db_session.commit()
+    stored = await db_session.get(IdempotencyKey, "pedido-123")
+    stored.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    await db_session.commit()
+    
+    body, replayed = await SaleService(db_session).create_sale_idempotent(
+        SaleCreate(**SALE_DATA), "pedido-123"
+    )
+    assert not replayed
+    assert body["id"] != 99
+
+
+@pytest.mark.asyncio
+async def test_purge_expired_keys(db_session):
+    store_response(db_session, "ativa", "f", 201, {})
+    expired = store_response(db_session, "expirada", "f", 201, {})
+    expired.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    await db_session.commit()
+    
+    assert await purge_expired_keys(TestSessionLocal) == 1
+    keys = await db_session.scalars(
+        select(IdempotencyKey.key).execution_options(populate_existing=True)
+    )
+    assert keys.all() == ["ativa"]
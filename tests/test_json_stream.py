@@ -0,0 +1,55 @@
+"""
+Testes para o parser incremental de arrays JSON.
+"""
+import json
+import pytest
+from app.services.json_stream import JsonArrayStreamParser
+
+
+def feed_in_pieces(body: str, size: int) -> list:
+    parser = JsonArrayStreamParser()
+    items = []
+    for start in range(0, len(body), size):
+        items.extend(parser.feed(body[start:start + size]))
+    parser.close()
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_parser_yields_items_across_piece_boundaries(size):
+    """Testa que elementos divididos entre pedaços são montados corretamente."""
+    data = [
+        {"id": 1, "marca": "Citroën", "preco": 95000.5, "tags": ["a", "]"]},
+        {"id": 2, "marca": "Fiat {teste}", "preco": 12345},
+        {"id": 3, "nested": {"x": [1, 2, {"y": "z"}]}},
+    ]
+    body = json.dumps(data, ensure_ascii=False, indent=2)
+    assert feed_in_pieces(body, size) == data
+
+
+def test_parser_empty_array():
+    """Testa array vazio."""
+    assert feed_in_pieces(" [ ] ", 1) == []
+
+
+def test_parser_numbers_at_buffer_end_wait_for_more():
+    """Testa que números no fim do buffer não são emitidos truncados."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed("[12") == []
+    assert parser.feed("3, 4]") == [123, 4]
+    assert parser.finished
+
+
+def test_parser_rejects_non_array():
+    """Testa corpo que não é um array."""
+    parser = JsonArrayStreamParser()
+    with pytest.raises(ValueError):
+        parser.feed('{"id": 1}')
+
+
+def test_parser_detects_truncated_body():
+    """Testa corpo interrompido antes do fim do array."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"id": 1}, {"id"') == [{"id": 1}]
+    with pytest.raises(ValueError):
+        parser.close()
@@ -0,0 +1,128 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+
+from app.main import app
+from app.models.models import Vehicle, VehicleStatus
+from app.services.listing_cache import (
+    LISTED_STATUSES,
+    ListingCache,
+    listing_cache,
+    listing_key,
+    mark_listings_stale,
+)
+from app.services.sale_service import VehicleService
+from app.services.vehicle_upsert import upsert_vehicles
+
+
+def test_listing_cache_discards_page_read_before_invalidation():
+    cache = ListingCache(maxsize=10, ttl=60.0)
+    key = listing_key(VehicleStatus.DISPONIVEL, {}, None, 20)
+    generation = cache.generation_for(VehicleStatus.DISPONIVEL)
+    cache.invalidate()
+    assert cache.set(key, b"[]", generation) is False
+    assert cache.get(key) is None
+    assert cache.set(key, b"[]", cache.generation_for(VehicleStatus.DISPONIVEL)) is True
+    assert cache.get(key) == b"[]"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_listing_cache_invalidates_only_affected_pages():
+    cache = ListingCache(maxsize=10, ttl=60.0)
+    all_available = listing_key(VehicleStatus.DISPONIVEL, {"marca": None}, None, 20)
+    toyota = listing_key(VehicleStatus.DISPONIVEL, {"marca": "toyota"}, None, 20)
+    honda = listing_key(VehicleStatus.DISPONIVEL, {"marca": "Honda"}, None, 20)
+    sold = listing_key(VehicleStatus.VENDIDO, {"marca": None}, None, 20)
+    for key in (all_available, toyota, honda, sold):
+        cache.set(key, b"[]", 0)
+
+    cache.invalidate([(VehicleStatus.DISPONIVEL, "Toyota", "Corolla")])
+    assert cache.get(all_available) is None
+    assert cache.get(toyota) is None
+    assert cache.get(honda) == b"[]"
+    assert cache.get(sold) == b"[]"
+    assert cache.stats()["invalidated_pages"] == 2
+    # Páginas do VENDIDO lidas antes continuam graváveis
+    assert cache.set(sold, b"[]", 0) is True
+    assert cache.set(honda, b"[]", 0) is False
+
+
+@pytest.mark.asyncio
+async def test_listing_served_from_cache_until_sale(override_dependencies, mock_vehicle_client, db_session):
+    """Testa que a listagem vem do cache e é invalidada pela venda"""
+    db_session.add(Vehicle(
+        external_id=1, marca="Toyota", modelo="Corolla", ano=2023, cor="Preto",
+        preco=95000.00, status=VehicleStatus.DISPONIVEL,
+    ))
+    await db_session.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.get("/api/v1/vehicles/available")
+        hits = listing_cache.stats()["hits"]
+        with patch.object(VehicleService, "list_vehicles", AsyncMock()) as list_vehicles:
+            second = await ac.get("/api/v1/vehicles/available")
+            list_vehicles.assert_not_called()
+        assert listing_cache.stats()["hits"] == hits + 1
+        assert second.json() == first.json()
+        assert len(first.json()) == 1
+
+        response = await ac.post("/api/v1/sales/", json={"vehicle_id": 1, "cpf_comprador": "52998224725"})
+        assert response.status_code == 201
+
+        assert (await ac.get("/api/v1/vehicles/available")).json() == []
+        sold = (await ac.get("/api/v1/vehicles/sold")).json()
+        assert [v["external_id"] for v in sold] == [1]
+
+        # Cancelamento libera o veículo e invalida de novo
+        await ac.post("/webhook/pagamento", json={
+            "codigo_pagamento": response.json()["codigo_pagamento"],
+            "status": "CANCELADO",
+        })
+        assert len((await ac.get("/api/v1/vehicles/available")).json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_listing_cache_not_invalidated_by_rollback(db_session):
+    from sqlalchemy import select
+
+    generation = listing_cache.generation
+    await db_session.execute(select(Vehicle.id))
+    mark_listings_stale(db_session, LISTED_STATUSES)
+    await db_session.rollback()
+    await db_session.commit()
+    assert listing_cache.generation == generation
+
+
+@pytest.mark.asyncio
+async def test_listing_cache_kept_by_unchanged_upsert(db_session):
+    from sqlalchemy import select
+
+    row = {
+        "external_id": 1, "marca": "Toyota", "modelo": "Corolla", "ano": 2023,
+        "cor": "Preto", "preco": 95000.00, "status": VehicleStatus.DISPONIVEL,
+    }
+    await upsert_vehicles(db_session, [row], existing_loaded=True)
+    await db_session.commit()
+
+    generation = listing_cache.generation
+    vehicle = await db_session.scalar(select(Vehicle).where(Vehicle.external_id == 1))
+    await upsert_vehicles(db_session, [row], existing_loaded=True)
+    await db_session.commit()
+    assert listing_cache.generation == generation
+
+    honda = listing_key(VehicleStatus.DISPONIVEL, {"marca": "Honda"}, None, 20)
+    listing_cache.set(honda, b"[]", listing_cache.generation_for(VehicleStatus.DISPONIVEL))
+    await upsert_vehicles(db_session, [{**row, "preco": 90000.00}], existing_loaded=True)
+    await db_session.commit()
+    assert listing_cache.generation == generation + 1
+    assert listing_cache.get(honda) == b"[]"
+    assert vehicle.preco == 90000.00
+
+
+@pytest.mark.asyncio
+async def test_listing_cache_ops_endpoint():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/listing-cache")
+        assert response.status_code == 200
+        data = response.json()
+        assert {"hits", "misses", "evictions", "invalidations", "invalidated_pages", "generation"} <= data.keys()
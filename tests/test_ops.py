@@ -0,0 +1,79 @@
+"""
+Testes para os endpoints operacionais (/ops).
+"""
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_ops_vehicle_service_status():
+    """Testa o endpoint de estado do serviço principal."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/vehicle-service")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["circuit_breaker"]["state"] in ("closed", "open", "half_open")
+        assert "tokens" in data["retry_budget"]
+
+
+@pytest.mark.asyncio
+async def test_ops_vehicle_cache_status():
+    """Testa o endpoint de estado do cache local de veículos."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/vehicle-cache")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ttl_seconds"] > 0
+        assert "in_flight" in data["revalidation"]
+
+
+@pytest.mark.asyncio
+async def test_ops_outbox_status(override_dependencies):
+    """Testa o endpoint de estado do outbox."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/outbox")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pending"] == 0
+        assert data["oldest_pending_age"] is None
+        
+        response = await ac.post("/ops/outbox/requeue", params={"external_id": [1, 2]})
+        assert response.status_code == 200
+        assert response.json() == {"requeued": 0}
+
+
+@pytest.mark.asyncio
+async def test_ops_catalog_sync_status(override_dependencies):
+    """Testa o endpoint de estado da sincronização do catálogo."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/catalog-sync")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["cursor"] == 0
+        assert data["progress"]["running"] is False
+
+
+@pytest.mark.asyncio
+async def test_ops_catalog_sync_trigger():
+    """Testa o disparo sob demanda da sincronização do catálogo."""
+    from unittest.mock import patch, AsyncMock
+    from app.services.catalog_sync import catalog_sync
+    with patch.object(catalog_sync, "run", AsyncMock(return_value=None)) as run:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/ops/catalog-sync")
+            assert response.status_code == 202
+            assert response.json() == {"started": True}
+        await catalog_sync.stop()
+        run.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_ops_sale_admission_status():
+    """Testa o endpoint de estado da admissão de vendas."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/sale-admission")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["in_progress"] == 0
+        assert "reserved" in data
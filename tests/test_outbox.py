@@ -0,0 +1,262 @@
+"""
+Testes para o outbox de status e seu dispatcher em segundo plano.
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock
+from sqlalchemy.future import select
+
+from app.core.tasks import PeriodicTask
+from app.models.models import VehicleStatus, PaymentStatus, VehicleStatusOutbox
+from app.schemas.schemas import SaleCreate, PaymentWebhook
+from app.services.outbox import OutboxDispatcher, enqueue_status_update
+from app.services.sale_service import SaleService, VehicleService
+from app.services.vehicle_client import VehicleStatusRejected
+from tests.conftest import TestSessionLocal
+
+
+async def pending_entries(db_session) -> list[VehicleStatusOutbox]:
+    result = await db_session.execute(
+        select(VehicleStatusOutbox)
+        .where(VehicleStatusOutbox.dispatched_at.is_(None))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_sale_and_cancel_write_outbox_instead_of_calling_principal(db_session, mock_vehicle_client):
+    """Testa que venda e cancelamento gravam no outbox sem PUT inline."""
+    svc = SaleService(db_session)
+    sale = await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
+    await svc.process_payment_webhook(
+        PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO)
+    )
+    mock_vehicle_client.update_vehicle_status.assert_not_called()
+    
+    entries = await pending_entries(db_session)
+    assert [(e.external_id, e.status) for e in entries] == [
+        (1, VehicleStatus.VENDIDO),
+        (1, VehicleStatus.DISPONIVEL),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sync_keeps_local_status_while_outbox_pending(db_session, mock_vehicle_client):
+    """Testa que a sincronização não desfaz venda ou cancelamento ainda não entregues."""
+    svc = SaleService(db_session)
+    sale = await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
+    
+    # Serviço principal ainda devolve DISPONIVEL: a venda não foi entregue
+    vehicle = await VehicleService(db_session).sync_vehicle_from_principal(1)
+    assert vehicle.status == VehicleStatus.VENDIDO
+    
+    await svc.process_payment_webhook(
+        PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO)
+    )
+    sold = {**mock_vehicle_client.get_vehicle.return_value, "status": "VENDIDO"}
+    mock_vehicle_client.get_vehicles = AsyncMock(return_value={1: {"data": sold, "error": None}})
+    vehicles = await VehicleService(db_session).sync_vehicles_from_principal([1])
+    assert vehicles[1].status == VehicleStatus.DISPONIVEL
+    
+    for entry in await pending_entries(db_session):
+        entry.dispatched_at = datetime.utcnow()
+    await db_session.commit()
+    vehicles = await VehicleService(db_session).sync_vehicles_from_principal([1])
+    assert vehicles[1].status == VehicleStatus.VENDIDO
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_coalesces_per_vehicle(db_session):
+    """Testa entrega do status mais recente por veículo em uma chamada."""
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    enqueue_status_update(db_session, 2, VehicleStatus.VENDIDO)
+    enqueue_status_update(db_session, 1, VehicleStatus.DISPONIVEL)
+    await db_session.commit()
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(return_value=True)
+        dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+        delivered = await dispatcher.dispatch_pending()
+    
+    assert delivered == 3
+    assert sorted(c.args for c in mock.update_vehicle_status.call_args_list) == [
+        (1, "DISPONIVEL"),
+        (2, "VENDIDO"),
+    ]
+    assert await pending_entries(db_session) == []
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_backs_off_and_preserves_order(db_session):
+    """Testa backoff após falha e que o veículo fica bloqueado até o retry."""
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(return_value=False)
+        dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+        assert await dispatcher.dispatch_pending() == 0
+        
+        enqueue_status_update(db_session, 1, VehicleStatus.DISPONIVEL)
+        await db_session.commit()
+        mock.update_vehicle_status = AsyncMock(return_value=True)
+        assert await dispatcher.dispatch_pending() == 0
+        mock.update_vehicle_status.assert_not_called()
+        
+        entries = await pending_entries(db_session)
+        assert entries[0].attempts == 1
+        assert entries[0].next_attempt_at > datetime.utcnow()
+        
+        entries[0].next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        await db_session.commit()
+        assert await dispatcher.dispatch_pending() == 2
+        mock.update_vehicle_status.assert_awaited_once_with(1, "DISPONIVEL")
+    
+    stats = await dispatcher.pending_stats(db_session)
+    assert stats["pending"] == 0
+    assert stats["failed_attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_failing_vehicles_do_not_block_others(db_session):
+    """Testa que veículos em backoff não ocupam o lote de outros veículos."""
+    for external_id in (1, 2, 3):
+        enqueue_status_update(db_session, external_id, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    
+    async def update_vehicle_status(external_id, status):
+        return external_id == 3
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(side_effect=update_vehicle_status)
+        dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+        dispatcher.batch_size = 2
+        for _ in range(3):
+            await dispatcher.dispatch_pending()
+    
+    delivered = [c.args for c in mock.update_vehicle_status.call_args_list]
+    assert (3, "VENDIDO") in delivered
+    assert [e.external_id for e in await pending_entries(db_session)] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_keeps_retrying_retryable_failures(db_session):
+    """Testa que falhas retentáveis nunca levam a entrada para dead letter."""
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(return_value=False)
+        dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+        dispatcher.retry_backoff = 0
+        for _ in range(20):
+            await dispatcher.dispatch_pending()
+        assert mock.update_vehicle_status.await_count == 20
+    
+    [entry] = await pending_entries(db_session)
+    assert entry.attempts == 20
+    assert entry.dead_lettered_at is None
+    assert dispatcher.dead_lettered == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_dead_letters_rejections_and_requeues(db_session):
+    """Testa dead letter em recusa (4xx) e a devolução à fila."""
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    enqueue_status_update(db_session, 1, VehicleStatus.DISPONIVEL)
+    enqueue_status_update(db_session, 2, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    
+    async def update_vehicle_status(external_id, status):
+        if external_id == 1:
+            raise VehicleStatusRejected("HTTP 422")
+        return True
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(side_effect=update_vehicle_status)
+        dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+        assert await dispatcher.dispatch_pending() == 1
+        assert await dispatcher.dispatch_pending() == 0
+        assert mock.update_vehicle_status.await_count == 2
+        
+        stats = await dispatcher.pending_stats(db_session)
+        assert stats["pending"] == 0
+        assert stats["dead_lettered"] == 2
+        assert dispatcher.dead_lettered == 2
+        
+        assert await dispatcher.requeue_dead_letters(db_session, [2]) == 0
+        assert await dispatcher.requeue_dead_letters(db_session, [1]) == 2
+        mock.update_vehicle_status = AsyncMock(return_value=True)
+        assert await dispatcher.dispatch_pending() == 2
+        mock.update_vehicle_status.assert_awaited_once_with(1, "DISPONIVEL")
+    
+    stats = await dispatcher.pending_stats(db_session)
+    assert stats["dead_lettered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_delivers_outside_transaction_under_lease(db_session):
+    """Testa PUTs fora de transação, com o lease do dispatcher ocupado."""
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    dispatcher = OutboxDispatcher(session_factory=TestSessionLocal)
+    other = OutboxDispatcher(session_factory=TestSessionLocal)
+    other.owner = "outra-replica"
+    
+    async def update_vehicle_status(external_id, status):
+        # Outra réplica não entrega enquanto o lease está ocupado
+        assert await other.dispatch_once() == (0, 0)
+        # Gravações de outras transações não esperam a rodada terminar
+        enqueue_status_update(db_session, 1, VehicleStatus.DISPONIVEL)
+        await db_session.commit()
+        return True
+    
+    with patch('app.services.outbox.vehicle_client') as mock:
+        mock.update_vehicle_status = AsyncMock(side_effect=update_vehicle_status)
+        assert await dispatcher.dispatch_once() == (1, 1)
+        
+        # Entrada gravada durante a entrega continua pendente
+        [entry] = await pending_entries(db_session)
+        assert entry.status == VehicleStatus.DISPONIVEL
+        
+        mock.update_vehicle_status = AsyncMock(return_value=True)
+        assert await other.dispatch_once() == (1, 1)
+        mock.update_vehicle_status.assert_awaited_once_with(1, "DISPONIVEL")
+
+
+@pytest.mark.asyncio
+async def test_periodic_task_runs_and_triggers():
+    """Testa execução periódica, antecipação via trigger e parada."""
+    calls = []
+    
+    async def work():
+        calls.append(1)
+    
+    task = PeriodicTask("teste", work, interval=60)
+    task.trigger()
+    task.start()
+    await asyncio.sleep(0.01)
+    assert len(calls) == 1
+    task.trigger()
+    await asyncio.sleep(0.01)
+    assert len(calls) == 2
+    await task.stop()
+    assert not task.running
+    assert task.stats()["runs"] == 2
+
+
+@pytest.mark.asyncio
+async def test_periodic_task_records_failures():
+    """Testa que falhas são registradas sem derrubar a tarefa."""
+    async def fail():
+        raise RuntimeError("falhou")
+    
+    task = PeriodicTask("falha", fail, interval=60)
+    task.start()
+    await asyncio.sleep(0.01)
+    assert task.running
+    await task.stop()
+    assert task.failures == 1
+    assert task.last_error == "falhou"
@@ -0,0 +1,206 @@
+"""
+Testes para circuit breaker, orçamento de retentativas e prazos.
+"""
+import time
+import pytest
+import respx
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient, ASGITransport, Response, RequestError
+from app.main import app
+from app.core.config import settings
+from app.services.resilience import (
+    CircuitBreaker,
+    RetryBudget,
+    VehicleServiceUnavailable,
+    remaining_budget,
+    request_deadline,
+)
+from app.services.vehicle_client import VehicleClient
+
+
+def test_circuit_breaker_opens_after_threshold():
+    """Testa abertura do circuito após falhas consecutivas."""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_circuit_breaker_half_open_probe():
+    """Testa que apenas uma chamada de teste é liberada em half_open."""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_half_open_failure_reopens():
+    """Testa que falha na chamada de teste reabre o circuito."""
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker._opened_at = time.monotonic() - 61
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()["retry_in"] > 0
+
+
+def test_retry_budget_limits_retries():
+    """Testa que o orçamento limita retentativas à fração do tráfego."""
+    budget = RetryBudget(ratio=0.5, min_tokens=1, max_tokens=2)
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_withdraw()
+    assert budget.snapshot()["exhausted"] == 1
+
+
+def test_remaining_budget_without_deadline():
+    """Testa que não há prazo fora de uma requisição."""
+    assert remaining_budget() is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_fails_fast_when_circuit_open():
+    """Testa que o circuito aberto evita chamadas ao serviço principal."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        side_effect=RequestError("Connection failed")
+    )
+    
+    client = VehicleClient()
+    client.retry_backoff = 0
+    client.circuit_breaker.failure_threshold = 2
+    with pytest.raises(VehicleServiceUnavailable):
+        await client.get_vehicle(1)
+    calls = route.call_count
+    
+    with pytest.raises(VehicleServiceUnavailable):
+        await client.get_vehicle(1)
+    assert route.call_count == calls
+    assert client.stats()["circuit_breaker"]["state"] == "open"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_retries_then_succeeds():
+    """Testa retentativa após erro 5xx."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        side_effect=[Response(503), Response(200, json={"id": 1})]
+    )
+    
+    client = VehicleClient()
+    client.retry_backoff = 0
+    assert await client.get_vehicle(1) == {"id": 1}
+    assert route.call_count == 2
+    assert client.stats()["retry_budget"]["retries"] == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_respects_request_deadline():
+    """Testa que o prazo esgotado impede a chamada."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(200, json={"id": 1})
+    )
+    
+    client = VehicleClient()
+    token = request_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(VehicleServiceUnavailable):
+            await client.get_vehicle(1)
+    finally:
+        request_deadline.reset(token)
+    assert not route.called
+
+
+def test_circuit_breaker_probe_expires_after_probe_timeout():
+    """Testa que uma chamada de teste sem resultado não prende o half_open."""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0, probe_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker._probe_started_at = time.monotonic() - 61
+    assert breaker.allow_request()
+
+
+def half_open_client() -> VehicleClient:
+    client = VehicleClient()
+    client.retry_backoff = 0
+    client.circuit_breaker.failure_threshold = 1
+    client.circuit_breaker.record_failure()
+    client.circuit_breaker._opened_at = time.monotonic() - client.circuit_breaker.recovery_timeout
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    return client
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_expired_deadline_does_not_take_probe():
+    """Testa que prazo esgotado não ocupa a chamada de teste do half_open."""
+    respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(200, json={"id": 1})
+    )
+    client = half_open_client()
+    token = request_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(VehicleServiceUnavailable, match="Prazo"):
+            await client.get_vehicle(1)
+    finally:
+        request_deadline.reset(token)
+    
+    assert await client.get_vehicle(1) == {"id": 1}
+    assert client.stats()["circuit_breaker"]["state"] == "closed"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_cancelled_probe_releases_half_open():
+    """Testa que a chamada de teste cancelada libera a vaga do half_open."""
+    import asyncio
+    
+    started = asyncio.Event()
+    
+    async def slow_response(request):
+        started.set()
+        await asyncio.sleep(10)
+        return Response(200, json={"id": 1})
+    
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        side_effect=slow_response
+    )
+    client = half_open_client()
+    probe = asyncio.create_task(client.get_vehicle(1))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert client.stats()["circuit_breaker"]["state"] == "half_open"
+    
+    route.mock(return_value=Response(200, json={"id": 1}))
+    assert await client.get_vehicle(1) == {"id": 1}
+    assert client.stats()["circuit_breaker"]["state"] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_create_sale_vehicle_service_unavailable(override_dependencies):
+    """Testa que indisponibilidade do serviço principal retorna 503."""
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(side_effect=VehicleServiceUnavailable("down"))
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post(
+                "/api/v1/sales/",
+                json={"vehicle_id": 1, "cpf_comprador": "52998224725"},
+                headers={"X-Request-Timeout": "2"},
+            )
+            assert response.status_code == 503
+
@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime, timedelta
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from sqlalchemy.future import select
+
+from app.main import app
+from app.models.models import PaymentStatus, Sale, Vehicle, VehicleStatus, VehicleStatusOutbox
+from app.services.finalized_payments import finalized_payments
+from app.services.sale_expiry import SaleExpirySweeper
+from tests.conftest import TestSessionLocal, create_sales
+
+
+@pytest.mark.asyncio
+async def test_sweep_expires_overdue_pending_sales(db_session):
+    now = datetime.utcnow()
+    for external_id, age in [(1, timedelta(hours=3)), (2, timedelta(hours=2)), (3, timedelta(minutes=5))]:
+        await create_sales(db_session, [PaymentStatus.PENDENTE], start=external_id, data_venda=now - age)
+    await create_sales(db_session, [PaymentStatus.CONFIRMADO], start=4, data_venda=now - timedelta(hours=3))
+    
+    sweeper = SaleExpirySweeper(session_factory=TestSessionLocal)
+    sweeper.pending_ttl = 3600
+    sweeper.batch_size = 1
+    assert await sweeper.sweep() == 2
+    
+    result = await db_session.execute(
+        select(Sale.codigo_pagamento, Sale.status_pagamento)
+        .order_by(Sale.id)
+        .execution_options(populate_existing=True)
+    )
+    assert result.all() == [
+        ("pagamento-1", PaymentStatus.CANCELADO),
+        ("pagamento-2", PaymentStatus.CANCELADO),
+        ("pagamento-3", PaymentStatus.PENDENTE),
+        ("pagamento-4", PaymentStatus.CONFIRMADO),
+    ]
+    result = await db_session.execute(
+        select(Vehicle.external_id, Vehicle.status)
+        .order_by(Vehicle.external_id)
+        .execution_options(populate_existing=True)
+    )
+    assert dict(result.all()) == {
+        1: VehicleStatus.DISPONIVEL,
+        2: VehicleStatus.DISPONIVEL,
+        3: VehicleStatus.VENDIDO,
+        4: VehicleStatus.VENDIDO,
+    }
+    result = await db_session.execute(select(VehicleStatusOutbox.external_id))
+    assert sorted(result.scalars().all()) == [1, 2]
+    assert finalized_payments.get("pagamento-1") == PaymentStatus.CANCELADO
+    
+    stats = sweeper.stats()
+    assert stats["expired"] == 2
+    assert stats["last_sweep"]["batches"] == 3
+    assert stats["last_sweep"]["duration"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_sweep_skipped_when_lock_held(db_session):
+    await create_sales(
+        db_session, [PaymentStatus.PENDENTE], data_venda=datetime.utcnow() - timedelta(hours=3)
+    )
+    sweeper = SaleExpirySweeper(session_factory=TestSessionLocal)
+    with patch("app.services.sale_expiry.try_advisory_xact_lock", AsyncMock(return_value=False)):
+        assert await sweeper.sweep() == 0
+    assert sweeper.stats()["last_sweep"]["batches"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ops_sale_expiry():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/sale-expiry")
+    assert response.status_code == 200
+    assert "pending_ttl_seconds" in response.json()
@@ -0,0 +1,84 @@
+"""
+Benchmark de round trips ao banco por venda e por webhook.
+
+Conta as instruções enviadas ao banco e os commits de create_sale e
+process_payment_webhook para evitar regressões. Os orçamentos abaixo são os
+números publicados no README.
+"""
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+
+from app.models.models import PaymentStatus
+from app.schemas.schemas import PaymentWebhook, SaleCreate
+from app.services.sale_service import SaleService, VehicleService
+from tests.conftest import capture_statements, test_engine
+
+
+# Orçamento por venda: (instruções, commits)
+WARM_CACHE_BUDGET = (3, 1)  # UPDATE reserva, INSERT venda, INSERT outbox
+COLD_CACHE_BUDGET = (6, 1)  # + UPDATE sem efeito, SELECT e upsert do veículo
+WEBHOOK_CONFIRM_BUDGET = (1, 1)  # UPDATE condicional do pagamento
+WEBHOOK_CANCEL_BUDGET = (3, 1)  # + UPDATE liberação do veículo, INSERT outbox
+
+
+@contextmanager
+def round_trips(engine):
+    counts = {"statements": 0, "commits": 0}
+    
+    def commit(conn):
+        counts["commits"] += 1
+    
+    event.listen(engine.sync_engine, "commit", commit)
+    try:
+        with capture_statements(engine) as statements:
+            yield counts
+        counts["statements"] = len(statements)
+    finally:
+        event.remove(engine.sync_engine, "commit", commit)
+
+
+@pytest.mark.asyncio
+async def test_create_sale_round_trips_warm_cache(db_session, mock_vehicle_client):
+    await VehicleService(db_session).sync_vehicle_from_principal(1)
+    
+    with round_trips(test_engine) as counts:
+        sale = await SaleService(db_session).create_sale(
+            SaleCreate(vehicle_id=1, cpf_comprador="52998224725")
+        )
+    
+    assert sale.id is not None
+    assert sale.data_venda is not None
+    assert mock_vehicle_client.get_vehicle.await_count == 1
+    assert counts["statements"] <= WARM_CACHE_BUDGET[0]
+    assert counts["commits"] == WARM_CACHE_BUDGET[1]
+
+
+@pytest.mark.asyncio
+async def test_create_sale_round_trips_cold_cache(db_session, mock_vehicle_client):
+    with round_trips(test_engine) as counts:
+        sale = await SaleService(db_session).create_sale(
+            SaleCreate(vehicle_id=1, cpf_comprador="52998224725")
+        )
+    
+    assert sale.id is not None
+    assert counts["statements"] <= COLD_CACHE_BUDGET[0]
+    assert counts["commits"] == COLD_CACHE_BUDGET[1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payment_status, budget", [
+    (PaymentStatus.CONFIRMADO, WEBHOOK_CONFIRM_BUDGET),
+    (PaymentStatus.CANCELADO, WEBHOOK_CANCEL_BUDGET),
+])
+async def test_payment_webhook_round_trips(db_session, mock_vehicle_client, payment_status, budget):
+    svc = SaleService(db_session)
+    sale = await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
+    
+    with round_trips(test_engine) as counts:
+        await svc.process_payment_webhook(
+            PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=payment_status)
+        )
+    
+    assert counts["statements"] == budget[0]
+    assert counts["commits"] == budget[1]
@@ -90,3 +90,117 @@ async def test_get_sale_not_found(override_dependencies):
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         response = await ac.get("/api/v1/sales/codigo-inexistente")
         assert response.status_code == 404
+
+
+async def _seed_sales(db_session, count):
+    from datetime import datetime, timedelta
+    from app.models.models import Sale, PaymentStatus
+
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        vehicle = Vehicle(
+            external_id=200 + i, marca="Marca", modelo="Modelo", ano=2023,
+            cor="Cor", preco=50000.00, status=VehicleStatus.VENDIDO,
+        )
+        db_session.add(vehicle)
+        await db_session.flush()
+        db_session.add(Sale(
+            vehicle_id=vehicle.id,
+            cpf_comprador="529.982.247-25" if i % 2 else "711.688.490-40",
+            codigo_pagamento=f"codigo-{i}",
+            status_pagamento=PaymentStatus.CONFIRMADO if i % 3 == 0 else PaymentStatus.PENDENTE,
+            # Datas repetidas: o id desempata a ordenação entre páginas
+            data_venda=base + timedelta(days=i // 2),
+            valor_venda=50000.00,
+        ))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_list_sales_keyset_pages(override_dependencies, db_session):
+    """Testa que as páginas cobrem todas as vendas, da mais recente para a mais antiga"""
+    await _seed_sales(db_session, 7)
+    seen = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        params = {"limit": 2}
+        while True:
+            response = await ac.get("/api/v1/sales/", params=params)
+            assert response.status_code == 200
+            seen.extend(response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+
+    assert len({s["codigo_pagamento"] for s in seen}) == 7
+    keys = [(s["data_venda"], s["id"]) for s in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_list_sales_filters(override_dependencies, db_session):
+    """Testa filtros de CPF, status do pagamento e período"""
+    await _seed_sales(db_session, 8)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/v1/sales/", params={"cpf_comprador": "52998224725"})
+        data = response.json()
+        assert len(data) == 4
+        assert {s["cpf_comprador"] for s in data} == {"529.982.247-25"}
+
+        response = await ac.get("/api/v1/sales/", params={
+            "status_pagamento": "CONFIRMADO",
+            "data_inicio": "2024-01-02T00:00:00",
+            "data_fim": "2024-01-04T00:00:00",
+        })
+        assert [s["codigo_pagamento"] for s in response.json()] == ["codigo-3"]
+
+        response = await ac.get("/api/v1/sales/", params={"cpf_comprador": "123"})
+        assert response.status_code == 422
+        response = await ac.get("/api/v1/sales/", params={"cursor": "invalido"})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_sales_ndjson(override_dependencies, db_session):
+    """Testa exportação de vendas em NDJSON, em ordem cronológica"""
+    import json
+
+    await _seed_sales(db_session, 5)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/v1/sales/export", params={"status_pagamento": "PENDENTE"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [s["codigo_pagamento"] for s in lines] == ["codigo-1", "codigo-2", "codigo-4"]
+    assert {s["status_pagamento"] for s in lines} == {"PENDENTE"}
+
+
+@pytest.mark.asyncio
+async def test_export_sales_csv(override_dependencies, db_session):
+    """Testa exportação de vendas em CSV com cabeçalho"""
+    import csv
+
+    await _seed_sales(db_session, 3)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/v1/sales/export", params={"format": "csv"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(response.text.splitlines()))
+
+    assert [r["codigo_pagamento"] for r in rows] == ["codigo-0", "codigo-1", "codigo-2"]
+    assert rows[0]["cpf_comprador"] == "711.688.490-40"
+
+
+@pytest.mark.asyncio
+async def test_list_sales_date_filter_with_timezone(override_dependencies, db_session):
+    """Testa que datas com fuso são convertidas para UTC antes de filtrar"""
+    await _seed_sales(db_session, 6)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        # 2024-01-03T00:00-03:00 = 2024-01-03T03:00Z: exclui as vendas de 2024-01-03T00:00Z
+        response = await ac.get("/api/v1/sales/", params={
+            "data_inicio": "2024-01-02T00:00:00-03:00",
+            "data_fim": "2024-01-03T00:00:00-03:00",
+        })
+        assert response.status_code == 200
+        assert sorted(s["codigo_pagamento"] for s in response.json()) == ["codigo-4", "codigo-5"]
@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.main import app
+from app.models.models import Sale, Vehicle, VehicleStatus, VehicleStatusOutbox
+from tests.conftest import capture_statements
+
+
+def vehicle(external_id: int, status: str = "DISPONIVEL") -> dict:
+    return {
+        "id": external_id,
+        "marca": "Toyota",
+        "modelo": "Corolla",
+        "ano": 2023,
+        "cor": "Preto",
+        "preco": 90000.00 + external_id,
+        "status": status,
+        "data_cadastro": "2024-01-01T00:00:00"
+    }
+
+
+def principal(*vehicles: dict, errors: dict | None = None) -> dict:
+    catalog = {v["id"]: v for v in vehicles}
+    
+    async def get_vehicles(ids):
+        result = {}
+        for external_id in ids:
+            if errors and external_id in errors:
+                result[external_id] = {"data": None, "error": errors[external_id]}
+            elif external_id in catalog:
+                result[external_id] = {"data": catalog[external_id], "error": None}
+            else:
+                result[external_id] = {"data": None, "error": "not_found"}
+        return result
+    
+    return get_vehicles
+
+
+CPF = "52998224725"
+
+
+@pytest.mark.asyncio
+async def test_create_sales_batch_partial(override_dependencies, db_session):
+    """Testa lote com sucessos e falhas por item"""
+    items = [
+        {"vehicle_id": 1, "cpf_comprador": CPF},
+        {"vehicle_id": 2, "cpf_comprador": CPF},
+        {"vehicle_id": 3, "cpf_comprador": CPF},
+        {"vehicle_id": 404, "cpf_comprador": CPF},
+        {"vehicle_id": 1, "cpf_comprador": CPF},
+        {"vehicle_id": 5, "cpf_comprador": CPF},
+    ]
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicles = AsyncMock(side_effect=principal(
+            vehicle(1), vehicle(2), vehicle(3, "VENDIDO"),
+            errors={5: "HTTP 500"},
+        ))
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/sales/batch", json={"items": items})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["committed"] is True
+    assert data["created"] == 2
+    assert data["failed"] == 4
+    assert [r["status_code"] for r in data["results"]] == [201, 201, 400, 404, 409, 503]
+    assert data["results"][0]["sale"]["valor_venda"] == 90001.00
+    assert data["results"][1]["sale"]["vehicle_id"] != data["results"][0]["sale"]["vehicle_id"]
+    mock.get_vehicles.assert_awaited_once()
+    
+    assert await db_session.scalar(select(func.count()).select_from(Sale)) == 2
+    assert await db_session.scalar(select(func.count()).select_from(VehicleStatusOutbox)) == 2
+    result = await db_session.execute(
+        select(Vehicle.external_id, Vehicle.status).order_by(Vehicle.external_id)
+    )
+    assert result.all() == [
+        (1, VehicleStatus.VENDIDO), (2, VehicleStatus.VENDIDO), (3, VehicleStatus.VENDIDO)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_sales_batch_atomic_rolls_back(override_dependencies, db_session):
+    """Testa que no modo atômico uma falha cancela o lote inteiro"""
+    items = [
+        {"vehicle_id": 1, "cpf_comprador": CPF},
+        {"vehicle_id": 404, "cpf_comprador": CPF},
+    ]
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicles = AsyncMock(side_effect=principal(vehicle(1)))
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/sales/batch", json={"items": items, "atomic": True})
+    
+    data = response.json()
+    assert data["committed"] is False
+    assert data["created"] == 0
+    assert [r["status_code"] for r in data["results"]] == [424, 404]
+    assert await db_session.scalar(select(func.count()).select_from(Sale)) == 0
+
+
+@pytest.mark.asyncio
+async def test_create_sales_batch_round_trips(override_dependencies, db_session):
+    """Testa que o número de instruções não cresce com o tamanho do lote"""
+    vehicles = [vehicle(i) for i in range(1, 51)]
+    items = [{"vehicle_id": v["id"], "cpf_comprador": CPF} for v in vehicles]
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicles = AsyncMock(side_effect=principal(*vehicles))
+        with capture_statements() as statements:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+                response = await ac.post("/api/v1/sales/batch", json={"items": items})
+    
+    assert response.json()["created"] == 50
+    # SELECT, upsert, reserva, INSERT das vendas e INSERT do outbox
+    assert len(statements) <= 5
+
+
+@pytest.mark.asyncio
+async def test_create_sales_batch_invalid_cpf(override_dependencies):
+    """Testa que CPFs inválidos rejeitam o lote na validação"""
+    items = [{"vehicle_id": 1, "cpf_comprador": "11111111111"}]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/api/v1/sales/batch", json={"items": items})
+    assert response.status_code == 422
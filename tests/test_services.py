@@ -1,13 +1,15 @@
+import asyncio
 import pytest
 import pytest_asyncio
 from unittest.mock import patch, AsyncMock
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from app.database import Base
-from app.models.models import Vehicle, Sale, VehicleStatus, PaymentStatus
+from app.models.models import Vehicle, Sale, VehicleStatus, PaymentStatus, VehicleStatusOutbox
 from app.schemas.schemas import SaleCreate, PaymentWebhook
-from app.services.sale_service import VehicleService, SaleService
+from app.services.sale_service import VehicleService, SaleService, vehicle_revalidator
 
 
 TEST_DB_URL = "sqlite+aiosqlite:///:memory:"
@@ -81,15 +83,17 @@ async def test_vehicle_service_get_available(db):
         mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
         svc = VehicleService(db)
         await svc.sync_vehicle_from_principal(1)
-        available = await svc.get_available_vehicles()
+        available, next_cursor = await svc.get_available_vehicles()
         assert len(available) == 1
+        assert next_cursor is None
 
 
 @pytest.mark.asyncio
 async def test_vehicle_service_get_sold(db):
     svc = VehicleService(db)
-    sold = await svc.get_sold_vehicles()
+    sold, next_cursor = await svc.get_sold_vehicles()
     assert len(sold) == 0
+    assert next_cursor is None
 
 
 @pytest.mark.asyncio
@@ -104,6 +108,136 @@ async def test_vehicle_service_get_by_external_id(db):
         assert not_found is None
 
 
+@pytest.mark.asyncio
+async def test_vehicle_service_sync_coalesces_concurrent_calls(db):
+    async def slow_get_vehicle(external_id):
+        await asyncio.sleep(0.01)
+        return MOCK_VEHICLE
+
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(side_effect=slow_get_vehicle)
+        async with TestSession() as other_db:
+            first, second = await asyncio.gather(
+                VehicleService(db).sync_vehicle_from_principal(1),
+                VehicleService(other_db).sync_vehicle_from_principal(1),
+            )
+        assert mock.get_vehicle.call_count == 1
+        assert first.id == second.id
+        assert second.marca == "Toyota"
+
+
+@pytest.mark.asyncio
+async def test_vehicle_service_sync_many(db):
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        await svc.sync_vehicle_from_principal(1)
+
+        mock.get_vehicles = AsyncMock(return_value={
+            1: {"data": {**MOCK_VEHICLE, "preco": 90000.00}, "error": None},
+            2: {"data": {**MOCK_VEHICLE, "id": 2, "marca": "Honda"}, "error": None},
+            3: {"data": None, "error": "not_found"},
+        })
+        result = await svc.sync_vehicles_from_principal([1, 2, 3])
+
+        assert result[1].preco == 90000.00
+        assert result[2].marca == "Honda"
+        assert result[3] is None
+        available, _ = await svc.get_available_vehicles()
+        assert len(available) == 2
+
+
+@pytest.mark.asyncio
+async def test_vehicle_service_for_sale_fresh_skips_principal(db):
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        await svc.sync_vehicle_from_principal(1)
+        vehicle = await svc.get_vehicle_for_sale(1)
+        assert vehicle.external_id == 1
+        assert mock.get_vehicle.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_vehicle_service_for_sale_stale_revalidates_in_background(db):
+    with patch('app.services.sale_service.vehicle_client') as mock, \
+            patch('app.services.sale_service.AsyncSessionLocal', TestSession):
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        vehicle = await svc.sync_vehicle_from_principal(1)
+        vehicle.updated_at = datetime.utcnow() - timedelta(seconds=60)
+        await db.commit()
+
+        mock.get_vehicle = AsyncMock(return_value={**MOCK_VEHICLE, "preco": 99000.00})
+        stale = await svc.get_vehicle_for_sale(1)
+        assert stale.preco == 95000.00
+        await vehicle_revalidator.wait()
+
+        mock.get_vehicle.assert_awaited_once_with(1, conditional=True)
+        refreshed = await svc.get_vehicle_for_sale(1)
+        await db.refresh(refreshed)
+        assert refreshed.preco == 99000.00
+
+
+@pytest.mark.asyncio
+async def test_background_revalidation_ignores_request_deadline():
+    import time
+    from app.services.resilience import remaining_budget, request_deadline
+    from app.services.revalidation import BackgroundRevalidator
+    
+    budgets = []
+    
+    async def refresh(key):
+        budgets.append(remaining_budget())
+    
+    revalidator = BackgroundRevalidator(refresh)
+    token = request_deadline.set(time.monotonic() + 0.01)
+    try:
+        revalidator.schedule(1)
+    finally:
+        request_deadline.reset(token)
+    await revalidator.wait()
+    
+    assert budgets == [None]
+    assert revalidator.stats()["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_vehicle_service_for_sale_expired_syncs(db):
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        vehicle = await svc.sync_vehicle_from_principal(1)
+        vehicle.updated_at = datetime.utcnow() - timedelta(days=1)
+        await db.commit()
+
+        mock.get_vehicle = AsyncMock(return_value={**MOCK_VEHICLE, "status": "VENDIDO"})
+        vehicle = await svc.get_vehicle_for_sale(1)
+        assert vehicle.status == VehicleStatus.VENDIDO
+
+
+@pytest.mark.asyncio
+async def test_vehicle_service_sync_not_modified_skips_write(db):
+    from app.services.vehicle_client import NOT_MODIFIED
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        vehicle = await svc.sync_vehicle_from_principal(1)
+        stale_at = datetime.utcnow() - timedelta(days=1)
+        vehicle.updated_at = stale_at
+        await db.commit()
+
+        mock.get_vehicle = AsyncMock(return_value=NOT_MODIFIED)
+        vehicle = await svc.sync_vehicle_from_principal(1)
+        mock.get_vehicle.assert_awaited_once_with(1, conditional=True)
+        assert vehicle.updated_at == stale_at
+        assert not db.dirty
+
+        # A revalidação conta como frescor: próxima venda usa o cache local
+        await svc.get_vehicle_for_sale(1)
+        assert mock.get_vehicle.await_count == 1
+
+
 # --- SaleService ---
 
 @pytest.mark.asyncio
@@ -141,6 +275,72 @@ async def test_sale_service_create_vehicle_unavailable(db):
         assert exc.value.status_code == 400
 
 
+@pytest.mark.asyncio
+async def test_vehicle_service_reserve_only_once(db):
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = VehicleService(db)
+        vehicle = await svc.sync_vehicle_from_principal(1)
+        reserved = await svc.reserve_vehicle(vehicle.id)
+        assert reserved is vehicle
+        assert vehicle.status == VehicleStatus.VENDIDO
+        assert await svc.reserve_vehicle(vehicle.id) is None
+
+
+@pytest.mark.asyncio
+async def test_sale_service_create_reservation_conflict(db):
+    """Comprador que leu o veículo disponível mas perdeu a reserva recebe 409."""
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        vehicle = await VehicleService(db).sync_vehicle_from_principal(1)
+        # Outro comprador reserva o veículo depois da leitura
+        await db.execute(
+            update(Vehicle)
+            .where(Vehicle.id == vehicle.id)
+            .values(status=VehicleStatus.VENDIDO)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        assert vehicle.status == VehicleStatus.DISPONIVEL
+        
+        svc = SaleService(db)
+        svc.vehicle_service.get_vehicle_for_sale = AsyncMock(return_value=vehicle)
+        from fastapi import HTTPException
+        with pytest.raises(HTTPException) as exc:
+            await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
+        assert exc.value.status_code == 409
+        
+        result = await db.execute(select(func.count()).select_from(Sale))
+        assert result.scalar_one() == 0
+        result = await db.execute(select(func.count()).select_from(VehicleStatusOutbox))
+        assert result.scalar_one() == 0
+
+
+@pytest.mark.asyncio
+async def test_sale_service_create_burst_single_winner(db):
+    """Rajada para o mesmo veículo: uma venda, demais 409 sem nova busca."""
+    async def slow_get_vehicle(external_id):
+        await asyncio.sleep(0.01)
+        return MOCK_VEHICLE
+    
+    async def buy():
+        async with TestSession() as session:
+            return await SaleService(session).create_sale(
+                SaleCreate(vehicle_id=1, cpf_comprador="52998224725")
+            )
+    
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(side_effect=slow_get_vehicle)
+        results = await asyncio.gather(*(buy() for _ in range(5)), return_exceptions=True)
+    
+    from fastapi import HTTPException
+    sales = [r for r in results if isinstance(r, Sale)]
+    conflicts = [r for r in results if isinstance(r, HTTPException) and r.status_code == 409]
+    assert len(sales) == 1
+    assert len(conflicts) == 4
+    assert mock.get_vehicle.await_count == 1
+
+
 @pytest.mark.asyncio
 async def test_sale_service_webhook_confirm(db):
     with patch('app.services.sale_service.vehicle_client') as mock:
@@ -200,6 +400,52 @@ async def test_sale_service_webhook_already_processed(db):
         assert exc.value.status_code == 400
 
 
+@pytest.mark.asyncio
+async def test_sale_service_webhook_cancel_releases_vehicle(db):
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        svc = SaleService(db)
+        sale = await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
+        vehicle = await svc.vehicle_service.get_vehicle_by_external_id(1)
+        assert vehicle.status == VehicleStatus.VENDIDO
+        
+        await svc.process_payment_webhook(
+            PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO)
+        )
+        assert sale.status_pagamento == PaymentStatus.CANCELADO
+        assert vehicle.status == VehicleStatus.DISPONIVEL
+        result = await db.execute(
+            select(VehicleStatusOutbox.status).order_by(VehicleStatusOutbox.id)
+        )
+        assert result.scalars().all() == [VehicleStatus.VENDIDO, VehicleStatus.DISPONIVEL]
+
+
+@pytest.mark.asyncio
+async def test_sale_service_webhook_duplicate_after_stale_read(db):
+    """Duplicata que leu a venda ainda PENDENTE não reaplica a transição."""
+    with patch('app.services.sale_service.vehicle_client') as mock:
+        mock.get_vehicle = AsyncMock(return_value=MOCK_VEHICLE)
+        sale = await SaleService(db).create_sale(
+            SaleCreate(vehicle_id=1, cpf_comprador="52998224725")
+        )
+    webhook = PaymentWebhook(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO)
+    
+    async with TestSession() as other_db:
+        # A outra sessão já tem a venda PENDENTE carregada
+        stale = await other_db.get(Sale, sale.id)
+        assert stale.status_pagamento == PaymentStatus.PENDENTE
+        
+        await SaleService(db).process_payment_webhook(webhook)
+        
+        from fastapi import HTTPException
+        with pytest.raises(HTTPException) as exc:
+            await SaleService(other_db).process_payment_webhook(webhook)
+        assert exc.value.status_code == 400
+    
+    result = await db.execute(select(func.count()).select_from(VehicleStatusOutbox))
+    assert result.scalar_one() == 2
+
+
 @pytest.mark.asyncio
 async def test_sale_service_get_sales(db):
     with patch('app.services.sale_service.vehicle_client') as mock:
@@ -207,8 +453,9 @@ async def test_sale_service_get_sales(db):
         mock.update_vehicle_status = AsyncMock(return_value=True)
         svc = SaleService(db)
         await svc.create_sale(SaleCreate(vehicle_id=1, cpf_comprador="52998224725"))
-        sales = await svc.get_sales()
+        sales, next_cursor = await svc.get_sales()
         assert len(sales) == 1
+        assert next_cursor is None
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,82 @@
+"""
+Testes para a coalescência de chamadas concorrentes (SingleFlight).
+"""
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    """Testa que chamadas concorrentes com a mesma chave executam uma vez."""
+    flight = SingleFlight()
+    calls = []
+    
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+    
+    results = await asyncio.gather(*(flight.do(1, work) for _ in range(5)))
+    
+    assert len(calls) == 1
+    assert [r[0] for r in results] == ["ok"] * 5
+    assert sorted(r[1] for r in results) == [False, True, True, True, True]
+    assert not flight.in_flight(1)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_distinct_keys_run_separately():
+    """Testa que chaves diferentes não são coalescidas."""
+    flight = SingleFlight()
+    calls = []
+    
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+    
+    await asyncio.gather(flight.do(1, work), flight.do(2, work))
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_exception():
+    """Testa que a exceção do líder é propagada aos seguidores."""
+    flight = SingleFlight()
+    
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("falhou")
+    
+    results = await asyncio.gather(
+        flight.do(1, work), flight.do(1, work), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not flight.in_flight(1)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_follower_retries_when_leader_cancelled():
+    """Testa que o seguidor refaz a chamada quando o líder é cancelado."""
+    flight = SingleFlight()
+    started = asyncio.Event()
+    calls = []
+    
+    async def slow():
+        calls.append("slow")
+        started.set()
+        await asyncio.sleep(10)
+    
+    async def fast():
+        calls.append("fast")
+        return "ok"
+    
+    leader = asyncio.create_task(flight.do(1, slow))
+    await started.wait()
+    follower = asyncio.create_task(flight.do(1, fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    
+    assert await follower == ("ok", False)
+    assert calls == ["slow", "fast"]
@@ -4,7 +4,8 @@ Testes para o cliente HTTP que comunica com o serviço de veículos.
 import pytest
 import respx
 from httpx import Response, RequestError
-from app.services.vehicle_client import VehicleClient
+from app.services.vehicle_client import VehicleClient, VehicleStatusRejected, NOT_MODIFIED
+from app.services.resilience import VehicleServiceUnavailable
 from app.core.config import settings
 
 
@@ -60,10 +61,11 @@ async def test_vehicle_client_get_vehicle_connection_error():
     )
     
     client = VehicleClient()
-    result = await client.get_vehicle(1)
+    client.retry_backoff = 0
+    with pytest.raises(VehicleServiceUnavailable):
+        await client.get_vehicle(1)
     
-    assert route.called
-    assert result is None
+    assert route.call_count == client.max_retries + 1
 
 
 @pytest.mark.asyncio
@@ -146,8 +148,258 @@ async def test_vehicle_client_update_status_failure():
     assert result is False
 
 
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_update_status_rejected():
+    """Testa que recusas (4xx) não são tratadas como falha retentável."""
+    respx.put(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(422)
+    )
+    respx.put(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/2").mock(
+        return_value=Response(429)
+    )
+    
+    client = VehicleClient()
+    with pytest.raises(VehicleStatusRejected):
+        await client.update_vehicle_status(1, "VENDIDO")
+    assert await client.update_vehicle_status(2, "VENDIDO") is False
+
+
 def test_vehicle_client_config():
     """Testa configuração do cliente."""
     client = VehicleClient()
     assert client.base_url == settings.VEHICLE_SERVICE_URL
     assert client.timeout == 30.0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_reuses_shared_connection_pool():
+    """Testa que chamadas consecutivas reutilizam o mesmo httpx.AsyncClient."""
+    respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(200, json={"id": 1})
+    )
+    respx.put(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(200)
+    )
+    
+    client = VehicleClient()
+    await client.start()
+    pool = client.client
+    
+    await client.get_vehicle(1)
+    await client.update_vehicle_status(1, "VENDIDO")
+    
+    assert client.client is pool
+    await client.close()
+    assert pool.is_closed
+    assert client._client is None
+
+
+@pytest.mark.asyncio
+async def test_vehicle_client_http2_without_h2_falls_back(monkeypatch):
+    """Testa fallback para HTTP/1.1 quando o pacote h2 não está instalado."""
+    import builtins
+    real_import = builtins.__import__
+    
+    def fake_import(name, *args, **kwargs):
+        if name == "h2":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+    
+    monkeypatch.setattr(builtins, "__import__", fake_import)
+    client = VehicleClient()
+    client.http2 = True
+    await client.start()
+    assert client.client is not None
+    await client.close()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_get_vehicles_fan_out():
+    """Testa busca em lote com erros individuais por ID."""
+    base = f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles"
+    respx.get(f"{base}/1").mock(return_value=Response(200, json={"id": 1}))
+    respx.get(f"{base}/2").mock(return_value=Response(404))
+    respx.get(f"{base}/3").mock(side_effect=RequestError("Connection failed"))
+    respx.get(f"{base}/4").mock(return_value=Response(500))
+    
+    client = VehicleClient()
+    client.batch_concurrency = 2
+    result = await client.get_vehicles([1, 2, 3, 4, 1])
+    
+    assert set(result) == {1, 2, 3, 4}
+    assert result[1] == {"data": {"id": 1}, "error": None}
+    assert result[2] == {"data": None, "error": "not_found"}
+    assert result[3]["data"] is None and "Connection failed" in result[3]["error"]
+    assert result[4] == {"data": None, "error": "HTTP 500"}
+
+
+@pytest.mark.asyncio
+async def test_vehicle_client_get_vehicles_empty():
+    """Testa busca em lote sem IDs."""
+    client = VehicleClient()
+    assert await client.get_vehicles([]) == {}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_get_vehicles_bulk_endpoint():
+    """Testa busca em lote usando o endpoint bulk do serviço principal."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/batch").mock(
+        return_value=Response(200, json=[{"id": 1}, {"id": 3}])
+    )
+    
+    client = VehicleClient()
+    client.bulk_endpoint = "/api/v1/vehicles/batch"
+    result = await client.get_vehicles([1, 2, 3])
+    
+    assert route.call_count == 1
+    assert route.calls[0].request.url.params["ids"] == "1,2,3"
+    assert result[1]["data"] == {"id": 1}
+    assert result[2] == {"data": None, "error": "not_found"}
+    assert result[3]["data"] == {"id": 3}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_get_vehicles_bulk_endpoint_error():
+    """Testa falha do endpoint bulk reportada para todos os IDs."""
+    respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/batch").mock(
+        return_value=Response(503)
+    )
+    
+    client = VehicleClient()
+    client.bulk_endpoint = "/api/v1/vehicles/batch"
+    result = await client.get_vehicles([1, 2])
+    
+    assert result == {
+        1: {"data": None, "error": "HTTP 503"},
+        2: {"data": None, "error": "HTTP 503"},
+    }
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_conditional_get_not_modified():
+    """Testa revalidação condicional com ETag retornando 304."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        side_effect=[
+            Response(200, json={"id": 1}, headers={
+                "ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"
+            }),
+            Response(304),
+        ]
+    )
+    
+    client = VehicleClient()
+    assert await client.get_vehicle(1) == {"id": 1}
+    result = await client.get_vehicle(1, conditional=True)
+    
+    assert result is NOT_MODIFIED
+    request = route.calls[1].request
+    assert request.headers["If-None-Match"] == '"v1"'
+    assert request.headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert client.stats()["conditional_requests"]["not_modified"] == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_conditional_get_without_validators():
+    """Testa que sem validadores a requisição não é condicional."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/1").mock(
+        return_value=Response(200, json={"id": 1})
+    )
+    
+    client = VehicleClient()
+    assert await client.get_vehicle(1, conditional=True) == {"id": 1}
+    assert "If-None-Match" not in route.calls[0].request.headers
+    assert len(client.validators) == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_negative_cache():
+    """Testa que IDs inexistentes são respondidos pelo cache negativo."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/999").mock(
+        return_value=Response(404)
+    )
+    
+    client = VehicleClient()
+    assert await client.get_vehicle(999) is None
+    assert await client.get_vehicle(999) is None
+    result = await client.get_vehicles([999])
+    
+    assert route.call_count == 1
+    assert result[999] == {"data": None, "error": "not_found"}
+    stats = client.stats()["negative_cache"]
+    assert stats["hits"] == 2
+    assert stats["size"] == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_negative_cache_expires():
+    """Testa que o cache negativo expira após o TTL."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/999").mock(
+        side_effect=[Response(404), Response(200, json={"id": 999})]
+    )
+    
+    client = VehicleClient()
+    client.negative_cache.ttl = 0.001
+    assert await client.get_vehicle(999) is None
+    import asyncio
+    await asyncio.sleep(0.01)
+    assert await client.get_vehicle(999) == {"id": 999}
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_get_available_vehicles_page():
+    """Testa paginação do catálogo e erro explícito em falhas."""
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/").mock(
+        side_effect=[Response(200, json=[{"id": 3}]), Response(404)]
+    )
+    
+    client = VehicleClient()
+    assert await client.get_available_vehicles(skip=2, limit=2) == [{"id": 3}]
+    params = route.calls[0].request.url.params
+    assert params["skip"] == "2" and params["limit"] == "2"
+    
+    with pytest.raises(VehicleServiceUnavailable):
+        await client.get_available_vehicles_page(4, 2)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_iter_available_vehicles_chunks():
+    """Testa leitura do catálogo em streaming em blocos de tamanho fixo."""
+    vehicles = [{"id": i, "marca": "Marca"} for i in range(1, 6)]
+    route = respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/").mock(
+        return_value=Response(200, json=vehicles)
+    )
+    
+    client = VehicleClient()
+    chunks = [chunk async for chunk in client.iter_available_vehicles(2, skip=5, limit=5)]
+    
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [v["id"] for chunk in chunks for v in chunk] == [1, 2, 3, 4, 5]
+    assert route.calls[0].request.url.params["skip"] == "5"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_vehicle_client_iter_available_vehicles_errors():
+    """Testa que falhas no streaming viram VehicleServiceUnavailable."""
+    respx.get(f"{settings.VEHICLE_SERVICE_URL}/api/v1/vehicles/").mock(
+        side_effect=[Response(500), Response(200, text='[{"id": 1}, {"id"')]
+    )
+    
+    client = VehicleClient()
+    with pytest.raises(VehicleServiceUnavailable):
+        [chunk async for chunk in client.iter_available_vehicles(10)]
+    with pytest.raises(VehicleServiceUnavailable):
+        [chunk async for chunk in client.iter_available_vehicles(10)]
+    assert client.circuit_breaker.snapshot()["consecutive_failures"] == 2
@@ -0,0 +1,95 @@
+"""
+Testes para o upsert em lote do cache local de veículos.
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.future import select
+
+from app.models.models import Vehicle, VehicleStatus
+from app.services import vehicle_upsert
+from app.services.outbox import enqueue_status_update
+from app.services.vehicle_upsert import build_upsert_statement, upsert_vehicles, vehicle_values
+from tests.conftest import capture_statements, test_engine
+
+
+def row(external_id: int, preco: float = 50000.00, status: str = "DISPONIVEL") -> dict:
+    return vehicle_values({
+        "id": external_id,
+        "marca": "Marca",
+        "modelo": "Modelo",
+        "ano": 2023,
+        "cor": "Cor",
+        "preco": preco,
+        "status": status,
+        "data_cadastro": "2024-01-01T00:00:00Z",
+    })
+
+
+@pytest.mark.asyncio
+async def test_upsert_inserts_and_updates_in_one_statement(db_session):
+    """Testa inserção e atualização com um único round trip."""
+    [original] = await upsert_vehicles(db_session, [row(1)])
+    await db_session.commit()
+    
+    with capture_statements(test_engine) as statements:
+        vehicles = await upsert_vehicles(db_session, [row(1, preco=60000.00, status="VENDIDO"), row(2)])
+        await db_session.commit()
+    
+    assert len([s for s in statements if s.startswith("INSERT")]) == 1
+    assert [v.external_id for v in vehicles] == [1, 2]
+    assert vehicles[0] is original
+    assert original.preco == 60000.00
+    assert original.status == VehicleStatus.VENDIDO
+    assert original.data_cadastro == datetime(2024, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_upsert_batches_and_deduplicates(db_session, monkeypatch):
+    """Testa divisão em lotes e external_id repetido (vale o último)."""
+    monkeypatch.setattr(vehicle_upsert, "UPSERT_BATCH_SIZE", 2)
+    vehicles = await upsert_vehicles(
+        db_session, [row(1), row(2), row(3), row(1, preco=1.0), row(4)]
+    )
+    await db_session.commit()
+    
+    assert [v.external_id for v in vehicles] == [1, 2, 3, 4]
+    result = await db_session.execute(select(Vehicle).where(Vehicle.external_id == 1))
+    assert result.scalar_one().preco == 1.0
+
+
+@pytest.mark.asyncio
+async def test_upsert_empty(db_session):
+    """Testa chamada sem linhas."""
+    assert await upsert_vehicles(db_session, []) == []
+
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_status_pending_in_outbox(db_session):
+    """Testa que o status com entrega pendente no outbox não é sobrescrito."""
+    await upsert_vehicles(db_session, [row(1, status="VENDIDO"), row(2, status="VENDIDO")])
+    enqueue_status_update(db_session, 1, VehicleStatus.VENDIDO)
+    await db_session.commit()
+    
+    vehicles = await upsert_vehicles(
+        db_session, [row(1, preco=1.0, status="DISPONIVEL"), row(2, status="DISPONIVEL")]
+    )
+    await db_session.commit()
+    
+    assert [(v.preco, v.status) for v in vehicles] == [
+        (1.0, VehicleStatus.VENDIDO),
+        (50000.00, VehicleStatus.DISPONIVEL),
+    ]
+
+
+def test_upsert_statement_postgresql():
+    """Testa a instrução gerada para o Postgres (asyncpg)."""
+    sql = str(build_upsert_statement(postgresql_insert, [row(1)]).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "ON CONFLICT (external_id) DO UPDATE" in sql
+    assert "preco = excluded.preco" in sql
+    assert "WHERE vehicle_status_outbox.external_id = vehicles.external_id" in sql
+    assert "FROM vehicle_status_outbox, vehicles" not in sql
+    assert "RETURNING" in sql
@@ -89,3 +89,93 @@ async def test_vehicles_ordered_by_price(override_dependencies):
             if len(data) > 1:
                 for i in range(len(data) - 1):
                     assert data[i]["preco"] <= data[i + 1]["preco"]
+
+
+async def _seed_vehicles(db_session, count, **overrides):
+    for i in range(count):
+        db_session.add(Vehicle(
+            external_id=100 + i,
+            marca="Fiat" if i % 2 else "Honda",
+            modelo="Modelo",
+            ano=2015 + i,
+            cor="Cor",
+            # Preços repetidos: o id desempata a ordenação entre páginas
+            preco=50000.00 + (i // 2) * 1000,
+            status=VehicleStatus.DISPONIVEL,
+            **overrides,
+        ))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_list_available_vehicles_keyset_pages(override_dependencies, db_session):
+    """Testa que as páginas por cursor cobrem todos os veículos sem repetição"""
+    await _seed_vehicles(db_session, 7)
+    seen = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        params = {"limit": 3}
+        while True:
+            response = await ac.get("/api/v1/vehicles/available", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page) <= 3
+            seen.extend(page)
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 3, "cursor": next_cursor}
+
+    assert len(seen) == 7
+    assert len({v["id"] for v in seen}) == 7
+    keys = [(v["preco"], v["id"]) for v in seen]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.asyncio
+async def test_list_available_vehicles_filters(override_dependencies, db_session):
+    """Testa filtros de marca, ano e preço"""
+    await _seed_vehicles(db_session, 8)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/v1/vehicles/available", params={"marca": "fiat"})
+        assert {v["marca"] for v in response.json()} == {"Fiat"}
+        assert len(response.json()) == 4
+
+        response = await ac.get(
+            "/api/v1/vehicles/available",
+            params={"ano_min": 2017, "ano_max": 2020, "preco_max": 51000},
+        )
+        data = response.json()
+        assert [v["ano"] for v in data] == [2017, 2018]
+        assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_list_vehicles_invalid_cursor(override_dependencies):
+    """Testa que cursor malformado retorna 400 e limit fora da faixa 422"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/v1/vehicles/sold", params={"cursor": "nao-e-cursor"})
+        assert response.status_code == 400
+        response = await ac.get("/api/v1/vehicles/sold", params={"limit": 0})
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_available_vehicles_streams_all_rows(override_dependencies, db_session):
+    """Testa que a exportação percorre todos os blocos do cursor"""
+    import csv
+    from app.core.config import settings
+
+    await _seed_vehicles(db_session, 7)
+    with patch.object(settings, "EXPORT_BATCH_SIZE", 2):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/vehicles/available/export", params={"format": "csv"})
+            assert response.status_code == 200
+            rows = list(csv.DictReader(response.text.splitlines()))
+            response = await ac.get("/api/v1/vehicles/sold/export")
+            assert response.status_code == 200
+            assert response.text == ""
+
+    assert len(rows) == 7
+    precos = [float(r["preco"]) for r in rows]
+    assert precos == sorted(precos)
+    assert rows[0]["status"] == "DISPONIVEL"
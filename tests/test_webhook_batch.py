@@ -0,0 +1,82 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.main import app
+from app.models.models import Vehicle, VehicleStatus, PaymentStatus, VehicleStatusOutbox
+from tests.conftest import capture_statements, create_sales
+
+
+@pytest.mark.asyncio
+async def test_webhook_batch_mixed_events(override_dependencies, db_session):
+    """Testa lote com confirmações, cancelamentos e eventos inválidos"""
+    await create_sales(db_session, [PaymentStatus.PENDENTE] * 3)
+    events = [
+        {"codigo_pagamento": "pagamento-1", "status": "CONFIRMADO"},
+        {"codigo_pagamento": "pagamento-2", "status": "CANCELADO"},
+        {"codigo_pagamento": "inexistente", "status": "CONFIRMADO"},
+        {"codigo_pagamento": "pagamento-1", "status": "CANCELADO"},
+        {"codigo_pagamento": "pagamento-3", "status": "CANCELADO"},
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/webhook/pagamento/batch", json={"events": events})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied"] == 3
+    assert data["failed"] == 2
+    results = data["results"]
+    assert [r["status_code"] for r in results] == [200, 200, 404, 400, 200]
+    assert results[0]["vehicle_status"] == "VENDIDO"
+    assert results[1]["vehicle_status"] == "DISPONIVEL"
+    assert results[4]["status_pagamento"] == "CANCELADO"
+    
+    result = await db_session.execute(
+        select(Vehicle.external_id, Vehicle.status)
+        .order_by(Vehicle.external_id)
+        .execution_options(populate_existing=True)
+    )
+    assert result.all() == [
+        (1, VehicleStatus.VENDIDO), (2, VehicleStatus.DISPONIVEL), (3, VehicleStatus.DISPONIVEL)
+    ]
+    result = await db_session.execute(
+        select(VehicleStatusOutbox.external_id).order_by(VehicleStatusOutbox.external_id)
+    )
+    assert result.scalars().all() == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_webhook_batch_already_processed(override_dependencies, db_session):
+    """Testa que a reentrega do lote não reaplica as transições"""
+    await create_sales(db_session, [PaymentStatus.PENDENTE] * 2)
+    events = [
+        {"codigo_pagamento": "pagamento-1", "status": "CONFIRMADO"},
+        {"codigo_pagamento": "pagamento-2", "status": "CANCELADO"},
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/webhook/pagamento/batch", json={"events": events})
+        response = await ac.post("/webhook/pagamento/batch", json={"events": events})
+    
+    data = response.json()
+    assert data["applied"] == 0
+    assert [r["status_code"] for r in data["results"]] == [400, 400]
+    assert "CONFIRMADO" in data["results"][0]["detail"]
+    assert await db_session.scalar(select(func.count()).select_from(VehicleStatusOutbox)) == 1
+
+
+@pytest.mark.asyncio
+async def test_webhook_batch_round_trips(override_dependencies, db_session):
+    """Testa que o número de instruções não cresce com o tamanho do lote"""
+    await create_sales(db_session, [PaymentStatus.PENDENTE] * 100)
+    events = [
+        {"codigo_pagamento": f"pagamento-{i}", "status": "CONFIRMADO" if i % 2 else "CANCELADO"}
+        for i in range(1, 101)
+    ]
+    with capture_statements() as statements:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/webhook/pagamento/batch", json={"events": events})
+    
+    assert response.json()["applied"] == 100
+    # Um UPDATE por status, liberação dos veículos e INSERT do outbox
+    assert len(statements) <= 4
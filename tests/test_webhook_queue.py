@@ -0,0 +1,124 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.future import select
+
+from app.main import app
+from app.models.models import PaymentStatus, PaymentWebhookEvent, Vehicle, VehicleStatus
+from app.services.webhook_queue import (
+    PaymentWebhookQueue,
+    payment_webhook_queue,
+    purge_processed_events,
+)
+from tests.conftest import TestSessionLocal, create_sales
+
+
+@pytest.mark.asyncio
+async def test_webhook_async_accepts_and_deduplicates(override_dependencies, db_session):
+    """Testa que o evento é aceito com 202 e reentregas são descartadas"""
+    webhook = {"codigo_pagamento": "pagamento-1", "status": "CONFIRMADO"}
+    with patch.object(payment_webhook_queue, "trigger") as trigger:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.post("/webhook/pagamento/async", json=webhook)
+            retry = await ac.post("/webhook/pagamento/async", json=webhook)
+    
+    assert first.status_code == 202
+    assert first.json() == {"accepted": True, "duplicate": False}
+    assert retry.json() == {"accepted": True, "duplicate": True}
+    trigger.assert_called_once()
+    
+    result = await db_session.execute(select(PaymentWebhookEvent))
+    assert len(result.scalars().all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_webhook_queue_processes_batch(db_session):
+    """Testa que o worker aplica o lote e marca os eventos como processados"""
+    [sale] = await create_sales(db_session, [PaymentStatus.PENDENTE])
+    db_session.add_all([
+        PaymentWebhookEvent(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CANCELADO),
+        PaymentWebhookEvent(codigo_pagamento="inexistente", status=PaymentStatus.CONFIRMADO),
+    ])
+    await db_session.commit()
+    
+    queue = PaymentWebhookQueue(session_factory=TestSessionLocal)
+    assert await queue.drain() == 2
+    
+    stats = await queue.stats(db_session)
+    assert stats["pending"] == 0
+    assert stats["lag_seconds"] is None
+    assert stats["processed"] == 2
+    assert stats["applied"] == 1
+    
+    await db_session.refresh(sale)
+    assert sale.status_pagamento == PaymentStatus.CANCELADO
+    vehicle = await db_session.get(Vehicle, sale.vehicle_id, populate_existing=True)
+    assert vehicle.status == VehicleStatus.DISPONIVEL
+
+
+@pytest.mark.asyncio
+async def test_webhook_queue_failed_batch_backs_off(db_session):
+    """Testa que um lote com falha volta à fila com backoff"""
+    [sale] = await create_sales(db_session, [PaymentStatus.PENDENTE])
+    db_session.add(PaymentWebhookEvent(codigo_pagamento=sale.codigo_pagamento, status=PaymentStatus.CONFIRMADO))
+    await db_session.commit()
+    
+    queue = PaymentWebhookQueue(session_factory=TestSessionLocal)
+    with patch(
+        "app.services.webhook_queue.SaleService.process_payment_webhooks",
+        AsyncMock(side_effect=RuntimeError("banco indisponível")),
+    ):
+        assert await queue.process_batch() == 0
+    
+    event = (await db_session.execute(
+        select(PaymentWebhookEvent).execution_options(populate_existing=True)
+    )).scalar_one()
+    assert event.processed_at is None
+    assert event.attempts == 1
+    assert event.next_attempt_at is not None
+    assert event.last_error == "banco indisponível"
+    
+    # Em backoff: não é reivindicado de novo
+    assert await queue.process_batch() == 0
+    stats = await queue.stats(db_session)
+    assert stats["pending"] == 1
+    assert stats["failed_batches"] == 1
+    await db_session.refresh(sale)
+    assert sale.status_pagamento == PaymentStatus.PENDENTE
+
+
+@pytest.mark.asyncio
+async def test_ops_webhook_queue(override_dependencies):
+    """Testa o endpoint de métricas da fila de webhooks"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/ops/webhook-queue")
+    assert response.status_code == 200
+    assert response.json()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_purge_processed_events_keeps_dedupe_window(db_session):
+    """Testa que só os eventos processados fora da janela de deduplicação são removidos"""
+    now = datetime.utcnow()
+    db_session.add_all([
+        PaymentWebhookEvent(
+            codigo_pagamento="antigo", status=PaymentStatus.CONFIRMADO,
+            processed_at=now - timedelta(days=2),
+        ),
+        PaymentWebhookEvent(
+            codigo_pagamento="recente", status=PaymentStatus.CONFIRMADO,
+            processed_at=now - timedelta(minutes=5),
+        ),
+        PaymentWebhookEvent(
+            codigo_pagamento="pendente", status=PaymentStatus.CONFIRMADO,
+            received_at=now - timedelta(days=2),
+        ),
+    ])
+    await db_session.commit()
+    
+    assert await purge_processed_events(TestSessionLocal) == 1
+    result = await db_session.execute(
+        select(PaymentWebhookEvent.codigo_pagamento).order_by(PaymentWebhookEvent.codigo_pagamento)
+    )
+    assert result.scalars().all() == ["pendente", "recente"]